@@ -1,13 +1,44 @@
 #!/usr/bin/env python3
 """
-Analizador de subtítulos - Genera una vista del contenido para identificar 
+Analizador de subtítulos - Genera una vista del contenido para identificar
 manualmente patrones de inicio/fin de historias.
+
+Procesa en streaming: lee los segmentos del JSON de a uno (sin cargar el
+archivo completo), escribe el reporte por chunks con un writer con buffer y
+busca los inicios de historia con una ventana deslizante sobre el texto ya
+pasado a minúsculas (cada subtítulo se baja a minúsculas una sola vez).
+Con --todos analiza todos los episodios en paralelo.
 """
 import json
+import os
+import shutil
 import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 
+SUBS_DIR = "data/subtitulos"
+READ_CHUNK = 1 << 16                # Caracteres leídos por vez del JSON
+WRITE_BUFFER = 1 << 16              # Buffer del writer del reporte
+PREVIEW_LINES = 25                  # Líneas del reporte que se muestran (5 chunks)
+
+# Patrones de inicio de historia
+STORY_START_PATTERNS = (
+    "me escribe",
+    "nos escribe",
+    "la siguiente historia",
+    "vamos con otra",
+    "les cuento",
+    "esta historia",
+    "bueno, ahora",
+    "hola,",  # Inicio de llamada
+    "muy buenas noches",  # Saludo de oyente
+    "¿de dónde sos",  # Pregunta típica del conductor
+    "¿de dónde nos",
+)
+
+
 def format_timestamp(seconds: float) -> str:
     """Convierte segundos a formato HH:MM:SS"""
     hours = int(seconds // 3600)
@@ -18,160 +49,288 @@ def format_timestamp(seconds: float) -> str:
     return f"{minutes:02d}:{secs:02d}"
 
 
-def analyze_subtitles(video_id: str, 
-                      output_format: str = "txt",
-                      chunk_duration: int = 60) -> None:
+def iter_segments(path: str):
     """
-    Analiza subtítulos y genera un reporte legible.
-    
-    Args:
-        video_id: ID del video
-        output_format: 'txt' o 'md'
-        chunk_duration: Duración en segundos para agrupar segmentos
+    Genera los segmentos de un JSON de subtítulos sin cargarlo entero: lee
+    de a READ_CHUNK caracteres y decodifica cada objeto del array "segments"
+    apenas está completo.
     """
-    input_path = f"data/subtitulos/{video_id}.json"
-    
-    if not Path(input_path).exists():
-        print(f"❌ No existe: {input_path}")
-        return
-    
-    with open(input_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    segments = data['segments']
-    total_duration = segments[-1]['start'] + segments[-1]['duration'] if segments else 0
-    
-    print(f"\n{'='*70}")
-    print(f"📺 Video: {video_id}")
-    print(f"📊 Total segmentos: {len(segments)}")
-    print(f"⏱️  Duración: {format_timestamp(total_duration)}")
-    print(f"{'='*70}\n")
-    
-    # Generar texto combinado por chunks de tiempo
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buf = ''
+        while True:
+            chunk = f.read(READ_CHUNK)
+            if not chunk:
+                return
+            buf += chunk
+            key = buf.find('"segments"')
+            if key < 0:
+                buf = buf[-16:]          # Por si la clave quedó cortada
+                continue
+            bracket = buf.find('[', key)
+            if bracket >= 0:
+                buf = buf[bracket + 1:]
+                break
+
+        pos = 0
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buf) and buf[pos] == ']':
+                return
+            try:
+                segment, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                chunk = f.read(READ_CHUNK)
+                if not chunk:
+                    raise
+                buf = buf[pos:] + chunk
+                pos = 0
+                continue
+            yield segment
+
+
+class StoryStartFinder:
+    """
+    Busca patrones de inicio de historia en el contexto de cada subtítulo
+    (los `before` anteriores y los `after` siguientes). La ventana guarda el
+    texto en minúsculas y su unión se actualiza al entrar y salir cada
+    subtítulo, en vez de rearmarla para cada uno.
+    """
+
+    def __init__(self, video_id: str, patterns: tuple = STORY_START_PATTERNS,
+                 before: int = 2, after: int = 4, min_gap: float = 30):
+        self.video_id = video_id
+        self.patterns = patterns
+        self.before = before
+        self.after = after
+        self.min_gap = min_gap
+        self.window = deque()       # (start, texto en minúsculas)
+        self.joined = ''
+        self.fed = 0
+        self.last_ts = -60
+
+    def feed(self, segment: dict) -> list:
+        """Agrega un subtítulo; devuelve los inicios ya confirmados"""
+        text = segment['text'].lower()
+        self.joined = f"{self.joined} {text}" if self.window else text
+        self.window.append((segment['start'], text))
+        if len(self.window) > self.before + 1 + self.after:
+            _, old = self.window.popleft()
+            self.joined = self.joined[len(old) + 1:]
+        self.fed += 1
+
+        if self.fed <= self.after:
+            return []
+        return self._check(self.window[-1 - self.after][0], self.joined)
+
+    def finish(self) -> list:
+        """Los últimos subtítulos, que no llegaron a tener `after` siguientes"""
+        found = []
+        entries = list(self.window)
+        for t in range(max(len(entries) - min(self.fed, self.after), 0), len(entries)):
+            context = ' '.join(text for _, text in entries[max(0, t - self.before):])
+            found.extend(self._check(entries[t][0], context))
+        return found
+
+    def _check(self, start: float, context: str) -> list:
+        for pattern in self.patterns:
+            if pattern in context:
+                # Eliminar duplicados cercanos (menos de min_gap segundos)
+                if start - self.last_ts <= self.min_gap:
+                    return []
+                self.last_ts = start
+                return [{
+                    "timestamp": start,
+                    "timestamp_fmt": format_timestamp(start),
+                    "pattern": pattern,
+                    "context": context[:200],
+                    "youtube_url": f"https://youtube.com/watch?v={self.video_id}&t={int(start)}s"
+                }]  # Solo un match por segmento
+        return []
+
+
+def iter_chunks(segments, chunk_duration: int):
+    """Agrupa los textos en chunks de `chunk_duration` segundos: (inicio, texto)"""
     current_chunk_start = 0
     current_chunk_text = []
-    
-    output_lines = []
-    
+
     for seg in segments:
-        # Si pasamos al siguiente chunk, guardar el anterior
+        # Si pasamos al siguiente chunk, entregar el anterior
         while seg['start'] >= current_chunk_start + chunk_duration:
             if current_chunk_text:
-                chunk_text = ' '.join(current_chunk_text)
-                ts = format_timestamp(current_chunk_start)
-                yt_link = f"https://youtube.com/watch?v={video_id}&t={int(current_chunk_start)}s"
-                
-                output_lines.append(f"\n[{ts}] ({yt_link})")
-                output_lines.append("-" * 50)
-                output_lines.append(chunk_text)
-                output_lines.append("")
-                
+                yield current_chunk_start, ' '.join(current_chunk_text)
                 current_chunk_text = []
             current_chunk_start += chunk_duration
-        
         current_chunk_text.append(seg['text'])
-    
+
     # Último chunk
     if current_chunk_text:
-        chunk_text = ' '.join(current_chunk_text)
-        ts = format_timestamp(current_chunk_start)
-        yt_link = f"https://youtube.com/watch?v={video_id}&t={int(current_chunk_start)}s"
-        output_lines.append(f"\n[{ts}] ({yt_link})")
-        output_lines.append("-" * 50)
-        output_lines.append(chunk_text)
-    
-    # Guardar archivo
-    output_path = f"data/subtitulos/{video_id}_analisis.txt"
-    with open(output_path, 'w', encoding='utf-8') as f:
+        yield current_chunk_start, ' '.join(current_chunk_text)
+
+
+def analyze_video(video_id: str, chunk_duration: int = 60, preview: bool = False) -> dict:
+    """
+    Una sola pasada por los subtítulos: escribe el reporte y busca los
+    inicios de historia.
+
+    Returns:
+        Dict con path, total_segments, duracion, inicios y (si preview) las
+        primeras líneas del reporte
+    """
+    input_path = f"{SUBS_DIR}/{video_id}.json"
+    output_path = f"{SUBS_DIR}/{video_id}_analisis.txt"
+    body_path = f"{output_path}.tmp"
+
+    finder = StoryStartFinder(video_id)
+    starts = []
+    stats = {'segments': 0, 'end': 0.0}
+    head = []
+
+    def observed():
+        for seg in iter_segments(input_path):
+            stats['segments'] += 1
+            stats['end'] = seg['start'] + seg['duration']
+            starts.extend(finder.feed(seg))
+            yield seg
+
+    # El encabezado lleva la duración, que se conoce al final: el cuerpo va
+    # primero a un temporal y después se copia detrás del encabezado
+    with open(body_path, 'w', encoding='utf-8', buffering=WRITE_BUFFER) as body:
+        for i, (chunk_start, chunk_text) in enumerate(iter_chunks(observed(), chunk_duration)):
+            ts = format_timestamp(chunk_start)
+            yt_link = f"https://youtube.com/watch?v={video_id}&t={int(chunk_start)}s"
+            chunk = f"\n[{ts}] ({yt_link})\n{'-' * 50}\n{chunk_text}"
+            if i:
+                body.write("\n\n")
+            body.write(chunk)
+            if preview and len(head) < PREVIEW_LINES:
+                head.extend(([""] if i else []) + [f"\n[{ts}] ({yt_link})", "-" * 50, chunk_text])
+    starts.extend(finder.finish())
+
+    duration = stats['end'] if stats['segments'] else 0
+    with open(output_path, 'w', encoding='utf-8', buffering=WRITE_BUFFER) as f:
         f.write(f"Análisis de: {video_id}\n")
-        f.write(f"Duración: {format_timestamp(total_duration)}\n")
+        f.write(f"Duración: {format_timestamp(duration)}\n")
         f.write(f"Chunks de {chunk_duration} segundos\n")
         f.write("=" * 70 + "\n")
-        f.write('\n'.join(output_lines))
-    
-    print(f"✅ Guardado: {output_path}")
-    
+        with open(body_path, 'r', encoding='utf-8') as body:
+            shutil.copyfileobj(body, f, WRITE_BUFFER)
+    os.remove(body_path)
+
+    return {
+        'video_id': video_id,
+        'path': output_path,
+        'total_segments': stats['segments'],
+        'duracion': duration,
+        'inicios': starts,
+        'preview': head[:PREVIEW_LINES],
+    }
+
+
+def analyze_subtitles(video_id: str,
+                      output_format: str = "txt",
+                      chunk_duration: int = 60) -> dict | None:
+    """
+    Analiza subtítulos y genera un reporte legible.
+
+    Args:
+        video_id: ID del video
+        output_format: 'txt' o 'md'
+        chunk_duration: Duración en segundos para agrupar segmentos
+
+    Returns:
+        Resultado de `analyze_video` (incluye los inicios de historia)
+    """
+    input_path = f"{SUBS_DIR}/{video_id}.json"
+
+    if not Path(input_path).exists():
+        print(f"❌ No existe: {input_path}")
+        return None
+
+    result = analyze_video(video_id, chunk_duration, preview=True)
+
+    print(f"\n{'='*70}")
+    print(f"📺 Video: {video_id}")
+    print(f"📊 Total segmentos: {result['total_segments']}")
+    print(f"⏱️  Duración: {format_timestamp(result['duracion'])}")
+    print(f"{'='*70}\n")
+    print(f"✅ Guardado: {result['path']}")
+
     # Mostrar primeros chunks
     print("\n📝 Primeros 5 chunks:\n")
-    for line in output_lines[:25]:
+    for line in result['preview']:
         print(line)
     print("\n... (ver archivo completo para más)")
+    return result
 
 
 def find_potential_story_starts(video_id: str) -> list:
     """
     Busca patrones que típicamente indican inicio de historias.
     """
-    input_path = f"data/subtitulos/{video_id}.json"
-    
-    with open(input_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    # Patrones de inicio de historia
-    patterns = [
-        "me escribe",
-        "nos escribe", 
-        "la siguiente historia",
-        "vamos con otra",
-        "les cuento",
-        "esta historia",
-        "bueno, ahora",
-        "hola,",  # Inicio de llamada
-        "muy buenas noches",  # Saludo de oyente
-        "¿de dónde sos",  # Pregunta típica del conductor
-        "¿de dónde nos",
-    ]
-    
-    potential_starts = []
-    
-    # Combinar segmentos cercanos para contexto
-    window_size = 5
-    for i, seg in enumerate(data['segments']):
-        context = ' '.join([s['text'].lower() for s in data['segments'][max(0, i-2):i+window_size]])
-        
-        for pattern in patterns:
-            if pattern in context.lower():
-                potential_starts.append({
-                    "timestamp": seg['start'],
-                    "timestamp_fmt": format_timestamp(seg['start']),
-                    "pattern": pattern,
-                    "context": context[:200],
-                    "youtube_url": f"https://youtube.com/watch?v={video_id}&t={int(seg['start'])}s"
-                })
-                break  # Solo un match por segmento
-    
-    # Eliminar duplicados cercanos (menos de 30 segundos)
-    filtered = []
-    last_ts = -60
-    for item in potential_starts:
-        if item['timestamp'] - last_ts > 30:
-            filtered.append(item)
-            last_ts = item['timestamp']
-    
-    return filtered
+    finder = StoryStartFinder(video_id)
+    starts = []
+    for seg in iter_segments(f"{SUBS_DIR}/{video_id}.json"):
+        starts.extend(finder.feed(seg))
+    starts.extend(finder.finish())
+    return starts
+
+
+def _analyze_job(args: tuple) -> dict:
+    """Worker del modo --todos: devuelve el resumen sin los inicios completos"""
+    video_id, chunk_duration = args
+    result = analyze_video(video_id, chunk_duration)
+    result['inicios'] = len(result['inicios'])
+    return result
+
+
+def analyze_all(chunk_duration: int = 60, workers: int = None) -> list:
+    """Analiza todos los episodios de data/subtitulos en paralelo"""
+    video_ids = sorted(p.stem for p in Path(SUBS_DIR).glob('*.json'))
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        return list(pool.map(_analyze_job, ((v, chunk_duration) for v in video_ids)))
 
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         print("Uso: python3 analyze_subtitles.py <video_id> [chunk_duration]")
+        print("     python3 analyze_subtitles.py --todos [chunk_duration] [--workers N]")
         print("Ejemplo: python3 analyze_subtitles.py n2BkstRXbV0 60")
         sys.exit(1)
-    
+
+    if sys.argv[1] == '--todos':
+        args = sys.argv[2:]
+        workers = None
+        if '--workers' in args:
+            i = args.index('--workers')
+            workers = int(args[i + 1])
+            del args[i:i + 2]
+        chunk_duration = int(args[0]) if args else 60
+        results = analyze_all(chunk_duration, workers)
+        for r in results:
+            print(f"✅ {r['video_id']}: {r['total_segments']} segmentos, "
+                  f"{format_timestamp(r['duracion'])}, {r['inicios']} posibles historias → {r['path']}")
+        print(f"\n📊 Analizados: {len(results)} videos")
+        sys.exit(0)
+
     video_id = sys.argv[1]
     chunk_duration = int(sys.argv[2]) if len(sys.argv) > 2 else 60
-    
-    # Análisis general
-    analyze_subtitles(video_id, chunk_duration=chunk_duration)
-    
+
+    # Análisis general (incluye los inicios: una sola lectura del archivo)
+    result = analyze_subtitles(video_id, chunk_duration=chunk_duration)
+    if result is None:
+        sys.exit(1)
+
     # Buscar inicios potenciales de historias
     print("\n" + "=" * 70)
     print("🔍 Posibles inicios de historias detectados:")
     print("=" * 70)
-    
-    starts = find_potential_story_starts(video_id)
+
+    starts = result['inicios']
     for i, s in enumerate(starts[:20], 1):
         print(f"\n{i}. [{s['timestamp_fmt']}] Pattern: '{s['pattern']}'")
         print(f"   🔗 {s['youtube_url']}")
         print(f"   📝 {s['context'][:100]}...")
-    
+
     print(f"\n📊 Total posibles historias: {len(starts)}")
@@ -0,0 +1,654 @@
+#!/usr/bin/env python3
+"""
+Benchmarks de la base de datos.
+
+    python3 scripts/benchmark.py fts [--copias N]
+    python3 scripts/benchmark.py export [--historias N]
+    python3 scripts/benchmark.py importar [--archivos N]
+    python3 scripts/benchmark.py compresion [--historias N]
+    python3 scripts/benchmark.py memoria [--episodios N]
+    python3 scripts/benchmark.py duplicados [--historias N]
+    python3 scripts/benchmark.py series [--episodios N]
+    python3 scripts/benchmark.py supervision [--historias N]
+
+`fts` compara la configuración original del FTS (unicode61 sin opciones) con
+la actual (sin acentos + índices de prefijo, con y sin stemming) sobre las
+ventanas de subtítulos del corpus: latencia mediana por consulta y recall
+contra una verdad "plegada" (sin acentos, misma raíz).
+
+`export` compara el export para la web armando la lista completa (fetchall +
+json.dump) con el export en streaming, sobre una base sintética: tiempo y
+pico de memoria de Python.
+
+`importar` genera un volcado sintético de N archivos .vtt de subtítulos
+automáticos (con el texto "rodante" de YouTube) y mide el import masivo de
+src/bulk_import.py: archivos por segundo y estimación para 10.000 archivos.
+
+`compresion` arma historias con oraciones reales de los subtítulos y compara
+texto plano, zlib, zlib con diccionario entrenado (y zstd si está
+instalado): tamaño de la base, latencia de lectura de un texto y de una
+página de búsqueda.
+
+`memoria` carga N copias de los episodios del corpus (subtítulos e
+historias) como los dicts del JSON y como los modelos de src/models.py
+(SegmentArray, Story con __slots__): memoria retenida y tiempo de carga.
+
+`duplicados` arma N historias sintéticas con un 5% de repeticiones (la misma
+historia con palabras perdidas, como en otra transcripción automática) y
+mide el índice MinHash/LSH de src/dedup.py con N/2 y N historias: tiempo,
+pares comparados contra todos los pares posibles, precision/recall contra
+las repeticiones plantadas y el costo de agregar un video nuevo.
+
+`series` arma N episodios sintéticos (dos por semana desde 2019, con un
+término plantado en alza en un trimestre) y mide las series de tiempo de
+src/series.py: construirlas desde cero contra actualizarlas después de
+importar un episodio nuevo (y sin cambios), con los períodos recalculados.
+
+`supervision` arma N historias sintéticas (oraciones reales de los
+subtítulos con palabras de su categoría, clases desbalanceadas) y compara la
+precisión del clasificador de src/active_learning.py después de supervisar
+25, 50, 100 y 200 historias en el orden del archivo contra el orden de la
+cola de aprendizaje activo, más el costo de actualizar la cola por etiqueta.
+"""
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src import active_learning, bulk_import, db, dedup, series
+from src.models import SegmentArray, Story
+from src.db import (ACCENT_FOLD, FTS_PREFIX, FTS_TOKENIZE, WORD_RE,
+                    fts_query, stem_es, stem_word, subtitle_windows)
+from src.textcodec import TextCodec, zstandard
+
+SUBS_DIR = "data/subtitulos"
+
+FTS_CONFIGS = {
+    'original': {'tokenize': 'unicode61', 'prefix': None, 'stemming': False},
+    'sin_acentos+prefijos': {'tokenize': FTS_TOKENIZE, 'prefix': FTS_PREFIX, 'stemming': False},
+    'sin_acentos+prefijos+stemming': {'tokenize': FTS_TOKENIZE, 'prefix': FTS_PREFIX, 'stemming': True},
+}
+
+# Términos como los escribe la gente: con y sin tildes, en plural, prefijos
+FTS_QUERIES = [
+    'aparicion', 'aparición', 'fantasma', 'fantasmas', 'espiritu', 'espíritus',
+    'luces', 'policia', 'camion', 'cementerio', 'miedo', 'paso', 'fan*', 'apar*',
+]
+
+REPEATS = 20
+
+
+def load_windows(copies: int) -> list:
+    """Textos de las ventanas de subtítulos, replicados `copies` veces"""
+    texts = []
+    for path in sorted(Path(SUBS_DIR).glob('*.json')):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        texts.extend(text for _, _, text in subtitle_windows(data['segments']))
+    return texts * copies
+
+
+def _fold(word: str) -> str:
+    """Palabra sin acentos y reducida a su raíz"""
+    return stem_word(word.lower().translate(ACCENT_FOLD))
+
+
+def ground_truth(texts: list, term: str) -> set:
+    """Ids (1-based) de las ventanas que contienen el término plegado"""
+    if term.endswith('*'):
+        prefix = term[:-1].lower().translate(ACCENT_FOLD)
+        match = lambda w: w.startswith(prefix)
+        normalize = lambda w: w.lower().translate(ACCENT_FOLD)
+    else:
+        target = _fold(term)
+        match = lambda w: w == target
+        normalize = _fold
+    return {i for i, text in enumerate(texts, 1)
+            if any(match(normalize(w)) for w in WORD_RE.findall(text))}
+
+
+def build_fts(texts: list, tokenize: str, prefix: str | None, stemming: bool) -> sqlite3.Connection:
+    """Índice FTS5 en memoria con la configuración dada"""
+    conn = sqlite3.connect(':memory:')
+    options = f", tokenize='{tokenize}'" + (f", prefix='{prefix}'" if prefix else '')
+    conn.execute(f"CREATE VIRTUAL TABLE fts USING fts5(texto{options})")
+    rows = ((i, stem_es(t) if stemming else t) for i, t in enumerate(texts, 1))
+    conn.executemany("INSERT INTO fts(rowid, texto) VALUES (?, ?)", rows)
+    conn.commit()
+    return conn
+
+
+def benchmark_fts(copies: int = 20):
+    """Latencia y recall de cada configuración del FTS"""
+    texts = load_windows(copies)
+    print(f"📚 {len(texts)} ventanas de subtítulos ({copies} copias del corpus)")
+    truths = {q: ground_truth(texts, q) for q in FTS_QUERIES}
+
+    for name, cfg in FTS_CONFIGS.items():
+        start = time.perf_counter()
+        conn = build_fts(texts, cfg['tokenize'], cfg['prefix'], cfg['stemming'])
+        build = time.perf_counter() - start
+
+        latencies = []
+        recalls = []
+        for q in FTS_QUERIES:
+            query = fts_query(q, cfg['stemming'])
+            for _ in range(REPEATS):
+                t0 = time.perf_counter()
+                found = {r[0] for r in conn.execute("SELECT rowid FROM fts WHERE fts MATCH ?", (query,))}
+                latencies.append(time.perf_counter() - t0)
+            truth = truths[q]
+            recalls.append(len(found & truth) / len(truth) if truth else 1.0)
+        conn.close()
+
+        print(f"\n⚙️  {name}")
+        print(f"   Indexado:          {build * 1000:.0f} ms")
+        print(f"   Latencia mediana:  {statistics.median(latencies) * 1000:.2f} ms")
+        print(f"   Recall promedio:   {statistics.mean(recalls):.1%}")
+        misses = [q for q, r in zip(FTS_QUERIES, recalls) if r < 1.0]
+        if misses:
+            print(f"   Recall incompleto: {', '.join(misses)}")
+
+
+def _synthetic_db(n: int):
+    """Base en el directorio actual con `n` historias sintéticas"""
+    db.init_db()
+    conn = db.get_connection()
+    conn.execute("INSERT INTO videos (video_id, url, titulo) VALUES ('sintetico', '', 'Video sintético')")
+    rng = random.Random(0)
+    categories = ['fantasmas', 'ovnis', 'criaturas', 'premoniciones', None]
+    conn.executemany(
+        '''INSERT INTO historias (video_id, timestamp_inicio, titulo_inferido, texto_completo,
+                                   resumen, categoria, wtf_score)
+           VALUES ('sintetico', ?, ?, '', ?, ?, ?)''',
+        ((i * 60.0, f'Historia {i}', 'Resumen de la historia ' * 8, rng.choice(categories),
+          round(rng.random(), 2)) for i in range(n))
+    )
+    conn.commit()
+    conn.close()
+
+
+def _legacy_export(output_path: str) -> int:
+    """El export anterior: fetchall, lista de dicts y json.dump con indent"""
+    conn = db.get_connection()
+    rows = conn.execute('''
+        SELECT h.id, h.video_id, h.timestamp_inicio, h.timestamp_fin, h.titulo_inferido,
+               h.resumen, h.categoria, h.subcategoria, h.tipo_narrador, h.wtf_score,
+               h.verificado_humano, v.titulo as video_titulo, v.fecha_emision
+        FROM historias h JOIN videos v ON h.video_id = v.video_id
+        WHERE h.es_publicidad = 0 ORDER BY h.wtf_score DESC
+    ''').fetchall()
+    historias = []
+    for row in rows:
+        h = dict(row)
+        h['youtube_url'] = f"https://www.youtube.com/watch?v={h['video_id']}&t={int(h['timestamp_inicio'])}s"
+        historias.append(h)
+    conn.close()
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump({"total": len(historias), "historias": historias}, f, ensure_ascii=False, indent=2)
+    return len(historias)
+
+
+def _measure(func, *args) -> tuple:
+    """
+    (segundos, pico de memoria en MB) de una función. Corre dos veces:
+    tracemalloc hace todo mucho más lento y distorsionaría el tiempo.
+    """
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 1e6
+
+
+def benchmark_export(n: int = 50000):
+    """Tiempo y memoria del export anterior contra el export en streaming"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            _synthetic_db(n)
+            print(f"📚 {n} historias sintéticas")
+            runs = {
+                'lista completa (anterior)': (_legacy_export, 'anterior/historias.json'),
+                'streaming json': (db.export_for_web, 'streaming/historias.json'),
+                'streaming json+ndjson+gz': (db.export_for_web, 'streaming/historias.json',
+                                             ('json', 'ndjson', 'json.gz', 'ndjson.gz')),
+            }
+            for name, (func, *args) in runs.items():
+                elapsed, peak = _measure(func, *args)
+                print(f"\n⚙️  {name}")
+                print(f"   Tiempo:           {elapsed:.2f} s")
+                print(f"   Pico de memoria:  {peak:.2f} MB")
+            for path in sorted(Path('.').rglob('historias.*')):
+                if path.suffix == '.db':
+                    continue
+                print(f"   📄 {path}: {path.stat().st_size / 1e6:.1f} MB")
+        finally:
+            os.chdir(cwd)
+
+
+
+def _vtt_time(seconds: float) -> str:
+    return f"{int(seconds // 3600):02d}:{int(seconds % 3600 // 60):02d}:{seconds % 60:06.3f}"
+
+
+def _synthetic_vtt(path: Path, rng: random.Random, cues: int):
+    """VTT como los automáticos de YouTube: cada cue repite la línea anterior"""
+    words = ('fantasma', 'luz', 'mala', 'ruta', 'camión', 'noche', 'cementerio', 'perro',
+             'abuela', 'ovni', 'sombra', 'campo', 'ruido', 'casa', 'puerta', 'grito')
+    lines = ["WEBVTT", "Kind: captions", "Language: es", ""]
+    previous = ''
+    for i in range(cues):
+        current = ' '.join(rng.choices(words, k=6))
+        lines += [f"{_vtt_time(i * 2.5)} --> {_vtt_time(i * 2.5 + 2.5)} align:start position:0%",
+                  previous, current, ""]
+        previous = current
+    path.write_text('\n'.join(lines), encoding='utf-8')
+
+
+def benchmark_import(n: int = 1000, cues: int = 3000):
+    """Import masivo de un volcado sintético de subtítulos"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            rng = random.Random(0)
+            dump = Path('volcado')
+            dump.mkdir()
+            for i in range(n):
+                _synthetic_vtt(dump / f"Programa {i} [v{i:010d}].es.vtt", rng, cues)
+            size = sum(p.stat().st_size for p in dump.iterdir()) / 1e6
+            print(f"📚 {n} archivos .vtt de {cues} cues ({size:.0f} MB), {os.cpu_count()} CPUs")
+
+            start = time.perf_counter()
+            result = bulk_import.import_dump(str(dump), output_dir='subtitulos')
+            parsed = time.perf_counter() - start
+            Path('data').mkdir()
+            bulk_import.register_videos(result['importados'], str(dump))
+            total = time.perf_counter() - start
+
+            print("\n⚙️  Import masivo")
+            print(f"   Parseo + normalización + escritura: {parsed:.1f} s")
+            print(f"   Registro (videos_input + status):  {(total - parsed) * 1000:.0f} ms")
+            print(f"   Archivos por segundo:              {n / total:.0f}")
+            print(f"   Estimado para 10.000 archivos:     {10000 / n * total / 60:.1f} min")
+            if result['errores']:
+                print(f"   ❌ Errores: {len(result['errores'])}")
+        finally:
+            os.chdir(cwd)
+
+
+
+COMPRESSION_CONFIGS = {
+    'texto plano': None,
+    'zlib': 'zlib-sin-diccionario',
+    'zlib + diccionario': 'zlib',
+    'zstd + diccionario': 'zstd',
+}
+SEARCH_TERMS = ['fantasma', 'luz', 'miedo', 'cementerio', 'noche']
+
+
+def _story_texts(n: int, sentences_per_story: int = 120) -> list:
+    """Historias de ~15 minutos armadas con oraciones reales de los subtítulos"""
+    sentences = []
+    for path in sorted(Path(SUBS_DIR).glob('*.json')):
+        with open(path, 'r', encoding='utf-8') as f:
+            sentences.extend(s['text'] for s in json.load(f)['segments'])
+    rng = random.Random(0)
+    return [' '.join(rng.choices(sentences, k=sentences_per_story)) for _ in range(n)]
+
+
+def _median_ms(func, args_list: list) -> float:
+    times = []
+    for args in args_list:
+        t0 = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000
+
+
+def benchmark_compression(n: int = 5000):
+    """Tamaño de la base y latencia de lectura con y sin compresión del texto"""
+    texts = _story_texts(n)
+    cwd = os.getcwd()
+    print(f"📚 {n} historias sintéticas ({sum(len(t.encode('utf-8')) for t in texts) / 1e6:.1f} MB de texto)")
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            for name, mode in COMPRESSION_CONFIGS.items():
+                if mode == 'zstd' and zstandard is None:
+                    print(f"\n⏭️ {name}: falta zstandard (pip install zstandard)")
+                    continue
+                os.chdir(tmp)
+                Path(name.replace(' ', '_').replace('+', '')).mkdir()
+                os.chdir(name.replace(' ', '_').replace('+', ''))
+                db.init_db(stemming=False)
+                conn = db.get_connection()
+                conn.execute("INSERT INTO videos (video_id, url, titulo) VALUES ('sintetico', '', 'Video sintético')")
+                codec = TextCodec(None) if mode == 'zlib-sin-diccionario' else None
+                conn.executemany(
+                    '''INSERT INTO historias (video_id, timestamp_inicio, texto_completo, texto_comprimido, wtf_score)
+                       VALUES ('sintetico', ?, ?, ?, ?)''',
+                    ((i * 60.0, *db._text_columns(codec, t), (i % 100) / 100) for i, t in enumerate(texts)))
+                db.index_fts(conn, 'historias_fts')
+                conn.commit()
+                conn.close()
+                if mode in ('zlib', 'zstd'):
+                    db.compress_texts(mode)
+
+                conn = db.get_connection()
+                conn.execute("INSERT INTO historias_fts(historias_fts) VALUES('optimize')")
+                conn.commit()
+                conn.execute('VACUUM')
+                size = os.path.getsize(db.DB_PATH) / 1e6
+                text_bytes = conn.execute(
+                    'SELECT SUM(LENGTH(texto_completo)) + COALESCE(SUM(LENGTH(texto_comprimido)), 0) FROM historias'
+                ).fetchone()[0] / 1e6
+                rng = random.Random(1)
+                ids = [(rng.randint(1, n),) for _ in range(500)]
+                read = _median_ms(lambda i: conn.execute(
+                    f"SELECT {db.TEXT_SQL.format(row='')} FROM historias WHERE id = ?", (i,)).fetchone(), ids)
+                conn.close()
+                search = _median_ms(db.search_historias_page, [(t, 20) for t in SEARCH_TERMS * 10])
+
+                print(f"\n⚙️  {name}")
+                print(f"   Base de datos:      {size:.1f} MB (texto: {text_bytes:.1f} MB)")
+                print(f"   Leer un texto:      {read:.3f} ms (mediana)")
+                print(f"   Página de búsqueda: {search:.2f} ms (mediana, 20 resultados)")
+        finally:
+            os.chdir(cwd)
+
+
+def _retained(build) -> tuple:
+    """(segundos, MB que quedan ocupados) de lo que arma `build()`"""
+    start = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    result = build()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return elapsed, retained / 1e6
+
+
+def benchmark_memory(episodes: int = 100):
+    """Memoria de los episodios en memoria: dicts del JSON contra modelos"""
+    subtitles = [p.read_text(encoding='utf-8') for p in sorted(Path(SUBS_DIR).glob('*.json'))]
+    segmentations = [p.read_text(encoding='utf-8') for p in sorted(Path('data/segmentacion').glob('*.json'))]
+    copies = max(episodes // max(len(subtitles), 1), 1)
+    total = sum(len(json.loads(raw)['segments']) for raw in subtitles) * copies
+    print(f"📚 {len(subtitles) * copies} episodios, {total} subtítulos")
+
+    # Cada copia se decodifica de nuevo: los textos no se comparten entre copias
+    runs = {
+        'subtítulos como dicts': lambda: [json.loads(raw)['segments']
+                                          for raw in subtitles for _ in range(copies)],
+        'subtítulos como SegmentArray': lambda: [SegmentArray.from_dicts(json.loads(raw)['segments'])
+                                                 for raw in subtitles for _ in range(copies)],
+        'historias como dicts': lambda: [json.loads(raw)['historias']
+                                         for raw in segmentations for _ in range(copies)],
+        'historias como Story': lambda: [[Story.from_dict(h) for h in json.loads(raw)['historias']]
+                                         for raw in segmentations for _ in range(copies)],
+    }
+    results = {}
+    for name, build in runs.items():
+        results[name] = _retained(build)
+        elapsed, mb = results[name]
+        print(f"\n⚙️  {name}")
+        print(f"   Memoria retenida: {mb:.1f} MB")
+        print(f"   Tiempo de carga:  {elapsed:.2f} s")
+
+    for kind, before, after in (('subtítulos', 'como dicts', 'como SegmentArray'),
+                                ('historias', 'como dicts', 'como Story')):
+        mb_before = results[f"{kind} {before}"][1]
+        mb_after = results[f"{kind} {after}"][1]
+        if mb_before:
+            print(f"\n📉 {kind}: {mb_before:.1f} → {mb_after:.1f} MB ({mb_after / mb_before - 1:+.0%})")
+
+
+def _dedup_corpus(texts: list, rng: random.Random) -> tuple:
+    """(textos, pares plantados): un 5% de las historias repite otra con un 10% de palabras perdidas"""
+    texts = list(texts)
+    n = len(texts)
+    planted = set()
+    for i in rng.sample(range(n), n // 20):
+        j = rng.randrange(n)
+        if j == i:
+            continue
+        texts[i] = ' '.join(w for w in texts[j].split() if rng.random() > 0.1)
+        planted.add((min(i, j) + 1, max(i, j) + 1))
+    return texts, planted
+
+
+def benchmark_dedup(n: int = 20000):
+    """Escala del índice de duplicados: tiempo y pares comparados con N/2 y N historias"""
+    corpus = _story_texts(n + 30)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            for size in (n // 2, n):
+                os.chdir(tmp)
+                Path(str(size)).mkdir()
+                os.chdir(str(size))
+                texts, planted = _dedup_corpus(corpus[:size], random.Random(size))
+                db.init_db(stemming=False)
+                conn = db.get_connection()
+                conn.execute("INSERT INTO videos (video_id, url, titulo) VALUES ('sintetico', '', 'Video sintético')")
+                conn.executemany(
+                    "INSERT INTO historias (video_id, timestamp_inicio, texto_completo) VALUES ('sintetico', ?, ?)",
+                    ((i * 60.0, t) for i, t in enumerate(texts)))
+                conn.commit()
+
+                start = time.perf_counter()
+                stats = dedup.index_duplicates(threshold=dedup.DEFAULT_THRESHOLD)
+                elapsed = time.perf_counter() - start
+                found = {(a, b) for a, b in conn.execute('SELECT historia_a, historia_b FROM duplicados_pares')}
+
+                # Un video nuevo (30 historias) sobre el índice ya armado
+                extra = corpus[-30:]
+                conn.executemany(
+                    "INSERT INTO historias (video_id, timestamp_inicio, texto_completo) VALUES ('sintetico', ?, ?)",
+                    (((size + i) * 60.0, t) for i, t in enumerate(extra)))
+                conn.commit()
+                conn.close()
+                start = time.perf_counter()
+                dedup.index_duplicates(threshold=dedup.DEFAULT_THRESHOLD)
+                incremental = time.perf_counter() - start
+
+                hits = len(found & planted)
+                all_pairs = size * (size - 1) // 2
+                print(f"\n⚙️  {size} historias ({len(planted)} repeticiones plantadas)")
+                print(f"   Indexar todo:       {elapsed:.1f} s ({size / elapsed:.0f} historias/s)")
+                print(f"   Pares comparados:   {stats['candidatas']} de {all_pairs} posibles "
+                      f"({stats['candidatas'] / all_pairs:.5%})")
+                print(f"   Precision / recall: {hits / len(found) if found else 0:.3f} / "
+                      f"{hits / len(planted) if planted else 0:.3f}")
+                print(f"   Video nuevo (30):   {incremental * 1000:.0f} ms")
+        finally:
+            os.chdir(cwd)
+
+
+SERIES_TREND_TERM = 'chupacabras'
+SERIES_TREND_QUARTER = '2021-T3'
+SERIES_CATEGORIES = ['fantasmas', 'ovnis', 'criaturas', 'premoniciones', None]
+
+
+def _series_video(conn, v: int, texts: list, rng: random.Random, stories: int):
+    """Inserta el episodio sintético v (martes y viernes desde 2019-01-01)"""
+    fecha = (date(2019, 1, 1) + timedelta(days=7 * (v // 2) + 3 * (v % 2))).isoformat()
+    trending = series.periods(fecha)[2] == SERIES_TREND_QUARTER
+    conn.execute("INSERT INTO videos (video_id, url, fecha_emision) VALUES (?, '', ?)", (f"video{v:05d}", fecha))
+    conn.executemany('''
+        INSERT INTO historias (video_id, timestamp_inicio, texto_completo, categoria, wtf_score)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [(f"video{v:05d}", i * 300.0,
+           rng.choice(texts) + (f' el {SERIES_TREND_TERM}' if trending and rng.random() < 0.4 else ''),
+           rng.choice(SERIES_CATEGORIES), round(rng.random(), 2)) for i in range(stories)])
+
+
+def benchmark_series(episodes: int = 300, stories: int = 20):
+    """Series de tiempo: construcción completa contra actualización incremental"""
+    texts = _story_texts(500, sentences_per_story=60)
+    rng = random.Random(0)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            os.chdir(tmp)
+            db.init_db(stemming=False)
+            conn = db.get_connection()
+            for v in range(episodes):
+                _series_video(conn, v, texts, rng, stories)
+            conn.commit()
+
+            start = time.perf_counter()
+            full = series.refresh_series(rebuild=True)
+            full_time = time.perf_counter() - start
+
+            _series_video(conn, episodes, texts, rng, stories)
+            conn.commit()
+            conn.close()
+            start = time.perf_counter()
+            incremental = series.refresh_series()
+            incremental_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            series.refresh_series()
+            noop_time = time.perf_counter() - start
+
+            columns = series.series_columns()
+            quarters = columns['trimestres']
+            top = quarters['terminos'][quarters['trimestre'].index(SERIES_TREND_QUARTER)][:3]
+            payload = json.dumps(columns, separators=(',', ':'))
+        finally:
+            os.chdir(cwd)
+
+    print(f"\n⚙️  {episodes} episodios, {episodes * stories} historias")
+    print(f"   Desde cero:        {full_time:.2f} s ({full['semanas']} semanas, {full['meses']} meses, "
+          f"{full['trimestres']} trimestres)")
+    print(f"   Episodio nuevo:    {incremental_time * 1000:.0f} ms ({incremental['semanas']} semana, "
+          f"{incremental['meses']} mes, {incremental['trimestres']} trimestre)")
+    print(f"   Sin cambios:       {noop_time * 1000:.0f} ms")
+    print(f"   En alza {SERIES_TREND_QUARTER}:  {', '.join(top)} (plantado: {SERIES_TREND_TERM})")
+    print(f"   series.json:       {len(payload) / 1024:.1f} KB")
+
+
+SUPERVISION_CLASSES = {
+    'fantasmas': (0.35, ['fantasma', 'espiritu', 'aparecio', 'cementerio', 'velorio', 'difunto']),
+    'ovnis': (0.2, ['ovni', 'nave', 'luces', 'cielo', 'extraterrestre', 'platillo']),
+    'criaturas': (0.15, ['lobison', 'duende', 'bicho', 'criatura', 'pelos', 'monte']),
+    'premoniciones': (0.1, ['sueño', 'soñe', 'presentimiento', 'avisar', 'sabia', 'premonicion']),
+    'brujeria': (0.07, ['bruja', 'gualicho', 'ritual', 'embrujo', 'curandera', 'hechizo']),
+    'fenomenos_fisicos': (0.05, ['golpes', 'puerta', 'ruidos', 'objetos', 'luz', 'cayo']),
+    'no_historia': (0.08, []),
+}
+SUPERVISION_STEPS = (25, 50, 100, 200)
+
+
+def _supervision_corpus(n: int, rng: random.Random) -> tuple:
+    """(textos, clases): oraciones reales con 1-6 palabras de la categoría y hasta una de otra"""
+    sentences = _story_texts(n, sentences_per_story=8)
+    names = list(SUPERVISION_CLASSES)
+    weights = [SUPERVISION_CLASSES[c][0] for c in names]
+    texts, labels = [], []
+    for text in sentences:
+        label = rng.choices(names, weights)[0]
+        words = SUPERVISION_CLASSES[label][1]
+        other = SUPERVISION_CLASSES[rng.choice(names)][1]
+        extra = rng.choices(words, k=rng.randint(1, 6)) if words else []
+        extra += rng.choices(other, k=rng.randint(0, 1)) if other else []
+        texts.append(' '.join([text] + extra))
+        labels.append(label)
+    return texts, labels
+
+
+def _supervision_accuracy(vectors, labels: list, labeled: list, test: list) -> float:
+    """Precisión en `test` del clasificador entrenado sólo con `labeled`"""
+    queue = active_learning.ReviewQueue(list(range(len(labeled))), vectors[labeled],
+                                        [labels[i] for i in labeled])
+    predicted = queue.predict(vectors[test])
+    return sum(p == labels[i] for p, i in zip(predicted, test)) / len(test)
+
+
+def benchmark_supervision(n: int = 3000):
+    """Precisión del clasificador por historia supervisada: orden del archivo contra cola activa"""
+    rng = random.Random(0)
+    texts, labels = _supervision_corpus(n + 1000, rng)
+    start = time.perf_counter()
+    idf = active_learning.document_frequencies(texts[:n])
+    vectors = active_learning.embed(texts, idf)
+    embed_time = time.perf_counter() - start
+    pool, test = list(range(n)), list(range(n, n + 1000))
+
+    queue = active_learning.ReviewQueue(pool, vectors[:n], [None] * n)
+    active = []
+    update_times = []
+    while len(active) < SUPERVISION_STEPS[-1]:
+        start = time.perf_counter()
+        key = queue.next()
+        queue.label(key, labels[key])
+        active.append(key)
+        update_times.append(time.perf_counter() - start)
+
+    counts = {c: labels[:n].count(c) for c in SUPERVISION_CLASSES}
+    print(f"\n⚙️  {n} historias sin etiquetar, 1000 de prueba")
+    print(f"   Clases: {', '.join(f'{c} {k / n:.0%}' for c, k in counts.items())}")
+    print(f"   Vectores:          {embed_time * 1000:.0f} ms ({n + 1000} historias)")
+    print(f"   Actualizar cola:   {statistics.median(update_times) * 1000:.1f} ms por etiqueta (elegir + actualizar, mediana)")
+    print(f"\n   {'Supervisadas':>12}  {'Orden archivo':>13}  {'Cola activa':>11}  {'Clases vistas':>13}")
+    for step in SUPERVISION_STEPS:
+        sequential = _supervision_accuracy(vectors, labels, pool[:step], test)
+        ranked = _supervision_accuracy(vectors, labels, active[:step], test)
+        seen = f"{len(set(labels[i] for i in pool[:step]))} / {len(set(labels[i] for i in active[:step]))}"
+        print(f"   {step:>12}  {sequential:>13.1%}  {ranked:>11.1%}  {seen:>13}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ('fts', 'export', 'importar', 'compresion', 'memoria',
+                                                 'duplicados', 'series', 'supervision'):
+        print("Uso: python3 scripts/benchmark.py fts [--copias N]")
+        print("     python3 scripts/benchmark.py export [--historias N]")
+        print("     python3 scripts/benchmark.py importar [--archivos N]")
+        print("     python3 scripts/benchmark.py compresion [--historias N]")
+        print("     python3 scripts/benchmark.py memoria [--episodios N]")
+        print("     python3 scripts/benchmark.py duplicados [--historias N]")
+        print("     python3 scripts/benchmark.py series [--episodios N]")
+        print("     python3 scripts/benchmark.py supervision [--historias N]")
+        sys.exit(1)
+
+    if sys.argv[1] == 'fts':
+        copies = int(sys.argv[sys.argv.index('--copias') + 1]) if '--copias' in sys.argv else 20
+        benchmark_fts(copies)
+    elif sys.argv[1] == 'export':
+        n = int(sys.argv[sys.argv.index('--historias') + 1]) if '--historias' in sys.argv else 50000
+        benchmark_export(n)
+    elif sys.argv[1] == 'importar':
+        n = int(sys.argv[sys.argv.index('--archivos') + 1]) if '--archivos' in sys.argv else 1000
+        benchmark_import(n)
+    elif sys.argv[1] == 'compresion':
+        n = int(sys.argv[sys.argv.index('--historias') + 1]) if '--historias' in sys.argv else 5000
+        benchmark_compression(n)
+    elif sys.argv[1] == 'memoria':
+        n = int(sys.argv[sys.argv.index('--episodios') + 1]) if '--episodios' in sys.argv else 100
+        benchmark_memory(n)
+    elif sys.argv[1] == 'duplicados':
+        n = int(sys.argv[sys.argv.index('--historias') + 1]) if '--historias' in sys.argv else 20000
+        benchmark_dedup(n)
+    elif sys.argv[1] == 'series':
+        n = int(sys.argv[sys.argv.index('--episodios') + 1]) if '--episodios' in sys.argv else 300
+        benchmark_series(n)
+    else:
+        n = int(sys.argv[sys.argv.index('--historias') + 1]) if '--historias' in sys.argv else 3000
+        benchmark_supervision(n)
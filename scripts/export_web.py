@@ -1,128 +1,95 @@
 #!/usr/bin/env python3
 """
 Exporta las historias clasificadas a formato JSON para la web.
+
+    python3 scripts/export_web.py [--fuente archivos|db] [--formatos json,json.gz,ndjson,fragmentos] [--todas] [--delta]
+                                  [--colapsar-duplicados] [--con-texto]
+
+Por defecto lee los archivos de segmentación y exporta sólo las historias
+supervisadas. Con --delta además publica una versión nueva en
+web/data/versiones/ con el parche desde la anterior (lo que usa la web para
+bajar sólo las diferencias). Con --colapsar-duplicados cada historia contada
+en varios episodios aparece una sola vez, con las otras emisiones (grupos de
+src/dedup.py, en la base). Con --con-texto cada historia lleva su texto y su
+mapa de tiempos: la web busca también en el texto y el botón "Escuchar" va al
+segundo en que se dice lo buscado (el export pesa mucho más). El trabajo lo
+hace el motor de src/exporter.py.
+
+Si hay base, también escribe web/data/series.json con las series de tiempo
+por fecha de emisión (src/series.py) en columnas, para los gráficos.
 """
 import json
+import sys
 from pathlib import Path
 from datetime import datetime
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.db import init_db
+from src.dedup import load_duplicate_groups
+from src.exporter import FORMATS, ExportEngine, FilesystemSource, SQLiteSource
+from src.series import SERIES_PATH, export_series
 
-def load_pipeline_status() -> dict:
-    """Carga el estado del pipeline"""
-    with open("data/pipeline_status.json", 'r', encoding='utf-8') as f:
-        return json.load(f)
-
-
-def load_segmentation(video_id: str) -> dict:
-    """Carga la segmentación de un video"""
-    path = f"data/segmentacion/{video_id}.json"
-    try:
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {'historias': []}
-
-
-def load_video_info(video_id: str) -> dict:
-    """Carga info del video desde videos_input.json"""
-    try:
-        with open("data/videos_input.json", 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            for video in data.get('videos', []):
-                if video.get('id') == video_id:
-                    return video
-    except FileNotFoundError:
-        pass
-    return {}
+OUTPUT_PATH = "web/data/historias.json"
+STATUS_PATH = "data/pipeline_status.json"
 
 
-def export_for_web():
-    """
-    Exporta todas las historias clasificadas a web/data/historias.json
-    """
-    print("\n📤 Exportando historias para la web...")
-    
-    status = load_pipeline_status()
-    all_historias = []
+def mark_exported():
+    """Marca los videos del pipeline como exportados"""
+    with open(STATUS_PATH, 'r', encoding='utf-8') as f:
+        status = json.load(f)
     
-    for video in status['videos']:
-        video_id = video['video_id']
-        
-        # Cargar segmentación
-        seg_data = load_segmentation(video_id)
-        video_info = load_video_info(video_id)
-        
-        fecha_emision = video.get('fecha_emision') or video_info.get('fecha', '')
-        titulo_video = video.get('titulo') or video_info.get('titulo', '')
-        
-        for historia in seg_data.get('historias', []):
-            clf = historia.get('clasificacion', {})
-            
-            # Solo exportar historias clasificadas y que son historias reales
-            if not clf.get('verificado_humano') or not clf.get('es_historia', True):
-                continue
-            
-            # Construir URL de YouTube
-            timestamp = int(historia['timestamp_inicio'])
-            youtube_url = f"https://www.youtube.com/watch?v={video_id}&t={timestamp}s"
-            
-            export_historia = {
-                'id': len(all_historias) + 1,
-                'video_id': video_id,
-                'video_titulo': titulo_video,
-                'timestamp_inicio': historia['timestamp_inicio'],
-                'timestamp_fin': historia.get('timestamp_fin', historia['timestamp_inicio'] + 300),
-                'timestamp_fmt': historia.get('timestamp_fmt', ''),
-                'titulo_inferido': clf.get('titulo', 'Historia sin título'),
-                'resumen': clf.get('resumen', ''),
-                'categoria': clf.get('categoria', 'otros'),
-                'subcategoria': clf.get('subcategoria', 'general'),
-                'tipo_narrador': clf.get('tipo_narrador', 'oyente'),
-                'wtf_score': clf.get('wtf_score', 0.5),
-                'verificado_humano': True,
-                'fecha_emision': fecha_emision,
-                'youtube_url': youtube_url
-            }
-            
-            all_historias.append(export_historia)
-    
-    # Ordenar por WTF score (más alto primero)
-    all_historias.sort(key=lambda x: x['wtf_score'], reverse=True)
-    
-    # Construir archivo de exportación
-    export_data = {
-        'generated_at': datetime.now().isoformat(),
-        'total': len(all_historias),
-        'historias': all_historias
-    }
-    
-    # Guardar
-    output_path = Path("web/data/historias.json")
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(export_data, f, ensure_ascii=False, indent=2)
-    
-    print(f"   ✅ Exportadas {len(all_historias)} historias a {output_path}")
-    
-    # Actualizar estado del pipeline
     for video in status['videos']:
         video['estado']['exportado_web'] = 'completado'
     
     status['ultima_actualizacion'] = datetime.now().isoformat()
     
-    with open("data/pipeline_status.json", 'w', encoding='utf-8') as f:
+    with open(STATUS_PATH, 'w', encoding='utf-8') as f:
         json.dump(status, f, ensure_ascii=False, indent=2)
+
+
+def export_for_web(formats: tuple = ('json',), fuente: str = 'archivos', solo_verificadas: bool = True,
+                   colapsar_duplicados: bool = False, incluir_texto: bool = False) -> int:
+    """
+    Exporta las historias a web/data/historias.json (y las variantes pedidas)
+    """
+    print("\n📤 Exportando historias para la web...")
     
-    print("   📊 Pipeline status actualizado")
+    if fuente == 'db':
+        init_db()  # Bases anteriores a entidades, series, etc.
+        source = SQLiteSource(solo_verificadas=solo_verificadas, incluir_texto=incluir_texto)
+    else:
+        source = FilesystemSource(STATUS_PATH, solo_verificadas=solo_verificadas,
+                                  incluir_texto=incluir_texto)
+    
+    duplicates = None
+    if colapsar_duplicados:
+        duplicates = load_duplicate_groups()
+        print(f"   🔁 {len({m[0] for m in duplicates.values()})} grupos de historias repetidas")
+    
+    summary = ExportEngine(source, duplicates=duplicates).export(OUTPUT_PATH, formats)
+    
+    print(f"   ✅ Exportadas {summary['total']} historias ({', '.join(formats)})")
+    if len(set(summary['totales'].values())) > 1:
+        print(f"      {', '.join(f'{fmt}: {n}' for fmt, n in summary['totales'].items())}")
+    for path in summary['escritos']:
+        print(f"      📝 {path}")
+    if summary['sin_cambios']:
+        print(f"      ⏭️ {len(summary['sin_cambios'])} archivos sin cambios")
+    if export_series():
+        print(f"      📈 {SERIES_PATH}")
     
-    return len(all_historias)
+    # Actualizar estado del pipeline
+    if fuente == 'archivos':
+        mark_exported()
+        print("   📊 Pipeline status actualizado")
+    
+    return summary['total']
 
 
 def print_stats():
     """Imprime estadísticas del dataset"""
     try:
-        with open("web/data/historias.json", 'r', encoding='utf-8') as f:
+        with open(OUTPUT_PATH, 'r', encoding='utf-8') as f:
             data = json.load(f)
     except FileNotFoundError:
         print("   ❌ No hay datos exportados aún")
@@ -144,20 +111,37 @@ def print_stats():
         print(f"      {cat}: {count}")
     
     # WTF promedio
-    if historias:
-        avg_wtf = sum(h.get('wtf_score', 0.5) for h in historias) / len(historias)
+    scores = [h['wtf_score'] for h in historias if h.get('wtf_score') is not None]
+    if scores:
+        avg_wtf = sum(scores) / len(scores)
         print(f"\n   WTF Score promedio: {avg_wtf:.2f}")
     
     # Top 5 más WTF
     print("\n   🔥 Top 5 más WTF:")
     for h in historias[:5]:
-        print(f"      [{h['wtf_score']:.2f}] {h['titulo_inferido'][:50]}...")
+        print(f"      [{h['wtf_score'] or 0:.2f}] {h['titulo_inferido'][:50]}...")
 
 
 if __name__ == "__main__":
-    count = export_for_web()
-    if count > 0:
+    formats = ('json',)
+    if '--formatos' in sys.argv:
+        formats = tuple(sys.argv[sys.argv.index('--formatos') + 1].split(','))
+        unknown = set(formats) - set(FORMATS)
+        if unknown:
+            print(f"❌ Formatos desconocidos: {', '.join(sorted(unknown))} (válidos: {', '.join(FORMATS)})")
+            sys.exit(1)
+    if '--delta' in sys.argv and 'delta' not in formats:
+        formats += ('delta',)
+    fuente = sys.argv[sys.argv.index('--fuente') + 1] if '--fuente' in sys.argv else 'archivos'
+    if fuente not in ('archivos', 'db'):
+        print("❌ --fuente debe ser 'archivos' o 'db'")
+        sys.exit(1)
+    
+    count = export_for_web(formats, fuente, solo_verificadas='--todas' not in sys.argv,
+                           colapsar_duplicados='--colapsar-duplicados' in sys.argv,
+                           incluir_texto='--con-texto' in sys.argv)
+    if count > 0 and 'json' in formats:
         print_stats()
-    else:
+    elif count == 0:
         print("\n   ⚠️ No hay historias supervisadas para exportar")
         print("   Ejecutá primero: python3 scripts/supervise.py <video_id>")
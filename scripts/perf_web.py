@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Test de performance de la web en un navegador headless.
+
+    python3 scripts/perf_web.py [--historias N] [--presupuesto-ms MS]
+
+Genera un export sintético de N historias (50.000 por defecto) con el motor
+de src/exporter.py, sirve una copia de web/ con ese export y, con Playwright
+(Chromium headless), mide los tiempos de frame mientras se scrollea la grilla
+y mientras se escribe en el buscador. Falla si el p95 supera el presupuesto
+o si la grilla tiene demasiadas tarjetas en el DOM (no está virtualizada).
+
+Requiere: pip install playwright && playwright install chromium
+"""
+import random
+import shutil
+import sys
+import tempfile
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.exporter import ExportEngine, Source, web_historia
+
+try:
+    from playwright.sync_api import sync_playwright
+except ImportError:
+    sync_playwright = None
+
+WEB_DIR = Path(__file__).parent.parent / "web"
+DEFAULT_STORIES = 50000
+FRAME_BUDGET_MS = 50          # p95 de frame aceptable (≈ 20 fps en el peor caso)
+MAX_CARDS_IN_DOM = 200
+SCROLL_FRAMES = 300
+SEARCH_TEXT = "fantasma en la ruta"
+
+WORDS = ('fantasma', 'luz', 'mala', 'ruta', 'camión', 'noche', 'cementerio', 'perro',
+         'abuela', 'ovni', 'sombra', 'campo', 'ruido', 'casa', 'puerta', 'grito')
+CATEGORIES = ('fantasmas', 'ovnis', 'criaturas', 'premoniciones', 'brujeria', 'otros')
+
+
+class SyntheticSource(Source):
+    """Historias inventadas, repartidas en videos de 30 historias"""
+
+    def __init__(self, n: int, seed: int = 0):
+        self.n = n
+        self.rng = random.Random(seed)
+
+    def videos(self) -> list:
+        return [(f"video{v:05d}", None) for v in range((self.n + 29) // 30)]
+
+    def iter_video(self, video_id: str):
+        v = int(video_id[5:])
+        for i in range(v * 30, min((v + 1) * 30, self.n)):
+            words = self.rng.choices(WORDS, k=40)
+            yield web_historia(
+                video_id, (i % 30) * 240.0, None,
+                ' '.join(words[:6]).capitalize(), ' '.join(words[6:]) + '.',
+                self.rng.choice(CATEGORIES), 'general', 'oyente',
+                round(self.rng.random(), 2), True, f"Programa {v}",
+                f"20{10 + v % 15:02d}-{1 + v % 12:02d}-{1 + v % 28:02d}"
+            )
+
+
+# Se ejecuta dentro de la página: scrollea un paso por frame y devuelve la
+# duración de cada frame en ms
+SCROLL_JS = """
+async (frames) => {
+    const times = [];
+    let last = performance.now();
+    for (let i = 0; i < frames; i++) {
+        window.scrollBy(0, 600);
+        await new Promise(r => requestAnimationFrame(r));
+        const now = performance.now();
+        times.push(now - last);
+        last = now;
+    }
+    return times;
+}
+"""
+
+# Mide frames durante `ms` milisegundos (mientras corren búsquedas/filtros)
+FRAMES_JS = """
+async (ms) => {
+    const times = [];
+    const end = performance.now() + ms;
+    let last = performance.now();
+    while (performance.now() < end) {
+        await new Promise(r => requestAnimationFrame(r));
+        const now = performance.now();
+        times.push(now - last);
+        last = now;
+    }
+    return times;
+}
+"""
+
+
+def percentile(values: list, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * p), len(ordered) - 1)]
+
+
+def report(name: str, times: list, budget: float) -> bool:
+    """Imprime p50/p95/máximo y devuelve si el p95 está dentro del presupuesto"""
+    p95 = percentile(times, 0.95)
+    ok = p95 <= budget
+    print(f"   {'✅' if ok else '❌'} {name}: p50 {percentile(times, 0.5):.1f} ms · "
+          f"p95 {p95:.1f} ms · máx {max(times):.1f} ms ({len(times)} frames)")
+    return ok
+
+
+def serve(directory: Path) -> ThreadingHTTPServer:
+    handler = partial(SimpleHTTPRequestHandler, directory=str(directory))
+    handler.log_message = lambda *args: None
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(n: int, budget: float) -> bool:
+    with tempfile.TemporaryDirectory() as tmp:
+        site = Path(tmp) / "web"
+        shutil.copytree(WEB_DIR, site)
+        summary = ExportEngine(SyntheticSource(n), ids_path=f"{tmp}/ids.json").export(
+            str(site / "data" / "historias.json"))
+        size = (site / "data" / "historias.json").stat().st_size / 1e6
+        print(f"📚 Export sintético: {summary['total']} historias ({size:.1f} MB)")
+
+        server = serve(site)
+        url = f"http://127.0.0.1:{server.server_address[1]}/index.html"
+        ok = True
+        try:
+            with sync_playwright() as p:
+                browser = p.chromium.launch()
+                page = browser.new_page(viewport={'width': 1280, 'height': 900})
+                page.goto(url)
+                page.wait_for_function(f"document.getElementById('resultsCount').textContent == '{n}'",
+                                       timeout=60000)
+
+                cards = page.eval_on_selector_all('#storiesGrid .story-card', 'els => els.length')
+                print(f"   🃏 Tarjetas en el DOM: {cards}")
+                ok &= cards <= MAX_CARDS_IN_DOM
+
+                ok &= report("Scroll", page.evaluate(SCROLL_JS, SCROLL_FRAMES), budget)
+
+                page.evaluate("window.scrollTo(0, 0)")
+                page.type('#searchInput', SEARCH_TEXT, delay=60)
+                ok &= report("Búsqueda", page.evaluate(FRAMES_JS, 1500), budget)
+
+                page.click('.tab[data-sort="recent"]')
+                ok &= report("Orden por fecha", page.evaluate(FRAMES_JS, 1000), budget)
+
+                browser.close()
+        finally:
+            server.shutdown()
+        return ok
+
+
+if __name__ == "__main__":
+    if sync_playwright is None:
+        print("❌ Falta Playwright: pip install playwright && playwright install chromium")
+        sys.exit(2)
+
+    n = int(sys.argv[sys.argv.index('--historias') + 1]) if '--historias' in sys.argv else DEFAULT_STORIES
+    budget = (float(sys.argv[sys.argv.index('--presupuesto-ms') + 1])
+              if '--presupuesto-ms' in sys.argv else FRAME_BUDGET_MS)
+
+    print(f"⏱️  Presupuesto p95 por frame: {budget:.0f} ms")
+    passed = run(n, budget)
+    print("\n✅ Dentro del presupuesto" if passed else "\n❌ Fuera del presupuesto")
+    sys.exit(0 if passed else 1)
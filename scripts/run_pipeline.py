@@ -66,6 +66,13 @@ def run_ingest():
     subprocess.run(['python3', 'src/ingestor.py'])
 
 
+def run_import(directory: str):
+    """Importa un volcado local de subtítulos (yt-dlp)"""
+    print("\n📂 FASE 1: IMPORTACIÓN DE SUBTÍTULOS LOCALES")
+    print("─" * 40)
+    subprocess.run(['python3', 'src/bulk_import.py', directory])
+
+
 def run_segment(video_id: str = None):
     """Ejecuta la fase de segmentación"""
     print("\n🔍 FASE 2: SEGMENTACIÓN DE HISTORIAS")
@@ -97,6 +104,7 @@ USO:
 COMANDOS:
     status              Muestra el estado actual del pipeline
     ingest              Descarga subtítulos de todos los videos pendientes
+    import <directorio> Importa subtítulos .vtt/.srv3/.json3 ya descargados
     segment [video_id]  Segmenta historias (todos o video específico)
     supervise <video_id> Abre el CLI de supervisión para un video
     export              Exporta historias clasificadas a la web
@@ -129,6 +137,13 @@ def main():
     elif command == 'ingest':
         run_ingest()
     
+    elif command == 'import':
+        if len(sys.argv) < 3:
+            print("❌ Falta el directorio")
+            print("   Uso: python3 scripts/run_pipeline.py import <directorio>")
+            return
+        run_import(sys.argv[2])
+    
     elif command == 'segment':
         video_id = sys.argv[2] if len(sys.argv) > 2 else None
         run_segment(video_id)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+API HTTP mínima sobre la base de datos, para recorrer el archivo por páginas.
+
+    python3 scripts/serve_api.py [puerto]
+
+Endpoints (JSON):
+    GET /api/historias?categoria=&subcategoria=&tipo_narrador=&wtf_min=&wtf_max=&verificadas=1&limite=&cursor=
+    GET /api/buscar?q=&limite=&cursor=
+    GET /api/facetas?categoria=&subcategoria=&tipo_narrador=&wtf_min=&verificadas=1&limite=
+
+Las respuestas paginadas traen `next_cursor`: se pasa tal cual en `cursor`
+para pedir la página siguiente (null cuando no hay más).
+"""
+import json
+import sqlite3
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.db import get_historias_page, init_db, search_facets, search_historias_page
+
+DEFAULT_PORT = 8081
+MAX_LIMIT = 500
+
+
+def _float(value: str | None) -> float | None:
+    """Parámetro numérico opcional"""
+    return float(value) if value not in (None, '') else None
+
+
+def _limit(params: dict, default: int) -> int:
+    """Tamaño de página pedido, acotado a MAX_LIMIT"""
+    return max(1, min(int(params.get('limite') or default), MAX_LIMIT))
+
+
+def handle_historias(params: dict) -> dict:
+    """Historias filtradas, ordenadas por WTF"""
+    return get_historias_page(
+        categoria=params.get('categoria'),
+        subcategoria=params.get('subcategoria'),
+        tipo_narrador=params.get('tipo_narrador'),
+        wtf_min=_float(params.get('wtf_min')),
+        wtf_max=_float(params.get('wtf_max')),
+        solo_verificadas=params.get('verificadas') == '1',
+        limit=_limit(params, 50),
+        after=params.get('cursor') or None,
+    )
+
+
+def handle_buscar(params: dict) -> dict:
+    """Búsqueda full-text, ordenada por relevancia"""
+    if not params.get('q'):
+        raise ValueError("Falta el parámetro q")
+    try:
+        page = search_historias_page(params['q'], _limit(params, 20), params.get('cursor') or None)
+    except sqlite3.OperationalError:
+        # q va tal cual al MATCH de FTS5: '"', 'AND', 'NOT x', '(' o ':' no compilan
+        raise ValueError("Consulta inválida")
+    for h in page['historias']:
+        h.pop('mapa_tiempos', None)
+    return page
+
+
+def handle_facetas(params: dict) -> dict:
+    """Conteos por faceta y primera página"""
+    return search_facets(
+        categoria=params.get('categoria'),
+        subcategoria=params.get('subcategoria'),
+        tipo_narrador=params.get('tipo_narrador'),
+        wtf_min=_float(params.get('wtf_min')),
+        solo_verificadas=params.get('verificadas') == '1',
+        limit=_limit(params, 50),
+    )
+
+
+ROUTES = {
+    '/api/historias': handle_historias,
+    '/api/buscar': handle_buscar,
+    '/api/facetas': handle_facetas,
+}
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        handler = ROUTES.get(url.path)
+        if handler is None:
+            return self._send(404, {'error': 'No encontrado'})
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        try:
+            return self._send(200, handler(params))
+        except ValueError as e:
+            return self._send(400, {'error': str(e)})
+
+    def _send(self, status: int, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT
+    init_db()
+    server = ThreadingHTTPServer(('', port), ApiHandler)
+    print(f"🌐 API en http://localhost:{port}/api/historias")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Chau")
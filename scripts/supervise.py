@@ -1,6 +1,13 @@
 #!/usr/bin/env python3
 """
 CLI de supervisión de historias - Permite revisar y corregir clasificaciones.
+
+    python3 scripts/supervise.py <video_id>    # un episodio, en orden
+    python3 scripts/supervise.py --cola [N]    # las N que más enseñan, de todos los episodios
+
+Con `--cola` el orden lo decide `src/active_learning.py`: primero las
+historias donde el clasificador duda y que se parecen poco a lo ya
+supervisado; la cola se actualiza después de cada respuesta.
 """
 import json
 import sys
@@ -8,6 +15,9 @@ from pathlib import Path
 from datetime import datetime
 import os
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.models import Classification, Story, json_default
+
 # Configuración
 CATEGORIAS = {
     '1': 'fantasmas',
@@ -44,17 +54,19 @@ def clear_screen():
 
 
 def load_segmentation(video_id: str) -> dict:
-    """Carga el archivo de segmentación"""
+    """Carga el archivo de segmentación (las historias como `Story`)"""
     path = f"data/segmentacion/{video_id}.json"
     with open(path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+        data = json.load(f)
+    data['historias'] = [Story.from_dict(h) for h in data.get('historias', [])]
+    return data
 
 
 def save_segmentation(video_id: str, data: dict):
     """Guarda el archivo de segmentación"""
     path = f"data/segmentacion/{video_id}.json"
     with open(path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+        json.dump(data, f, ensure_ascii=False, indent=2, default=json_default)
 
 
 def load_gold_dataset() -> list:
@@ -101,7 +113,7 @@ def update_pipeline_status(video_id: str, supervisadas: int, total: int):
         json.dump(status, f, ensure_ascii=False, indent=2)
 
 
-def display_story(story: dict, index: int, total: int, video_id: str):
+def display_story(story: Story, index: int, total: int, video_id: str):
     """Muestra una historia para supervisión"""
     clear_screen()
     
@@ -111,32 +123,32 @@ def display_story(story: dict, index: int, total: int, video_id: str):
     print()
     
     # URL de YouTube
-    timestamp = int(story['timestamp_inicio'])
+    timestamp = int(story.timestamp_inicio)
     url = f"https://youtube.com/watch?v={video_id}&t={timestamp}s"
     print(f"🔗 {url}")
-    print(f"⏱️  [{story['timestamp_fmt']}] - Duración: {int(story['duracion_segundos'])}s")
+    print(f"⏱️  [{story.timestamp_fmt}] - Duración: {int(story.duracion_segundos)}s")
     print()
     
     # Texto de la historia (primeros 500 caracteres)
     print("📝 TEXTO:")
     print("─" * 70)
-    texto = story.get('texto_completo', '')[:500]
+    texto = story.texto_completo[:500]
     # Formato mejorado
     print(texto)
-    if len(story.get('texto_completo', '')) > 500:
+    if len(story.texto_completo) > 500:
         print("...")
     print("─" * 70)
     print()
     
     # Clasificación actual si existe
-    if story.get('clasificacion'):
-        clf = story['clasificacion']
+    if story.clasificacion:
+        clf = story.clasificacion
         print("📊 CLASIFICACIÓN ACTUAL:")
-        print(f"   • Categoría:    {clf.get('categoria', '-')}")
-        print(f"   • Subcategoría: {clf.get('subcategoria', '-')}")
-        print(f"   • Narrador:     {clf.get('tipo_narrador', '-')}")
-        print(f"   • WTF Score:    {clf.get('wtf_score', '-')}")
-        print(f"   • Título:       {clf.get('titulo', '-')}")
+        print(f"   • Categoría:    {clf.categoria or '-'}")
+        print(f"   • Subcategoría: {clf.subcategoria or '-'}")
+        print(f"   • Narrador:     {clf.tipo_narrador or '-'}")
+        print(f"   • WTF Score:    {'-' if clf.wtf_score is None else clf.wtf_score}")
+        print(f"   • Título:       {clf.titulo or '-'}")
         print()
 
 
@@ -227,12 +239,12 @@ def get_summary_input(texto: str) -> str:
     return resumen[:500]
 
 
-def supervise_story(story: dict, index: int, total: int, video_id: str) -> dict | None | str:
+def supervise_story(story: Story, index: int, total: int, video_id: str) -> Classification | None | str:
     """
     Supervisa una historia individualmente.
     
     Returns:
-        dict: clasificación si se completó
+        Classification: si se completó
         None: si se descartó
         'skip': si se saltó
         'quit': si se quiere salir
@@ -262,19 +274,19 @@ def supervise_story(story: dict, index: int, total: int, video_id: str) -> dict
             subcategoria = get_subcategory_input(categoria)
             narrador = get_narrator_input()
             wtf_score = get_wtf_score()
-            titulo = get_title_input(story.get('texto_completo', ''))
-            resumen = get_summary_input(story.get('texto_completo', ''))
+            titulo = get_title_input(story.texto_completo)
+            resumen = get_summary_input(story.texto_completo)
             
-            clasificacion = {
-                'categoria': categoria,
-                'subcategoria': subcategoria,
-                'tipo_narrador': narrador,
-                'wtf_score': wtf_score,
-                'titulo': titulo,
-                'resumen': resumen,
-                'verificado_humano': True,
-                'fecha_supervision': datetime.now().isoformat()
-            }
+            clasificacion = Classification(
+                categoria=categoria,
+                subcategoria=subcategoria,
+                tipo_narrador=narrador,
+                wtf_score=wtf_score,
+                titulo=titulo,
+                resumen=resumen,
+                verificado_humano=True,
+                fecha_supervision=datetime.now().isoformat()
+            )
             
             # Confirmar
             print("\n" + "─" * 70)
@@ -296,6 +308,41 @@ def supervise_story(story: dict, index: int, total: int, video_id: str) -> dict
             print("   ❌ Opción inválida")
 
 
+def apply_result(historia: Story, result, video_id: str, gold_dataset: list) -> bool:
+    """
+    Guarda en la historia lo que respondió `supervise_story` (y en el gold
+    dataset si se clasificó). Devuelve True si quedó supervisada.
+    """
+    if result is None:
+        # Descartada - marcar como no-historia
+        historia.clasificacion = Classification(
+            es_historia=False,
+            verificado_humano=True,
+            fecha_supervision=datetime.now().isoformat()
+        )
+        return True
+    if isinstance(result, Classification):
+        # Clasificada
+        result.es_historia = True
+        historia.clasificacion = result
+        
+        # Agregar al gold dataset
+        gold_entry = {
+            'video_id': video_id,
+            'timestamp_inicio': historia.timestamp_inicio,
+            'timestamp_fin': historia.timestamp_fin,
+            'texto': historia.texto_completo,
+            **result.to_dict()
+        }
+        gold_dataset.append(gold_entry)
+        return True
+    return False
+
+
+def count_supervised(historias: list) -> int:
+    return sum(1 for h in historias if h.clasificacion and h.clasificacion.verificado_humano)
+
+
 def run_supervision(video_id: str):
     """
     Ejecuta el flujo de supervisión para un video.
@@ -309,17 +356,16 @@ def run_supervision(video_id: str):
         print("   Ejecutá primero: python3 src/segmenter.py {video_id}")
         return
     
-    historias = data.get('historias', [])
+    historias = data['historias']
     total = len(historias)
     
     print(f"   📚 {total} historias encontradas")
     
     # Cargar dataset gold existente
     gold_dataset = load_gold_dataset()
-    gold_ids = {(g['video_id'], g['timestamp_inicio']) for g in gold_dataset}
     
     # Contar supervisadas
-    supervisadas = sum(1 for h in historias if h.get('clasificacion', {}).get('verificado_humano'))
+    supervisadas = count_supervised(historias)
     
     print(f"   ✅ {supervisadas} ya supervisadas")
     print(f"   ⏳ {total - supervisadas} pendientes")
@@ -329,39 +375,18 @@ def run_supervision(video_id: str):
     
     # Procesar cada historia
     for i, historia in enumerate(historias):
-        # Saltar ya supervisadas
-        if historia.get('clasificacion', {}).get('verificado_humano'):
+        # Saltar ya supervisadas y cortes publicitarios
+        if historia.clasificacion and historia.clasificacion.verificado_humano:
+            continue
+        if historia.es_publicidad:
             continue
         
         result = supervise_story(historia, i, total, video_id)
         
         if result == 'quit':
             break
-        elif result == 'skip':
-            continue
-        elif result is None:
-            # Descartada - marcar como no-historia
-            historia['clasificacion'] = {
-                'es_historia': False,
-                'verificado_humano': True,
-                'fecha_supervision': datetime.now().isoformat()
-            }
-            supervisadas += 1
-        elif isinstance(result, dict):
-            # Clasificada
-            result['es_historia'] = True
-            historia['clasificacion'] = result
+        if apply_result(historia, result, video_id, gold_dataset):
             supervisadas += 1
-            
-            # Agregar al gold dataset
-            gold_entry = {
-                'video_id': video_id,
-                'timestamp_inicio': historia['timestamp_inicio'],
-                'timestamp_fin': historia['timestamp_fin'],
-                'texto': historia.get('texto_completo', ''),
-                **result
-            }
-            gold_dataset.append(gold_entry)
     
     # Guardar todo
     print("\n💾 Guardando cambios...")
@@ -375,13 +400,81 @@ def run_supervision(video_id: str):
     print()
 
 
+def run_queue_supervision(count: int = None):
+    """
+    Supervisa historias de todos los episodios en el orden de la cola de
+    aprendizaje activo. Los archivos de segmentación se cargan cuando la cola
+    llega a uno de sus episodios y se guardan todos al salir.
+    """
+    from src.active_learning import NOT_A_STORY, build_queue
+    
+    print("\n🎯 Armando cola de supervisión...")
+    queue, pool, computed = build_queue()
+    pending = len(queue.pending())
+    print(f"   📚 {len(pool)} historias en {len({p[0] for p in pool})} episodios "
+          f"({computed} vectores nuevos)")
+    print(f"   ⏳ {pending} pendientes")
+    if not pending:
+        return
+    print()
+    
+    input("Presioná Enter para comenzar...")
+    
+    gold_dataset = load_gold_dataset()
+    videos = {}
+    done = 0
+    total = min(count or pending, pending)
+    
+    while done < total:
+        key = queue.next()
+        if key is None:
+            break
+        video_id, inicio = key
+        if video_id not in videos:
+            videos[video_id] = load_segmentation(video_id)
+        historias = videos[video_id]['historias']
+        found = next(((i, h) for i, h in enumerate(historias) if h.timestamp_inicio == inicio), None)
+        if found is None:
+            # Resegmentado después de armar la cola: esa historia ya no existe
+            print(f"   ⏭️ {video_id} {int(inicio)}s ya no está en la segmentación")
+            queue.skip(key)
+            continue
+        i, historia = found
+        
+        result = supervise_story(historia, i, len(historias), video_id)
+        
+        if result == 'quit':
+            break
+        if apply_result(historia, result, video_id, gold_dataset):
+            queue.label(key, NOT_A_STORY if result is None else result.categoria)
+            done += 1
+        else:
+            queue.skip(key)
+    
+    # Guardar todo
+    print("\n💾 Guardando cambios...")
+    for video_id, data in videos.items():
+        save_segmentation(video_id, data)
+        update_pipeline_status(video_id, count_supervised(data['historias']), len(data['historias']))
+    save_gold_dataset(gold_dataset)
+    
+    print(f"\n✅ Sesión completada:")
+    print(f"   • Historias supervisadas: {done} en {len(videos)} episodios")
+    print(f"   • Gold dataset total: {len(gold_dataset)} historias")
+    print()
+
+
 def main():
     """Punto de entrada principal"""
     if len(sys.argv) < 2:
-        print("Uso: python3 scripts/supervise.py <video_id>")
+        print("Uso: python3 scripts/supervise.py <video_id> | --cola [N]")
         print("Ejemplo: python3 scripts/supervise.py n2BkstRXbV0")
         sys.exit(1)
     
+    if sys.argv[1] == '--cola':
+        run_queue_supervision(int(sys.argv[2]) if len(sys.argv) > 2 else None)
+        return
+    
     video_id = sys.argv[1]
     run_supervision(video_id)
 
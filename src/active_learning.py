@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Cola de supervisión con aprendizaje activo.
+
+En vez de recorrer las historias en el orden del archivo, `supervise.py
+--cola` pide primero las que más le enseñan al clasificador: aquellas en las
+que el modelo duda (poca diferencia entre las dos clases más probables),
+que están lejos de todo lo ya etiquetado (cubren zonas del espacio de
+textos que nadie miró) y que se parecen al resto del corpus (una historia
+rara, con palabras que no aparecen en otras, enseña poco aunque esté lejos).
+
+Cada historia se representa con un vector de EMBED_DIM valores: TF-IDF
+hasheado (HASH_DIM cubetas, sin vocabulario) proyectado con una matriz
+aleatoria fija, normalizado. El clasificador es una regresión logística
+multinomial sobre esos vectores (categorías + "no es historia"), entrenada
+con las historias verificadas de todos los videos.
+
+El puntaje de una historia es incertidumbre × distancia (coseno) a la
+etiquetada o elegida más cercana × densidad (similitud con el centroide de
+todas las historias). La cola se arma en lote con NumPy
+(`ranking`) y después de cada etiqueta se actualiza sin recalcular todo
+(`label`): la distancia mínima se actualiza con un solo vector, el modelo
+hace unos pasos de gradiente desde los pesos que ya tenía y se vuelven a
+puntuar las historias pendientes.
+
+Los vectores se guardan en data/cola_supervision.npz con el CRC de cada
+texto: al agregar o resegmentar videos sólo se calculan los que cambiaron
+(el IDF queda fijo hasta `--reconstruir`).
+
+    python3 src/active_learning.py [--cantidad N] [--reconstruir]
+"""
+import json
+import sys
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.db import ACCENT_FOLD, WORD_RE
+from src.models import Story
+
+
+SEG_DIR = "data/segmentacion"
+CACHE_PATH = "data/cola_supervision.npz"
+HASH_DIM = 1 << 12
+EMBED_DIM = 256
+MIN_WORD_LEN = 3
+SEED = 7
+BATCH = 256                   # Historias por multiplicación al calcular vectores
+NOT_A_STORY = 'no_historia'
+
+FIT_ITERATIONS = 300          # Entrenamiento completo
+UPDATE_ITERATIONS = 30        # Pasos después de cada etiqueta (desde los pesos actuales)
+LEARNING_RATE = 2.0
+L2 = 1e-3
+
+_PROJECTION = (np.random.RandomState(SEED).standard_normal((HASH_DIM, EMBED_DIM))
+               / np.sqrt(EMBED_DIM)).astype(np.float32)
+
+
+def text_crc(text: str) -> int:
+    return zlib.crc32((text or '').encode('utf-8'))
+
+
+def hashed_terms(text: str) -> tuple:
+    """(cubetas, cantidades) de las palabras de un texto"""
+    words = [w for w in WORD_RE.findall((text or '').lower().translate(ACCENT_FOLD))
+             if len(w) >= MIN_WORD_LEN]
+    buckets = np.fromiter((zlib.crc32(w.encode('utf-8')) % HASH_DIM for w in words),
+                          dtype=np.int64, count=len(words))
+    return np.unique(buckets, return_counts=True)
+
+
+def document_frequencies(texts: list) -> np.ndarray:
+    """IDF suavizado de cada cubeta sobre los textos"""
+    df = np.zeros(HASH_DIM, dtype=np.float64)
+    for text in texts:
+        df[hashed_terms(text)[0]] += 1
+    return (np.log((1 + len(texts)) / (1 + df)) + 1).astype(np.float32)
+
+
+def embed(texts: list, idf: np.ndarray) -> np.ndarray:
+    """Vectores normalizados (len(texts) × EMBED_DIM) de TF-IDF hasheado proyectado"""
+    result = np.zeros((len(texts), EMBED_DIM), dtype=np.float32)
+    for start in range(0, len(texts), BATCH):
+        chunk = texts[start:start + BATCH]
+        tfidf = np.zeros((len(chunk), HASH_DIM), dtype=np.float32)
+        for i, text in enumerate(chunk):
+            buckets, counts = hashed_terms(text)
+            tfidf[i, buckets] = np.log1p(counts) * idf[buckets]
+        result[start:start + len(chunk)] = tfidf @ _PROJECTION
+    norms = np.linalg.norm(result, axis=1, keepdims=True)
+    return result / np.maximum(norms, 1e-12)
+
+
+def story_label(story: Story) -> str | None:
+    """Etiqueta humana de una historia (None si no está verificada)"""
+    clf = story.clasificacion
+    if clf is None or not clf.verificado_humano:
+        return None
+    if clf.es_historia is False:
+        return NOT_A_STORY
+    return clf.categoria or 'otros'
+
+
+def load_pool(seg_dir: str = SEG_DIR) -> list:
+    """
+    Historias de todos los archivos de segmentación (sin publicidad):
+    [(video_id, timestamp_inicio, texto, etiqueta o None)]
+    """
+    pool = []
+    for path in sorted(Path(seg_dir).glob('*.json')):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for story in map(Story.from_dict, data.get('historias', [])):
+            if story.es_publicidad:
+                continue
+            pool.append((data.get('video_id', path.stem), story.timestamp_inicio,
+                         story.texto_completo, story_label(story)))
+    return pool
+
+
+def load_embeddings(pool: list, cache_path: str = CACHE_PATH, rebuild: bool = False) -> tuple:
+    """
+    Vectores de las historias del pool, reusando los del cache cuyo texto no
+    cambió.
+
+    Returns:
+        (vectores en el orden del pool, cantidad de historias calculadas)
+    """
+    cached = {}
+    idf = None
+    path = Path(cache_path)
+    if path.exists() and not rebuild:
+        with np.load(path) as data:
+            idf = data['idf']
+            for video_id, inicio, crc, vector in zip(data['video_ids'], data['inicios'],
+                                                     data['crcs'], data['vectores']):
+                cached[str(video_id), float(inicio)] = (int(crc), vector)
+    if idf is None or len(idf) != HASH_DIM:
+        idf = document_frequencies([texto for _, _, texto, _ in pool])
+        cached = {}
+
+    vectors = np.zeros((len(pool), EMBED_DIM), dtype=np.float32)
+    crcs = np.zeros(len(pool), dtype=np.int64)
+    missing = []
+    for i, (video_id, inicio, texto, _) in enumerate(pool):
+        crcs[i] = text_crc(texto)
+        hit = cached.get((video_id, float(inicio)))
+        if hit is not None and hit[0] == crcs[i]:
+            vectors[i] = hit[1]
+        else:
+            missing.append(i)
+    if missing:
+        vectors[missing] = embed([pool[i][2] for i in missing], idf)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(path, idf=idf, vectores=vectors, crcs=crcs,
+             video_ids=np.array([p[0] for p in pool], dtype=str),
+             inicios=np.array([p[1] for p in pool], dtype=np.float64))
+    return vectors, len(missing)
+
+
+class ReviewQueue:
+    """
+    Estado de la cola: vectores de todas las historias, etiquetas (-1 sin
+    etiqueta), pesos del clasificador y distancia de cada historia a la
+    etiquetada más cercana.
+    """
+
+    def __init__(self, keys: list, vectors: np.ndarray, labels: list):
+        self.keys = keys
+        self.index = {key: i for i, key in enumerate(keys)}
+        self.vectors = vectors
+        self.classes = sorted({label for label in labels if label is not None})
+        self.y = np.array([self.classes.index(l) if l is not None else -1 for l in labels], dtype=np.int64)
+        self.skipped = np.zeros(len(keys), dtype=bool)
+        self.weights = np.zeros((vectors.shape[1] + 1, max(len(self.classes), 1)), dtype=np.float64)
+        self.min_distance = np.ones(len(keys), dtype=np.float32)
+        self.density = np.maximum(vectors @ vectors.mean(axis=0), 0) if len(keys) else np.zeros(0)
+        labeled = np.flatnonzero(self.y >= 0)
+        for start in range(0, len(labeled), BATCH):
+            self._cover(labeled[start:start + BATCH])
+        self.fit(FIT_ITERATIONS)
+
+    @classmethod
+    def from_pool(cls, pool: list, vectors: np.ndarray) -> 'ReviewQueue':
+        return cls([(p[0], p[1]) for p in pool], vectors, [p[3] for p in pool])
+
+    def _cover(self, rows):
+        """Actualiza la distancia mínima con los vectores de `rows`"""
+        if len(rows):
+            similarity = self.vectors @ self.vectors[rows].T
+            self.min_distance = np.minimum(self.min_distance, 1 - similarity.max(axis=1))
+        np.maximum(self.min_distance, 0, out=self.min_distance)
+
+    def _design(self, rows=None) -> np.ndarray:
+        X = self.vectors if rows is None else self.vectors[rows]
+        return np.hstack([np.ones((len(X), 1), dtype=np.float32), X])
+
+    def fit(self, iterations: int):
+        """Descenso de gradiente (regresión logística multinomial) desde los pesos actuales"""
+        labeled = np.flatnonzero(self.y >= 0)
+        if len(self.classes) < 2 or not len(labeled):
+            return
+        if self.weights.shape[1] != len(self.classes):
+            grown = np.zeros((self.weights.shape[0], len(self.classes)))
+            grown[:, :self.weights.shape[1]] = self.weights
+            self.weights = grown
+        X = self._design(labeled)
+        Y = np.eye(len(self.classes))[self.y[labeled]]
+        for _ in range(iterations):
+            P = self._softmax(X @ self.weights)
+            grad = X.T @ (P - Y) / len(labeled) + L2 * np.vstack([np.zeros((1, len(self.classes))),
+                                                                  self.weights[1:]])
+            self.weights -= LEARNING_RATE * grad
+
+    @staticmethod
+    def _softmax(Z: np.ndarray) -> np.ndarray:
+        Z = Z - Z.max(axis=1, keepdims=True)
+        E = np.exp(Z)
+        return E / E.sum(axis=1, keepdims=True)
+
+    def probabilities(self, rows=None) -> np.ndarray:
+        if len(self.classes) < 2:
+            n = len(self.keys) if rows is None else len(rows)
+            return np.full((n, max(len(self.classes), 1)), 1.0 / max(len(self.classes), 1))
+        return self._softmax(self._design(rows) @ self.weights)
+
+    def predict(self, vectors: np.ndarray) -> list:
+        """Clase más probable de otros vectores (por ejemplo, historias de prueba)"""
+        if len(self.classes) < 2:
+            return [self.classes[0] if self.classes else None] * len(vectors)
+        X = np.hstack([np.ones((len(vectors), 1), dtype=np.float32), vectors])
+        return [self.classes[k] for k in (X @ self.weights).argmax(axis=1)]
+
+    def uncertainty(self, rows=None) -> np.ndarray:
+        """1 - (p1 - p2): 1 cuando las dos clases más probables empatan"""
+        P = self.probabilities(rows)
+        if P.shape[1] < 2:
+            return np.ones(len(P))
+        top = np.partition(P, -2, axis=1)[:, -2:]
+        return 1 - (top[:, 1] - top[:, 0])
+
+    def pending(self) -> np.ndarray:
+        return np.flatnonzero((self.y < 0) & ~self.skipped)
+
+    def ranking(self, count: int) -> list:
+        """
+        Las próximas `count` historias a supervisar, elegidas en lote: cada
+        elegida cuenta como cubierta para las siguientes, así la cola no se
+        llena de historias parecidas.
+
+        Returns:
+            [(clave, puntaje, incertidumbre, distancia, densidad)]
+        """
+        rows = self.pending()
+        if not len(rows):
+            return []
+        uncertainty = self.uncertainty(rows)
+        density = self.density[rows]
+        distance = self.min_distance[rows].copy()
+        chosen = []
+        for _ in range(min(count, len(rows))):
+            score = uncertainty * distance * density
+            best = int(np.argmax(score))
+            chosen.append((self.keys[rows[best]], float(score[best]), float(uncertainty[best]),
+                           float(distance[best]), float(density[best])))
+            similarity = self.vectors[rows] @ self.vectors[rows[best]]
+            distance = np.minimum(distance, np.maximum(1 - similarity, 0))
+            distance[best] = -1
+        return chosen
+
+    def next(self):
+        """Clave de la próxima historia a supervisar (None si no quedan)"""
+        ranked = self.ranking(1)
+        return ranked[0][0] if ranked else None
+
+    def label(self, key, label: str):
+        """Registra una etiqueta y actualiza distancias y modelo"""
+        row = self.index[key]
+        if label not in self.classes:
+            self.classes.append(label)
+        self.y[row] = self.classes.index(label)
+        self._cover([row])
+        self.fit(UPDATE_ITERATIONS if len(self.classes) == self.weights.shape[1] else FIT_ITERATIONS)
+
+    def skip(self, key):
+        """La historia no vuelve a salir en esta sesión"""
+        self.skipped[self.index[key]] = True
+
+
+def build_queue(seg_dir: str = SEG_DIR, cache_path: str = CACHE_PATH, rebuild: bool = False) -> tuple:
+    """
+    Returns:
+        (ReviewQueue, pool, historias con vector nuevo)
+    """
+    pool = load_pool(seg_dir)
+    vectors, computed = load_embeddings(pool, cache_path, rebuild)
+    return ReviewQueue.from_pool(pool, vectors), pool, computed
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[sys.argv.index('--cantidad') + 1]) if '--cantidad' in sys.argv else 20
+    queue, pool, computed = build_queue(rebuild='--reconstruir' in sys.argv)
+    labeled = int((queue.y >= 0).sum())
+    print(f"📚 {len(pool)} historias ({labeled} verificadas, {computed} vectores nuevos)")
+    print(f"   Clases: {', '.join(queue.classes) or '-'}")
+    print(f"\n🎯 Próximas {count} para supervisar:")
+    for (video_id, inicio), score, uncertainty, distance, density in queue.ranking(count):
+        print(f"   [{video_id} {int(inicio)}s] puntaje {score:.3f} "
+              f"(duda {uncertainty:.2f}, distancia {distance:.2f}, densidad {density:.2f})")
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Análisis de audio - Detecta silencios largos y cortinas musicales (jingles
+entre llamados) a partir de la energía RMS por frame.
+
+Todo el cálculo es vectorizado con NumPy sobre bloques del stream PCM, así que
+un episodio de 2.5 horas se procesa en segundos en un solo core.
+"""
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.transcriber import SAMPLE_RATE, iter_pcm_blocks
+
+
+FRAME_SECONDS = 0.05       # 50 ms por frame
+BLOCK_SECONDS = 60         # Bloque leído del stream en cada paso
+SILENCE_DB = -40.0         # Mismo umbral que usaba split_audio_on_silence
+MIN_SILENCE_SECONDS = 1.0
+MUSIC_MIN_DB = -25.0       # La música suele estar "arriba" en la mezcla
+MUSIC_MAX_STD_DB = 3.5     # ...y con poca modulación (la voz sube y baja por sílaba)
+MUSIC_WINDOW_SECONDS = 2.0
+MIN_MUSIC_SECONDS = 4.0
+
+
+def frame_energy(audio_path: str, frame_seconds: float = FRAME_SECONDS) -> np.ndarray:
+    """
+    Calcula la energía RMS (en dBFS) de cada frame del audio.
+
+    Returns:
+        Array float32 con un valor por frame
+    """
+    frame = int(frame_seconds * SAMPLE_RATE)
+    block = frame * int(BLOCK_SECONDS / frame_seconds)
+
+    energies = []
+    for _, samples in iter_pcm_blocks(audio_path, block, block):
+        usable = len(samples) // frame * frame
+        if usable == 0:
+            continue
+        frames = samples[:usable].astype(np.float32).reshape(-1, frame) / 32768.0
+        energies.append(np.sqrt(np.mean(frames * frames, axis=1)))
+
+    if not energies:
+        return np.empty(0, dtype=np.float32)
+    rms = np.concatenate(energies)
+    return (20 * np.log10(np.maximum(rms, 1e-5))).astype(np.float32)
+
+
+def find_runs(mask: np.ndarray, min_frames: int) -> np.ndarray:
+    """
+    Encuentra tramos consecutivos de True con al menos `min_frames` frames.
+
+    Returns:
+        Array (n, 2) con [frame_inicio, frame_fin) de cada tramo
+    """
+    padded = np.concatenate(([False], mask, [False])).astype(np.int8)
+    edges = np.diff(padded)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    keep = (ends - starts) >= min_frames
+    return np.column_stack((starts[keep], ends[keep]))
+
+
+def rolling_mean_std(values: np.ndarray, window: int) -> tuple:
+    """Media y desvío estándar centrados en una ventana móvil (vía cumsum)"""
+    values = values.astype(np.float64)
+    csum = np.concatenate(([0.0], np.cumsum(values)))
+    csum2 = np.concatenate(([0.0], np.cumsum(values * values)))
+
+    n = len(values)
+    half = window // 2
+    lo = np.clip(np.arange(n) - half, 0, n)
+    hi = np.clip(np.arange(n) + half + 1, 0, n)
+    count = hi - lo
+
+    mean = (csum[hi] - csum[lo]) / count
+    var = (csum2[hi] - csum2[lo]) / count - mean * mean
+    return mean, np.sqrt(np.maximum(var, 0.0))
+
+
+def detect_boundary_candidates(energy_db: np.ndarray,
+                               frame_seconds: float = FRAME_SECONDS) -> list:
+    """
+    Genera candidatos a límite de historia a partir de la energía por frame.
+
+    Returns:
+        Lista de dicts con inicio, fin, tipo ('silencio' | 'musica') y score,
+        ordenada por inicio
+    """
+    candidates = []
+
+    silences = find_runs(energy_db < SILENCE_DB, int(MIN_SILENCE_SECONDS / frame_seconds))
+    for start, end in silences.tolist():
+        length = (end - start) * frame_seconds
+        candidates.append({
+            'inicio': round(start * frame_seconds, 2),
+            'fin': round(end * frame_seconds, 2),
+            'tipo': 'silencio',
+            'score': round(min(1.0, length / (4 * MIN_SILENCE_SECONDS)), 3)
+        })
+
+    mean, std = rolling_mean_std(energy_db, int(MUSIC_WINDOW_SECONDS / frame_seconds))
+    music = find_runs((mean > MUSIC_MIN_DB) & (std < MUSIC_MAX_STD_DB),
+                      int(MIN_MUSIC_SECONDS / frame_seconds))
+    for start, end in music.tolist():
+        length = (end - start) * frame_seconds
+        candidates.append({
+            'inicio': round(start * frame_seconds, 2),
+            'fin': round(end * frame_seconds, 2),
+            'tipo': 'musica',
+            'score': round(min(1.0, length / (3 * MIN_MUSIC_SECONDS)), 3)
+        })
+
+    candidates.sort(key=lambda c: c['inicio'])
+    return candidates
+
+
+def analyze_audio(audio_path: str, video_id: str) -> dict:
+    """
+    Analiza el audio de un video y guarda sus candidatos a límite.
+    """
+    energy_db = frame_energy(audio_path)
+    candidates = detect_boundary_candidates(energy_db)
+
+    result = {
+        "video_id": video_id,
+        "frame_segundos": FRAME_SECONDS,
+        "duracion_segundos": round(len(energy_db) * FRAME_SECONDS, 2),
+        "total_candidatos": len(candidates),
+        "candidatos": candidates
+    }
+
+    output_path = f"data/audio/{video_id}.json"
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    return result
+
+
+def load_boundary_candidates(video_id: str) -> list:
+    """Carga los candidatos de audio de un video (lista vacía si no hay análisis)"""
+    path = f"data/audio/{video_id}.json"
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('candidatos', [])
+    except FileNotFoundError:
+        return []
+
+
+if __name__ == "__main__":
+    import time
+
+    if len(sys.argv) < 3:
+        print("Uso: python3 src/audio_analysis.py <audio> <video_id>")
+        print("Ejemplo: python3 src/audio_analysis.py audio.mp3 n2BkstRXbV0")
+        sys.exit(1)
+
+    t0 = time.perf_counter()
+    result = analyze_audio(sys.argv[1], sys.argv[2])
+    elapsed = time.perf_counter() - t0
+
+    tipos = {}
+    for c in result['candidatos']:
+        tipos[c['tipo']] = tipos.get(c['tipo'], 0) + 1
+
+    print(f"✅ Guardado: data/audio/{sys.argv[2]}.json")
+    print(f"⏱️  {result['duracion_segundos']:.0f}s de audio analizados en {elapsed:.1f}s")
+    for tipo, count in tipos.items():
+        print(f"   • {tipo}: {count}")
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Puntuador de límites de historias - Combina reglas de inicio/fin, pausas,
+densidad de preguntas y cortes de audio en un score por segmento de
+subtítulos, y elige la mejor segmentación del episodio con programación
+dinámica en O(n).
+
+Los pesos se entrenan (regresión logística) con los inicios/fines verificados
+en `data/dataset_gold.json`; sin modelo entrenado se usan pesos por defecto.
+"""
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.features import compute_features
+from src.models import SegmentArray
+
+
+MODEL_PATH = "data/modelos/boundary_scorer.json"
+GOLD_PATH = "data/dataset_gold.json"
+
+NEAR_START_SECONDS = 45       # "Hay un patrón de inicio poco después"
+END_LOOKBACK_SECONDS = 30     # "Hubo un patrón de fin poco antes"
+AUDIO_BEFORE_SECONDS = 3      # Corte de audio justo antes del segmento
+AUDIO_AFTER_SECONDS = 1
+LABEL_TOLERANCE_SECONDS = 10  # Distancia máxima segmento <-> inicio gold
+EVAL_TOLERANCE_SECONDS = 30   # Tolerancia para precision/recall
+
+FEATURE_NAMES = [
+    'sesgo', 'patron_inicio', 'patron_inicio_cerca', 'patron_fin_previo',
+    'pausa', 'preguntas', 'corte_audio'
+]
+
+DEFAULT_MODEL = {
+    'pesos': [-6.0, 7.0, 3.0, 1.5, 1.0, 0.8, 4.5],
+    'duracion_minima': 60.0,
+    'entrenado': False,
+}
+
+
+def _any_in_window(starts: np.ndarray, flags: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """True si algún segmento con flag tiene start en [lo, hi)"""
+    csum = np.concatenate(([0], np.cumsum(flags)))
+    return (csum[np.searchsorted(starts, hi, side='left')]
+            - csum[np.searchsorted(starts, lo, side='left')]) > 0
+
+
+def build_feature_matrix(segments: list, scan: dict, audio_candidates: list = None,
+                         features: dict = None) -> np.ndarray:
+    """
+    Arma la matriz de features (n_segmentos x len(FEATURE_NAMES)).
+
+    Args:
+        scan: resultado de `RuleEngine.scan` para estos segmentos
+    """
+    n = len(segments)
+    if features is None:
+        features = compute_features(segments)
+    starts = features['start'].astype(np.float64)
+
+    start_hits = scan['inicio'][0]
+    end_hits = scan['fin'][0]
+
+    X = np.zeros((n, len(FEATURE_NAMES)), dtype=np.float64)
+    X[:, 0] = 1.0
+    X[:, 1] = start_hits
+    X[:, 2] = _any_in_window(starts, start_hits, starts + 0.01, starts + NEAR_START_SECONDS)
+    X[:, 3] = _any_in_window(starts, end_hits, starts - END_LOOKBACK_SECONDS, starts)
+    X[:, 4] = np.log1p(features['pausa'])
+    X[:, 5] = np.minimum(features['densidad_preguntas'] / 5.0, 1.0)
+
+    if audio_candidates:
+        cut_ends = np.sort(np.array([c['fin'] for c in audio_candidates], dtype=np.float64))
+        near = (np.searchsorted(cut_ends, starts + AUDIO_AFTER_SECONDS, side='right')
+                - np.searchsorted(cut_ends, starts - AUDIO_BEFORE_SECONDS, side='left'))
+        X[:, 6] = near > 0
+
+    return X
+
+
+def load_model(path: str = MODEL_PATH) -> dict:
+    """Carga el modelo entrenado o los pesos por defecto"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            model = json.load(f)
+        if model.get('features') == FEATURE_NAMES:
+            return model
+        print(f"   ⚠️ {path} fue entrenado con otras features, uso pesos por defecto")
+    except FileNotFoundError:
+        pass
+    return dict(DEFAULT_MODEL)
+
+
+def score_segments(X: np.ndarray, model: dict) -> np.ndarray:
+    """Log-odds de que cada segmento sea inicio de historia"""
+    return X @ np.asarray(model['pesos'], dtype=np.float64)
+
+
+def select_boundaries(starts: np.ndarray, scores: np.ndarray, min_gap: float) -> list:
+    """
+    Elige el conjunto de inicios que maximiza la suma de scores con al menos
+    `min_gap` segundos entre inicios consecutivos (programación dinámica O(n)).
+
+    Returns:
+        Índices de los segmentos elegidos, en orden
+    """
+    n = len(starts)
+    best = np.zeros(n + 1)
+    take = np.zeros(n + 1, dtype=bool)
+    prev = np.zeros(n + 1, dtype=np.int64)
+
+    # prev[i+1]: cantidad de segmentos compatibles (start <= start_i - min_gap)
+    j = 0
+    for i in range(n):
+        while j < i and starts[j] <= starts[i] - min_gap:
+            j += 1
+        prev[i + 1] = j
+        with_i = best[j] + scores[i]
+        if scores[i] > 0 and with_i > best[i]:
+            best[i + 1] = with_i
+            take[i + 1] = True
+        else:
+            best[i + 1] = best[i]
+
+    chosen = []
+    i = n
+    while i > 0:
+        if take[i]:
+            chosen.append(i - 1)
+            i = prev[i]
+        else:
+            i -= 1
+    return chosen[::-1]
+
+
+def place_ends(segments: list, chosen: list, end_hits: np.ndarray, min_gap: float) -> list:
+    """
+    Ubica el fin de cada historia: el último patrón de fin antes del inicio
+    siguiente (o del final del episodio) o, si no hay, el inicio siguiente.
+
+    Returns:
+        Lista de timestamps de fin, uno por inicio elegido
+    """
+    segments = SegmentArray.coerce(segments)
+    starts = segments.numpy('start')
+    ends = segments.ends()
+    end_idx = np.flatnonzero(end_hits)
+
+    result = []
+    for k, i in enumerate(chosen):
+        limit = chosen[k + 1] if k + 1 < len(chosen) else len(segments)
+        hard_end = float(starts[limit]) if limit < len(segments) else float(ends[-1])
+        lo = np.searchsorted(end_idx, i, side='right')
+        hi = np.searchsorted(end_idx, limit, side='left')
+        candidates = end_idx[lo:hi]
+        candidates = candidates[starts[candidates] >= starts[i] + min_gap]
+        if len(candidates):
+            result.append(min(float(ends[candidates[-1]]), hard_end))
+        else:
+            result.append(hard_end)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Entrenamiento y evaluación
+# ---------------------------------------------------------------------------
+
+def load_gold_boundaries(path: str = GOLD_PATH) -> dict:
+    """Agrupa los límites verificados por video: video_id -> [(inicio, fin)]"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            gold = json.load(f)
+    except FileNotFoundError:
+        return {}
+
+    by_video = {}
+    for entry in gold:
+        if not entry.get('es_historia', True):
+            continue
+        by_video.setdefault(entry['video_id'], []).append(
+            (entry['timestamp_inicio'], entry.get('timestamp_fin'))
+        )
+    for bounds in by_video.values():
+        bounds.sort()
+    return by_video
+
+
+def label_segments(starts: np.ndarray, gold_starts: list) -> np.ndarray:
+    """Marca como positivo el segmento más cercano a cada inicio gold"""
+    y = np.zeros(len(starts))
+    if len(starts) == 0 or not gold_starts:
+        return y
+    gold = np.asarray(gold_starts, dtype=np.float64)
+    idx = np.clip(np.searchsorted(starts, gold), 1, len(starts) - 1)
+    left_closer = (gold - starts[idx - 1]) < (starts[idx] - gold)
+    idx = np.where(left_closer, idx - 1, idx)
+    close = np.abs(starts[idx] - gold) <= LABEL_TOLERANCE_SECONDS
+    y[idx[close]] = 1
+    return y
+
+
+def train(engine, gold_path: str = GOLD_PATH,
+          iterations: int = 2000, learning_rate: float = 0.5, l2: float = 1e-3) -> dict:
+    """
+    Entrena los pesos con regresión logística (descenso de gradiente en NumPy)
+    sobre todos los videos con límites verificados.
+    """
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    from src.audio_analysis import load_boundary_candidates
+    from src.segmenter import load_segments
+
+    gold = load_gold_boundaries(gold_path)
+    Xs, ys, durations = [], [], []
+    for video_id, bounds in gold.items():
+        segments = load_segments(video_id)
+        X = build_feature_matrix(segments, engine.scan(segments),
+                                 load_boundary_candidates(video_id))
+        starts = segments.numpy('start')
+        Xs.append(X)
+        ys.append(label_segments(starts, [b[0] for b in bounds]))
+        durations.extend(b[1] - b[0] for b in bounds if b[1] is not None)
+
+    if not Xs or sum(y.sum() for y in ys) == 0:
+        raise ValueError(f"No hay límites verificados para entrenar en {gold_path}")
+
+    X = np.vstack(Xs)
+    y = np.concatenate(ys)
+
+    # Balancear clases: hay muchos más segmentos que inicios
+    pos_weight = (len(y) - y.sum()) / y.sum()
+    sample_weight = np.where(y == 1, pos_weight, 1.0)
+    sample_weight /= sample_weight.sum()
+
+    w = np.asarray(DEFAULT_MODEL['pesos'], dtype=np.float64) / 10
+    for _ in range(iterations):
+        p = 1 / (1 + np.exp(-(X @ w)))
+        grad = X.T @ ((p - y) * sample_weight) + l2 * np.r_[0, w[1:]]
+        w -= learning_rate * grad
+
+    # Se mantiene el sesgo del entrenamiento balanceado: score > 0 significa
+    # "más parecido a un inicio que a un segmento cualquiera", y la
+    # programación dinámica se queda con el mejor de cada zona
+
+    min_gap = float(np.clip(np.percentile(durations, 5), 30, 120)) if durations else DEFAULT_MODEL['duracion_minima']
+
+    return {
+        'features': FEATURE_NAMES,
+        'pesos': [round(float(v), 4) for v in w],
+        'duracion_minima': round(min_gap, 1),
+        'entrenado': True,
+        'fecha_entrenamiento': datetime.now().isoformat(),
+        'videos': sorted(gold),
+        'ejemplos_positivos': int(y.sum()),
+        'ejemplos_totales': int(len(y)),
+    }
+
+
+def save_model(model: dict, path: str = MODEL_PATH) -> str:
+    """Guarda el modelo entrenado"""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(model, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def match_boundaries(predicted: list, gold: list, tolerance: float = EVAL_TOLERANCE_SECONDS) -> int:
+    """Cantidad de límites predichos que matchean uno gold (cada gold una vez)"""
+    matched = 0
+    j = 0
+    gold = sorted(gold)
+    for t in sorted(predicted):
+        while j < len(gold) and gold[j] < t - tolerance:
+            j += 1
+        if j < len(gold) and abs(gold[j] - t) <= tolerance:
+            matched += 1
+            j += 1
+    return matched
+
+
+def evaluate(detect, gold_path: str = GOLD_PATH) -> dict:
+    """
+    Precision/recall de inicios y fines contra los límites verificados.
+
+    Args:
+        detect: función video_id -> lista de `Story` (con timestamp_inicio/fin)
+    """
+    gold = load_gold_boundaries(gold_path)
+    totals = {'inicio': [0, 0, 0], 'fin': [0, 0, 0]}  # matcheados, predichos, gold
+
+    for video_id, bounds in gold.items():
+        stories = detect(video_id)
+        for key, pred, real in (
+            ('inicio', [s.timestamp_inicio for s in stories], [b[0] for b in bounds]),
+            ('fin', [s.timestamp_fin for s in stories], [b[1] for b in bounds if b[1] is not None]),
+        ):
+            totals[key][0] += match_boundaries(pred, real)
+            totals[key][1] += len(pred)
+            totals[key][2] += len(real)
+
+    report = {'videos': len(gold)}
+    for key, (matched, n_pred, n_gold) in totals.items():
+        precision = matched / n_pred if n_pred else 0.0
+        recall = matched / n_gold if n_gold else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        report[key] = {
+            'precision': round(precision, 3),
+            'recall': round(recall, 3),
+            'f1': round(f1, 3),
+            'predichos': n_pred,
+            'gold': n_gold,
+        }
+    return report
+
+
+def print_report(report: dict):
+    """Imprime el reporte de precision/recall"""
+    print(f"\n📏 Evaluación contra gold ({report['videos']} videos, ±{EVAL_TOLERANCE_SECONDS}s)")
+    for key in ('inicio', 'fin'):
+        r = report[key]
+        print(f"   {key:7s} P={r['precision']:.3f}  R={r['recall']:.3f}  F1={r['f1']:.3f}"
+              f"  ({r['predichos']} predichos / {r['gold']} gold)")
+
+
+if __name__ == "__main__":
+    from src.rules import get_rule_engine
+    from src.segmenter import detect_video_stories
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "evaluar"
+
+    if command == "entrenar":
+        model = train(get_rule_engine())
+        path = save_model(model)
+        print(f"✅ Modelo guardado: {path}")
+        print(f"   Ejemplos: {model['ejemplos_positivos']}/{model['ejemplos_totales']}")
+        for name, weight in zip(FEATURE_NAMES, model['pesos']):
+            print(f"   • {name:22s} {weight:+.3f}")
+        print_report(evaluate(detect_video_stories))
+    elif command == "evaluar":
+        print_report(evaluate(detect_video_stories))
+    else:
+        print("Uso: python3 src/boundary_scorer.py [entrenar|evaluar]")
+        sys.exit(1)
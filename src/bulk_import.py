@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+Importador masivo de subtítulos locales - Para backfills desde un volcado de
+yt-dlp (--write-subs / --write-auto-subs) en vez de bajar video por video.
+
+Reconoce .vtt, .srv3 y .json3 (el id del video sale del nombre del archivo:
+"Título [VIDEO_ID].es.vtt" o "VIDEO_ID.es.vtt"). Si hay varios archivos del
+mismo video elige uno por idioma y formato, y si está el .info.json de yt-dlp
+toma de ahí el título y la fecha.
+
+Cada archivo se parsea en streaming, se normaliza (ver normalizer) y se
+guarda con el schema de `ingestor.fetch_subtitles`, en paralelo en todos los
+núcleos. Al final registra los videos en videos_input.json y en
+pipeline_status.json con una sola escritura de cada uno.
+"""
+import json
+import os
+import re
+import sys
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.ingestor import save_subtitles
+from src.models import SegmentArray
+from src.normalizer import normalize_subtitles
+
+
+JSON_CHUNK_CHARS = 1 << 16                  # Lectura de los .json3 de a 64K caracteres
+WHITESPACE_RE = re.compile(r'\s*')
+FORMATS = ('json3', 'srv3', 'vtt')          # Preferencia: tiempos más precisos primero
+DEFAULT_LANGUAGES = ['es', 'es-419', 'es-ES']
+OUTPUT_DIR = "data/subtitulos"
+INPUT_PATH = "data/videos_input.json"
+STATUS_PATH = "data/pipeline_status.json"
+
+# "Título [dQw4w9WgXcQ].es.vtt" o "dQw4w9WgXcQ.es-419.json3"
+FILENAME_RE = re.compile(
+    r'^(?:.*\[(?P<bracket>[\w-]{11})\]|(?P<bare>[\w-]{11}))'
+    r'(?:\.(?P<lang>[\w-]+))?\.(?P<fmt>vtt|srv3|json3)$'
+)
+VTT_TIMING_RE = re.compile(r'^(?:(\d+):)?(\d{2}):(\d{2})\.(\d{3})\s+-->\s+(?:(\d+):)?(\d{2}):(\d{2})\.(\d{3})')
+VTT_TAG_RE = re.compile(r'<[^>]*>')
+
+
+# ---------------------------------------------------------------------------
+# Parsers: todos generan (start, duration, text) en segundos
+# ---------------------------------------------------------------------------
+
+def _vtt_seconds(h, m, s, ms) -> float:
+    return int(h or 0) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000
+
+
+def parse_vtt(path: str):
+    """
+    WebVTT línea por línea; quita los tags de tiempo palabra por palabra.
+    En los automáticos de YouTube cada cue repite como primera línea la
+    última del cue anterior: se descarta acá para no pasársela al normalizer.
+    """
+    start = end = None
+    lines = []
+    previous = None
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for raw in f:
+            line = raw.strip()
+            timing = VTT_TIMING_RE.match(line) if '-->' in line else None
+            if timing:
+                start = _vtt_seconds(*timing.groups()[:4])
+                end = _vtt_seconds(*timing.groups()[4:])
+                lines = []
+            elif not line:
+                if start is not None and lines:
+                    yield start, end - start, ' '.join(lines)
+                start = None
+                lines = []
+            elif start is not None:
+                text = VTT_TAG_RE.sub('', line).strip() if '<' in line else line
+                if not text or (not lines and text == previous):
+                    continue
+                lines.append(text)
+                previous = text
+    if start is not None and lines:
+        yield start, end - start, ' '.join(lines)
+
+
+def parse_srv3(path: str):
+    """srv3 (XML timedtext) con iterparse: cada <p t= d=> es un subtítulo"""
+    for _, elem in ET.iterparse(path, events=('end',)):
+        if elem.tag != 'p':
+            continue
+        text = ' '.join(''.join(elem.itertext()).split())
+        if text:
+            yield int(elem.get('t', 0)) / 1000, int(elem.get('d', 0)) / 1000, text
+        elem.clear()
+
+
+class _JsonStream:
+    """Lector incremental de un JSON: decodifica un valor por vez con raw_decode"""
+
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        chunk = self.f.read(JSON_CHUNK_CHARS)
+        self.eof = not chunk
+        self.buffer = self.buffer[self.pos:] + chunk  # Se descarta lo ya leído
+        self.pos = 0
+        return bool(chunk)
+
+    def peek(self) -> str:
+        """Próximo caracter que no es espacio ('' al final del archivo)"""
+        while True:
+            self.pos = WHITESPACE_RE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"JSON inválido: se esperaba {chars!r} y vino {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decodifica el próximo valor (pide más texto si quedó cortado)"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # Un número al final del buffer puede seguir en el próximo bloque
+            if end == len(self.buffer) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_array(path: str, key: str):
+    """
+    Elementos del array `key` del objeto raíz de un JSON, de a uno (las demás
+    claves se decodifican y se descartan)
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        stream = _JsonStream(f)
+        stream.expect('{')
+        if stream.peek() == '}':
+            return
+        while True:
+            name = stream.value()
+            stream.expect(':')
+            if name == key and stream.peek() == '[':
+                stream.expect('[')
+                if stream.peek() != ']':
+                    while True:
+                        yield stream.value()
+                        if stream.expect(',]') == ']':
+                            break
+                else:
+                    stream.expect(']')
+            else:
+                stream.value()
+            if stream.expect(',}') == '}':
+                return
+
+
+def parse_json3(path: str):
+    """json3: eventos con tStartMs, dDurationMs y segs[].utf8 (el array se lee de a un evento)"""
+    for event in iter_json_array(path, 'events'):
+        segs = event.get('segs')
+        if not segs:
+            continue
+        text = ' '.join(''.join(s.get('utf8', '') for s in segs).split())
+        if text:
+            yield event.get('tStartMs', 0) / 1000, event.get('dDurationMs', 0) / 1000, text
+
+
+PARSERS = {'vtt': parse_vtt, 'srv3': parse_srv3, 'json3': parse_json3}
+
+
+# ---------------------------------------------------------------------------
+# Descubrimiento
+# ---------------------------------------------------------------------------
+
+def _rank(candidate: dict, languages: list) -> tuple:
+    """Menor es mejor: idioma pedido, después formato"""
+    lang = candidate['language']
+    lang_rank = languages.index(lang) if lang in languages else len(languages)
+    return lang_rank, FORMATS.index(candidate['format'])
+
+
+def scan_dump(directory: str, languages: list = None) -> dict:
+    """
+    Recorre el directorio y elige un archivo de subtítulos por video.
+
+    Returns:
+        Dict video_id -> {path, format, language, info}; `info` es la ruta
+        del .info.json de yt-dlp si existe
+    """
+    languages = languages or DEFAULT_LANGUAGES
+    candidates = {}
+    infos = {}
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            if name.endswith('.info.json'):
+                match = re.search(r'(?:\[([\w-]{11})\]|^([\w-]{11}))\.info\.json$', name)
+                if match:
+                    infos[match.group(1) or match.group(2)] = path
+                continue
+            match = FILENAME_RE.match(name)
+            if not match:
+                continue
+            video_id = match.group('bracket') or match.group('bare')
+            candidates.setdefault(video_id, []).append({
+                'path': path,
+                'format': match.group('fmt'),
+                'language': match.group('lang') or 'es',
+            })
+
+    selected = {}
+    for video_id, options in candidates.items():
+        best = min(options, key=lambda c: _rank(c, languages))
+        selected[video_id] = {**best, 'info': infos.get(video_id)}
+    return selected
+
+
+def _read_info(path: str | None) -> dict:
+    """Título, fecha (YYYY-MM-DD) y duración del .info.json de yt-dlp"""
+    if not path:
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    date = info.get('upload_date') or ''
+    return {
+        'titulo': info.get('title'),
+        'fecha_emision': f"{date[:4]}-{date[4:6]}-{date[6:8]}" if len(date) == 8 else None,
+        'duracion_minutos': round(info['duration'] / 60) if info.get('duration') else None,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Import (un proceso por núcleo)
+# ---------------------------------------------------------------------------
+
+def _import_one(args: tuple) -> dict:
+    """
+    Parsea, normaliza y guarda un video. Devuelve sólo el resumen; cualquier
+    falla (incluso una inesperada) queda como error de ese archivo, sin
+    cortar el import.
+    """
+    video_id, entry, _ = args
+    try:
+        return _import_file(*args)
+    except Exception as e:
+        return {'video_id': video_id, 'error': f"{entry['path']}: error inesperado ({type(e).__name__}: {e})"}
+
+
+def _import_file(video_id: str, entry: dict, output_dir: str) -> dict:
+    try:
+        segments = SegmentArray()
+        for start, duration, text in PARSERS[entry['format']](entry['path']):
+            segments.append(round(start, 2), round(duration, 2), text)
+    except (OSError, ValueError, ET.ParseError) as e:
+        return {'video_id': video_id, 'error': f"{entry['path']}: {e}"}
+    if not len(segments):
+        return {'video_id': video_id, 'error': f"{entry['path']}: sin subtítulos"}
+
+    data = normalize_subtitles({
+        "video_id": video_id,
+        "language": entry['language'],
+        "origen": f"archivo:{entry['format']}",
+        "total_segments": len(segments),
+        "segments": segments
+    })
+    path = save_subtitles(data, output_dir)
+    last = data['segments'][-1]
+    return {
+        'video_id': video_id,
+        'path': path,
+        'total_segments': data['total_segments'],
+        'duracion_minutos': round(last.end / 60),
+        **{k: v for k, v in _read_info(entry['info']).items() if v is not None},
+    }
+
+
+def import_dump(directory: str, languages: list = None, workers: int = None,
+                output_dir: str = OUTPUT_DIR, overwrite: bool = False) -> dict:
+    """
+    Importa todos los subtítulos de un volcado local.
+
+    Returns:
+        Dict con importados (resúmenes por video), existentes y errores
+    """
+    selected = scan_dump(directory, languages)
+    existing = {v for v in selected
+                if not overwrite and os.path.exists(os.path.join(output_dir, f"{v}.json"))}
+    jobs = [(v, e, output_dir) for v, e in sorted(selected.items()) if v not in existing]
+
+    imported = []
+    errors = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for result in pool.map(_import_one, jobs, chunksize=16):
+            if 'error' in result:
+                errors.append(result['error'])
+            else:
+                imported.append(result)
+
+    return {'importados': imported, 'existentes': sorted(existing), 'errores': errors}
+
+
+def _write_json(path: str, data: dict):
+    """Escritura atómica: nunca queda un JSON a medio escribir"""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def _load_json(path: str, default: dict) -> dict:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def register_videos(imported: list, source_dir: str,
+                    input_path: str = INPUT_PATH, status_path: str = STATUS_PATH):
+    """Agrega/actualiza los videos importados en videos_input y pipeline_status (una escritura)"""
+    now = datetime.now().isoformat()
+    videos_input = _load_json(input_path, {"videos": []})
+    status = _load_json(status_path, {"version": "1.0", "videos": [], "resumen_global": {}})
+    inputs = {v.get('video_id'): v for v in videos_input['videos']}
+    states = {v['video_id']: v for v in status['videos']}
+
+    for item in imported:
+        vid = item['video_id']
+        url = f"https://www.youtube.com/watch?v={vid}"
+
+        entry = inputs.get(vid)
+        if entry is None:
+            entry = {"video_id": vid, "url": url, "notas": f"Importado de {source_dir}"}
+            videos_input['videos'].append(entry)
+            inputs[vid] = entry
+        for key in ('titulo', 'fecha_emision'):
+            if item.get(key) and not entry.get(key):
+                entry[key] = item[key]
+        entry['duracion_minutos'] = item['duracion_minutos']
+        entry['estado'] = "subtitulos_descargados"
+
+        video = states.get(vid)
+        if video is None:
+            video = {
+                "video_id": vid,
+                "url": url,
+                "titulo": item.get('titulo'),
+                "fecha_emision": item.get('fecha_emision'),
+                "estado": {
+                    "subtitulos": "pendiente",
+                    "segmentacion": "pendiente",
+                    "clasificacion_llm": "pendiente",
+                    "supervision_humana": "pendiente",
+                    "exportado_web": "pendiente"
+                },
+                "metricas": {
+                    "historias_detectadas": 0,
+                    "historias_supervisadas": 0,
+                    "historias_pendientes": 0
+                },
+                "archivos": {
+                    "subtitulos": item['path'],
+                    "segmentacion": f"data/segmentacion/{vid}.json",
+                    "clasificacion": f"data/clasificacion/{vid}.json"
+                },
+                "timestamps": {
+                    "segmentacion_completada": None,
+                    "clasificacion_llm": None,
+                    "ultima_supervision": None
+                }
+            }
+            status['videos'].append(video)
+            states[vid] = video
+        video['estado']['subtitulos'] = 'completado'
+        video['metricas']['total_segmentos_subtitulos'] = item['total_segments']
+        video['metricas']['duracion_minutos'] = item['duracion_minutos']
+        video['timestamps']['subtitulos_descargados'] = now
+
+    status.setdefault('resumen_global', {})['total_videos'] = len(status['videos'])
+    status['ultima_actualizacion'] = now
+
+    _write_json(input_path, videos_input)
+    _write_json(status_path, status)
+
+
+if __name__ == "__main__":
+    import time
+
+    if len(sys.argv) < 2:
+        print("Uso: python3 src/bulk_import.py <directorio> [--workers N] [--idiomas es,es-419] [--sobrescribir]")
+        print("Ejemplo: python3 src/bulk_import.py ~/descargas/yt-dlp")
+        sys.exit(1)
+
+    directory = sys.argv[1]
+    workers = int(sys.argv[sys.argv.index('--workers') + 1]) if '--workers' in sys.argv else None
+    languages = (sys.argv[sys.argv.index('--idiomas') + 1].split(',')
+                 if '--idiomas' in sys.argv else None)
+
+    start = time.perf_counter()
+    print(f"📂 Importando subtítulos de {directory}")
+    result = import_dump(directory, languages, workers, overwrite='--sobrescribir' in sys.argv)
+    if result['importados']:
+        register_videos(result['importados'], directory)
+        print("   📊 videos_input.json y pipeline_status.json actualizados")
+
+    print(f"✅ Importados: {len(result['importados'])} videos "
+          f"({sum(r['total_segments'] for r in result['importados'])} segmentos) "
+          f"en {time.perf_counter() - start:.1f} s")
+    if result['existentes']:
+        print(f"⏭️ Ya existían: {len(result['existentes'])} (--sobrescribir para reimportar)")
+    for error in result['errores']:
+        print(f"❌ {error}")
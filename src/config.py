@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""
+Carga de la configuración del proyecto (config.yaml).
+"""
+from functools import lru_cache
+
+import yaml
+
+
+CONFIG_PATH = "config.yaml"
+
+
+@lru_cache(maxsize=None)
+def load_config(path: str = CONFIG_PATH) -> dict:
+    """Lee config.yaml una sola vez por proceso"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        return {}
@@ -3,25 +3,174 @@
 Módulo de base de datos SQLite con FTS5 para búsqueda full-text.
 """
 import sqlite3
+import base64
 import json
+import re
+import sys
 from pathlib import Path
 from typing import Optional
 from datetime import datetime
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.config import load_config
+from src.textcodec import CODECS, TextCodec, train_dictionary
+from src.timemap import decode_time_map, timestamp_at
+
 
 DB_PATH = "data/historias.db"
 
+# Tokenizer del FTS: sin acentos ("aparición" == "aparicion") e índices de
+# prefijo de 2 y 3 caracteres para que "fan*" no recorra todo el índice
+FTS_TOKENIZE = "unicode61 remove_diacritics 2"
+FTS_PREFIX = "2 3"
+
+# Texto de una historia: comprimido en texto_comprimido (ver textcodec) o,
+# en filas sin comprimir, en texto_completo. {row} es el prefijo de la tabla
+# ("h." o ""). descomprimir() sólo existe en las conexiones de get_connection
+TEXT_SQL = "COALESCE(descomprimir({row}texto_comprimido), {row}texto_completo)"
+
+# Los FTS no tienen triggers ni vistas con funciones de Python: se llenan
+# desde este módulo al escribir `table` (index_fts / unindex_fts), así la base
+# se puede abrir con cualquier cliente de SQLite. historias_fts no guarda
+# contenido (`content` vacío: el texto puede estar comprimido); subtitulos_fts
+# lee el suyo de subtitulos_ventanas para `snippet()`
+FTS_TABLES = {
+    'historias_fts': {
+        'content': '',
+        'table': 'historias',
+        'columns': ['titulo_inferido', 'texto_completo', 'resumen'],
+        'expressions': {'texto_completo': TEXT_SQL},
+    },
+    'subtitulos_fts': {
+        'content': 'subtitulos_ventanas',
+        'table': 'subtitulos_ventanas',
+        'columns': ['texto'],
+        'expressions': {},
+    },
+}
+# Prefijos de los triggers que mantenían los FTS en versiones anteriores
+LEGACY_FTS_TRIGGERS = ('historias', 'subtitulos')
+
+# Tramos de WTF para las facetas: 0.0-0.1, 0.1-0.2, ... y 1.0
+WTF_BUCKETS = 10
+WTF_BUCKET_SQL = ("CASE WHEN {score} IS NULL THEN -1 "
+                  f"ELSE MAX(0, MIN(CAST({{score}} * {WTF_BUCKETS} + 1e-9 AS INTEGER), {WTF_BUCKETS})) END")
+FACET_DIMENSIONS = ('categoria', 'subcategoria', 'tipo_narrador')
+
+FTS_OPERATORS = {'AND', 'OR', 'NOT', 'NEAR'}
+ACCENT_FOLD = str.maketrans('áéíóúüñ', 'aeiouun')  # 1 a 1: conserva los offsets
+WORD_RE = re.compile(r'\w+')
+QUERY_TERM_RE = re.compile(r'\w+(?![\w*:])')  # Ni prefijos ("fan*") ni columnas ("resumen:")
+
+
+def stem_word(word: str) -> str:
+    """
+    Stemmer liviano de español: quita plural y vocal final de género
+    ("fantasmas" -> "fantasm", "luces" -> "luz", "apariciones" -> "aparicion").
+    """
+    word = word.lower().translate(ACCENT_FOLD)
+    if len(word) > 4 and word.endswith('ces'):
+        return word[:-3] + 'z'
+    if len(word) > 4 and word.endswith(('iones', 'ones')):
+        word = word[:-2]
+    elif len(word) > 3 and word.endswith('s'):
+        word = word[:-1]
+    if len(word) > 3 and word[-1] in 'aoe':
+        word = word[:-1]
+    return word
+
+
+def stem_es(text: str | None) -> str | None:
+    """Aplica `stem_word` a cada palabra del texto (función SQL para el FTS)"""
+    if text is None:
+        return None
+    return ' '.join(stem_word(w) for w in WORD_RE.findall(text))
+
+
+def fts_stemming_enabled() -> bool:
+    """Lee `database.fts_stemming` de config.yaml"""
+    return bool(load_config().get('database', {}).get('fts_stemming', False))
+
+
+def fts_stemming(conn: sqlite3.Connection) -> bool:
+    """Indica si los índices FTS de esta base se crearon con stemming"""
+    try:
+        row = conn.execute("SELECT valor FROM db_meta WHERE clave = 'fts'").fetchone()
+    except sqlite3.OperationalError:
+        return False
+    return bool(row) and row[0].endswith('stemming=1')
+
+
+def fts_query(query: str, stemming: bool) -> str:
+    """
+    Adapta una consulta FTS5 a la configuración del índice: con stemming,
+    cada término (no los operadores) pasa por el mismo stemmer que el texto.
+    """
+    if not stemming:
+        return query
+    return QUERY_TERM_RE.sub(lambda m: m.group(0) if m.group(0) in FTS_OPERATORS else stem_word(m.group(0)), query)
+
+
+def text_compression() -> str | None:
+    """`database.compresion_texto` de config.yaml: 'zlib', 'zstd' o None"""
+    algorithm = load_config().get('database', {}).get('compresion_texto') or None
+    return algorithm if algorithm in CODECS else None
+
+
+def _load_dictionary(conn: sqlite3.Connection, dict_id: int) -> tuple:
+    row = conn.execute('SELECT algoritmo, datos FROM diccionarios_texto WHERE id = ?',
+                       (dict_id,)).fetchone()
+    if row is None:
+        raise ValueError(f"Falta el diccionario de compresión {dict_id}")
+    return row[0], row[1]
+
+
+def text_codec(conn: sqlite3.Connection, algorithm: str = None) -> TextCodec:
+    """Codec con el último diccionario entrenado para `algorithm`"""
+    algorithm = algorithm or text_compression() or 'zlib'
+    row = conn.execute('SELECT MAX(id) FROM diccionarios_texto WHERE algoritmo = ?',
+                       (algorithm,)).fetchone()
+    return TextCodec(lambda i: _load_dictionary(conn, i), row[0], algorithm)
+
+
+def _text_columns(codec: TextCodec | None, texto: str) -> tuple:
+    """(texto_completo, texto_comprimido) a guardar según la configuración"""
+    if codec is None:
+        return texto, None
+    return '', codec.compress(texto)
+
+
+def _decompress_rows(conn: sqlite3.Connection, rows: list) -> list:
+    """Filas de `historias` como dicts, con el texto descomprimido y sin el blob"""
+    codec = TextCodec(lambda i: _load_dictionary(conn, i))
+    results = []
+    for row in rows:
+        h = dict(row)
+        blob = h.pop('texto_comprimido', None)
+        if blob is not None:
+            h['texto_completo'] = codec.decompress(blob)
+        results.append(h)
+    return results
+
 
 def get_connection(db_path: str = DB_PATH) -> sqlite3.Connection:
     """Obtiene conexión a la base de datos"""
     Path(db_path).parent.mkdir(parents=True, exist_ok=True)
     conn = sqlite3.connect(db_path)
     conn.row_factory = sqlite3.Row
+    conn.create_function('stem_es', 1, stem_es, deterministic=True)
+    codec = TextCodec(lambda i: _load_dictionary(conn, i))
+    conn.create_function('descomprimir', 1, codec.decompress, deterministic=True)
     return conn
 
 
-def init_db(db_path: str = DB_PATH):
-    """Inicializa la base de datos con el schema completo"""
+def init_db(db_path: str = DB_PATH, stemming: bool = None):
+    """
+    Inicializa la base de datos con el schema completo.
+    
+    `stemming` (default: `database.fts_stemming` de config.yaml) indexa el
+    texto con un stemmer liviano de español.
+    """
     conn = get_connection(db_path)
     cursor = conn.cursor()
     
@@ -57,10 +206,29 @@ def init_db(db_path: str = DB_PATH):
             confianza_clasificacion REAL,
             verificado_humano INTEGER DEFAULT 0,
             fecha_clasificacion TEXT,
+            mapa_tiempos TEXT,
+            texto_comprimido BLOB,
             FOREIGN KEY (video_id) REFERENCES videos(video_id)
         )
     ''')
     
+    # Migraciones de columnas agregadas después de crear la tabla
+    _add_missing_columns(cursor, 'historias', {'mapa_tiempos': 'TEXT', 'texto_comprimido': 'BLOB'})
+    
+    # Diccionarios de compresión del texto (ver textcodec); el blob de cada
+    # historia indica con cuál se comprimió
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS diccionarios_texto (
+            id INTEGER PRIMARY KEY,
+            algoritmo TEXT NOT NULL,
+            datos BLOB NOT NULL,
+            creado TEXT
+        )
+    ''')
+    # Bases anteriores: la vista historias_v llamaba a descomprimir(), que sólo
+    # existe en las conexiones de get_connection
+    cursor.execute('DROP VIEW IF EXISTS historias_v')
+    
     # Tabla de embeddings (para búsqueda semántica futura)
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS embeddings (
@@ -71,52 +239,375 @@ def init_db(db_path: str = DB_PATH):
         )
     ''')
     
-    # Full-text search con FTS5
+    # Ventanas de subtítulos (búsqueda de frases dentro de cualquier episodio)
     cursor.execute('''
-        CREATE VIRTUAL TABLE IF NOT EXISTS historias_fts USING fts5(
-            titulo_inferido,
-            texto_completo,
-            resumen,
-            content='historias',
-            content_rowid='id'
+        CREATE TABLE IF NOT EXISTS subtitulos_ventanas (
+            id INTEGER PRIMARY KEY,
+            video_id TEXT NOT NULL,
+            inicio REAL NOT NULL,
+            fin REAL NOT NULL,
+            texto TEXT NOT NULL
         )
     ''')
     
-    # Triggers para mantener FTS sincronizado
+    # Índices para búsquedas frecuentes
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_subtitulos_video ON subtitulos_ventanas(video_id, inicio)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_historias_video ON historias(video_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_historias_verificado ON historias(verificado_humano)')
+    
+    # Índices compuestos para get_historias_by_filter: filtro + orden por WTF
+    # sin ordenar en memoria (reemplazan a los de categoria y wtf_score solos)
+    cursor.execute('DROP INDEX IF EXISTS idx_historias_categoria')
+    cursor.execute('DROP INDEX IF EXISTS idx_historias_wtf')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_historias_ranking ON historias(es_publicidad, wtf_score DESC)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_historias_cat_wtf ON historias(es_publicidad, categoria, wtf_score DESC)')
     cursor.execute('''
-        CREATE TRIGGER IF NOT EXISTS historias_ai AFTER INSERT ON historias BEGIN
-            INSERT INTO historias_fts(rowid, titulo_inferido, texto_completo, resumen)
-            VALUES (new.id, new.titulo_inferido, new.texto_completo, new.resumen);
-        END
+        CREATE INDEX IF NOT EXISTS idx_historias_subcat_wtf
+        ON historias(es_publicidad, categoria, subcategoria, wtf_score DESC)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_historias_narrador_wtf
+        ON historias(es_publicidad, tipo_narrador, wtf_score DESC)
     ''')
     
+    # Conteos precalculados por faceta (categoria × subcategoria × narrador ×
+    # tramo de WTF), mantenidos por triggers. NULL se guarda como '' para que
+    # la clave primaria funcione con ON CONFLICT.
     cursor.execute('''
-        CREATE TRIGGER IF NOT EXISTS historias_ad AFTER DELETE ON historias BEGIN
-            INSERT INTO historias_fts(historias_fts, rowid, titulo_inferido, texto_completo, resumen)
-            VALUES('delete', old.id, old.titulo_inferido, old.texto_completo, old.resumen);
+        CREATE TABLE IF NOT EXISTS facetas (
+            categoria TEXT NOT NULL,
+            subcategoria TEXT NOT NULL,
+            tipo_narrador TEXT NOT NULL,
+            wtf_tramo INTEGER NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            verificadas INTEGER NOT NULL DEFAULT 0,
+            suma_wtf REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (categoria, subcategoria, tipo_narrador, wtf_tramo)
+        ) WITHOUT ROWID
+    ''')
+    _create_facet_triggers(cursor)
+    
+    # Historias repetidas entre episodios (ver dedup): firma MinHash, bandas
+    # LSH para encontrar candidatas, pares que superan el umbral y grupos.
+    # Al borrar una historia (reimportar su video) se van sus firmas y pares,
+    # y su grupo queda en duplicados_revisar para volver a calcularlo.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS dedup_firmas (
+            historia_id INTEGER PRIMARY KEY,
+            firma BLOB NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS dedup_bandas (
+            banda INTEGER NOT NULL,
+            hash INTEGER NOT NULL,
+            historia_id INTEGER NOT NULL,
+            PRIMARY KEY (banda, hash, historia_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_dedup_bandas_historia ON dedup_bandas(historia_id)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS duplicados_pares (
+            historia_a INTEGER NOT NULL,
+            historia_b INTEGER NOT NULL,
+            similitud REAL NOT NULL,
+            PRIMARY KEY (historia_a, historia_b)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_duplicados_pares_b ON duplicados_pares(historia_b)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS duplicados (
+            historia_id INTEGER PRIMARY KEY,
+            grupo INTEGER NOT NULL,
+            similitud REAL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_duplicados_grupo ON duplicados(grupo)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS duplicados_revisar (
+            grupo INTEGER PRIMARY KEY
+        )
+    ''')
+    cursor.execute('DROP TRIGGER IF EXISTS historias_dedup_ad')  # Bases anteriores a duplicados_revisar
+    cursor.execute('''
+        CREATE TRIGGER historias_dedup_ad AFTER DELETE ON historias BEGIN
+            INSERT OR IGNORE INTO duplicados_revisar SELECT grupo FROM duplicados WHERE historia_id = old.id;
+            DELETE FROM dedup_firmas WHERE historia_id = old.id;
+            DELETE FROM dedup_bandas WHERE historia_id = old.id;
+            DELETE FROM duplicados_pares WHERE historia_a = old.id OR historia_b = old.id;
+            DELETE FROM duplicados WHERE historia_id = old.id;
         END
     ''')
     
+    # Oyente y lugar de cada historia (ver entities): a lo sumo uno de cada
+    # tipo, con la clave normalizada indexada para buscar por oyente o lugar
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS entidades (
+            historia_id INTEGER NOT NULL,
+            tipo TEXT NOT NULL,
+            clave TEXT NOT NULL,
+            valor TEXT NOT NULL,
+            PRIMARY KEY (historia_id, tipo)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_entidades_clave ON entidades(tipo, clave)')
     cursor.execute('''
-        CREATE TRIGGER IF NOT EXISTS historias_au AFTER UPDATE ON historias BEGIN
-            INSERT INTO historias_fts(historias_fts, rowid, titulo_inferido, texto_completo, resumen)
-            VALUES('delete', old.id, old.titulo_inferido, old.texto_completo, old.resumen);
-            INSERT INTO historias_fts(rowid, titulo_inferido, texto_completo, resumen)
-            VALUES (new.id, new.titulo_inferido, new.texto_completo, new.resumen);
+        CREATE TRIGGER IF NOT EXISTS historias_entidades_ad AFTER DELETE ON historias BEGIN
+            DELETE FROM entidades WHERE historia_id = old.id;
         END
     ''')
     
-    # Índices para búsquedas frecuentes
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_historias_video ON historias(video_id)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_historias_categoria ON historias(categoria)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_historias_wtf ON historias(wtf_score)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_historias_verificado ON historias(verificado_humano)')
+    # Series de tiempo por fecha de emisión (ver series): se recalculan por
+    # período, sólo los de los videos que cambiaron desde la última vez
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS series_semanas (
+            semana TEXT NOT NULL,
+            categoria TEXT NOT NULL,
+            historias INTEGER NOT NULL,
+            PRIMARY KEY (semana, categoria)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS series_meses (
+            mes TEXT PRIMARY KEY,
+            historias INTEGER NOT NULL,
+            con_wtf INTEGER NOT NULL,
+            suma_wtf REAL NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS series_trimestres (
+            trimestre TEXT PRIMARY KEY,
+            historias INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS series_terminos (
+            trimestre TEXT NOT NULL,
+            termino TEXT NOT NULL,
+            historias INTEGER NOT NULL,
+            PRIMARY KEY (trimestre, termino)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS series_en_alza (
+            trimestre TEXT NOT NULL,
+            posicion INTEGER NOT NULL,
+            termino TEXT NOT NULL,
+            historias INTEGER NOT NULL,
+            crecimiento REAL NOT NULL,
+            PRIMARY KEY (trimestre, posicion)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS series_videos (
+            video_id TEXT PRIMARY KEY,
+            huella TEXT NOT NULL,
+            semana TEXT,
+            mes TEXT,
+            trimestre TEXT
+        )
+    ''')
+    
+    # Metadatos del schema (configuración del FTS, versiones)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS db_meta (
+            clave TEXT PRIMARY KEY,
+            valor TEXT
+        )
+    ''')
     
     conn.commit()
+    
+    # Full-text search con FTS5 (se reconstruye si cambió la configuración)
+    if migrate_fts(conn, stemming):
+        print("   🔁 Índices FTS reconstruidos con la configuración actual")
+    
+    # Bases anteriores a la tabla de facetas: calcularla una vez
+    if not conn.execute("SELECT 1 FROM db_meta WHERE clave = 'facetas'").fetchone():
+        refresh_facets(conn)
+    
     conn.close()
     print(f"✅ Base de datos inicializada: {db_path}")
 
 
+def wtf_bucket(score: float | None) -> int:
+    """Tramo de WTF de un score (0..WTF_BUCKETS, -1 si no tiene score)"""
+    if score is None:
+        return -1
+    return max(0, min(int(score * WTF_BUCKETS + 1e-9), WTF_BUCKETS))
+
+
+def _facet_key(row: str) -> str:
+    """Valores de la clave de facetas para `new` u `old` dentro de un trigger"""
+    return (f"COALESCE({row}.categoria, ''), COALESCE({row}.subcategoria, ''), "
+            f"COALESCE({row}.tipo_narrador, ''), {WTF_BUCKET_SQL.format(score=f'{row}.wtf_score')}")
+
+
+def _create_facet_triggers(cursor: sqlite3.Cursor):
+    """Triggers que suman/restan cada historia (no publicidad) en `facetas`"""
+    add = f'''
+        INSERT INTO facetas (categoria, subcategoria, tipo_narrador, wtf_tramo, total, verificadas, suma_wtf)
+        VALUES ({_facet_key('new')}, 1, COALESCE(new.verificado_humano, 0) != 0, COALESCE(new.wtf_score, 0))
+        ON CONFLICT DO UPDATE SET
+            total = total + 1,
+            verificadas = verificadas + excluded.verificadas,
+            suma_wtf = suma_wtf + excluded.suma_wtf;
+    '''
+    key_match = "(categoria, subcategoria, tipo_narrador, wtf_tramo) = ({})".format(_facet_key('old'))
+    remove = f'''
+        UPDATE facetas SET
+            total = total - 1,
+            verificadas = verificadas - (COALESCE(old.verificado_humano, 0) != 0),
+            suma_wtf = suma_wtf - COALESCE(old.wtf_score, 0)
+        WHERE {key_match};
+        DELETE FROM facetas WHERE {key_match} AND total <= 0;
+    '''
+    columns = 'categoria, subcategoria, tipo_narrador, wtf_score, verificado_humano, es_publicidad'
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS historias_facetas_ai AFTER INSERT ON historias
+                       WHEN COALESCE(new.es_publicidad, 0) = 0 BEGIN {add} END""")
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS historias_facetas_ad AFTER DELETE ON historias
+                       WHEN COALESCE(old.es_publicidad, 0) = 0 BEGIN {remove} END""")
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS historias_facetas_au_old AFTER UPDATE OF {columns} ON historias
+                       WHEN COALESCE(old.es_publicidad, 0) = 0 BEGIN {remove} END""")
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS historias_facetas_au_new AFTER UPDATE OF {columns} ON historias
+                       WHEN COALESCE(new.es_publicidad, 0) = 0 BEGIN {add} END""")
+
+
+def refresh_facets(conn: sqlite3.Connection):
+    """Recalcula la tabla `facetas` completa desde `historias`"""
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM facetas')
+    cursor.execute(f'''
+        INSERT INTO facetas (categoria, subcategoria, tipo_narrador, wtf_tramo, total, verificadas, suma_wtf)
+        SELECT COALESCE(categoria, ''), COALESCE(subcategoria, ''), COALESCE(tipo_narrador, ''),
+               {WTF_BUCKET_SQL.format(score='wtf_score')} AS tramo,
+               COUNT(*), SUM(COALESCE(verificado_humano, 0) != 0), SUM(COALESCE(wtf_score, 0))
+        FROM historias
+        WHERE COALESCE(es_publicidad, 0) = 0
+        GROUP BY 1, 2, 3, 4
+    ''')
+    cursor.execute("INSERT OR REPLACE INTO db_meta (clave, valor) VALUES ('facetas', ?)",
+                   (datetime.now().isoformat(),))
+    conn.commit()
+
+
+def _fts_expr(column: str, stemming: bool, row: str = '', expressions: dict = None) -> str:
+    """Expresión SQL que se indexa para una columna (con o sin stemming)"""
+    template = (expressions or {}).get(column)
+    expr = template.format(row=row) if template else f'{row}{column}'
+    return f'stem_es({expr})' if stemming else expr
+
+
+def _create_fts(cursor: sqlite3.Cursor):
+    """Crea las tablas FTS5 (vacías: las llena `index_fts`)"""
+    for fts, spec in FTS_TABLES.items():
+        content = f"content='{spec['content']}', content_rowid='id'" if spec['content'] else "content=''"
+        cursor.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                {', '.join(spec['columns'])},
+                {content},
+                tokenize='{FTS_TOKENIZE}',
+                prefix='{FTS_PREFIX}'
+            )
+        ''')
+
+
+def _fts_select(fts: str, stemming: bool, where: str, command: str = '') -> str:
+    """SELECT de (rowid, columnas indexadas) de las filas de `fts` que cumplen `where`"""
+    spec = FTS_TABLES[fts]
+    values = ', '.join(_fts_expr(c, stemming, '', spec['expressions']) for c in spec['columns'])
+    return f"SELECT {command}id, {values} FROM {spec['table']} {where}"
+
+
+def index_fts(conn: sqlite3.Connection, fts: str, where: str = '', params: tuple = (),
+              stemming: bool = None):
+    """
+    Indexa en `fts` las filas de su tabla que cumplen `where` (todas si está
+    vacío). Quien escribe en la tabla la llama después de insertar, y a
+    `unindex_fts` antes de borrar o modificar las columnas indexadas.
+    """
+    if stemming is None:
+        stemming = fts_stemming(conn)
+    cols = ', '.join(FTS_TABLES[fts]['columns'])
+    conn.execute(f"INSERT INTO {fts}(rowid, {cols}) {_fts_select(fts, stemming, where)}", params)
+
+
+def unindex_fts(conn: sqlite3.Connection, fts: str, where: str, params: tuple = (),
+                stemming: bool = None):
+    """
+    Saca de `fts` las filas que cumplen `where`. Va antes del DELETE o UPDATE:
+    el FTS necesita los mismos valores que se indexaron.
+    """
+    if stemming is None:
+        stemming = fts_stemming(conn)
+    cols = ', '.join(FTS_TABLES[fts]['columns'])
+    select = _fts_select(fts, stemming, where, command="'delete', ")
+    conn.execute(f"INSERT INTO {fts}({fts}, rowid, {cols}) {select}", params)
+
+
+def rebuild_fts(conn: sqlite3.Connection) -> dict:
+    """
+    Vacía y vuelve a llenar los FTS desde sus tablas (después de escribir
+    en la base con otra herramienta).
+    
+    Returns:
+        Dict tabla FTS -> filas indexadas
+    """
+    stemming = fts_stemming(conn)
+    counts = {}
+    for fts, spec in FTS_TABLES.items():
+        conn.execute(f"INSERT INTO {fts}({fts}) VALUES('delete-all')")
+        index_fts(conn, fts, stemming=stemming)
+        counts[fts] = conn.execute(f"SELECT COUNT(*) FROM {spec['table']}").fetchone()[0]
+    conn.commit()
+    return counts
+
+
+def migrate_fts(conn: sqlite3.Connection, stemming: bool = None) -> bool:
+    """
+    Reconstruye en el lugar los índices FTS si fueron creados con otro
+    tokenizer, otros índices de prefijo, otra opción de stemming u otra
+    tabla de contenido.
+    
+    Returns:
+        True si hubo que reconstruir
+    """
+    if stemming is None:
+        stemming = fts_stemming_enabled()
+    contents = ','.join(spec['content'] or '-' for spec in FTS_TABLES.values())
+    signature = f"{FTS_TOKENIZE}|prefix={FTS_PREFIX}|contenido={contents}|triggers=0|stemming={int(stemming)}"
+    
+    cursor = conn.cursor()
+    row = cursor.execute("SELECT valor FROM db_meta WHERE clave = 'fts'").fetchone()
+    if row and row[0] == signature:
+        _create_fts(cursor)  # No-op salvo que falte algo
+        conn.commit()
+        return False
+    
+    for trigger in LEGACY_FTS_TRIGGERS:
+        for suffix in ('ai', 'ad', 'au'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}_{suffix}")
+    for fts in FTS_TABLES:
+        cursor.execute(f"DROP TABLE IF EXISTS {fts}")
+    
+    _create_fts(cursor)
+    for fts in FTS_TABLES:
+        index_fts(conn, fts, stemming=stemming)
+    
+    cursor.execute("INSERT OR REPLACE INTO db_meta (clave, valor) VALUES ('fts', ?)", (signature,))
+    conn.commit()
+    return True
+
+
+def _add_missing_columns(cursor: sqlite3.Cursor, table: str, columns: dict):
+    """Agrega columnas nuevas a una tabla existente (migración liviana)"""
+    existing = {row[1] for row in cursor.execute(f'PRAGMA table_info({table})')}
+    for name, definition in columns.items():
+        if name not in existing:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {definition}')
+
+
 def insert_video(video_id: str, url: str, titulo: str = None, 
                  fecha_emision: str = None, duracion_minutos: int = None) -> bool:
     """Inserta o actualiza un video en la base de datos"""
@@ -137,22 +628,27 @@ def insert_historia(video_id: str, timestamp_inicio: float, texto_completo: str,
                    timestamp_fin: float = None, titulo_inferido: str = None,
                    resumen: str = None, categoria: str = None, subcategoria: str = None,
                    tipo_narrador: str = None, wtf_score: float = None,
-                   clasificado_por: str = "llm", confianza: float = None) -> int:
+                   clasificado_por: str = "llm", confianza: float = None,
+                   es_publicidad: bool = False, mapa_tiempos: str = None) -> int:
     """Inserta una historia y retorna su ID"""
     conn = get_connection()
     cursor = conn.cursor()
+    codec = text_codec(conn) if text_compression() else None
     
     cursor.execute('''
         INSERT INTO historias (
             video_id, timestamp_inicio, timestamp_fin, titulo_inferido,
-            texto_completo, resumen, categoria, subcategoria, tipo_narrador,
-            wtf_score, clasificado_por, confianza_clasificacion, fecha_clasificacion
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            texto_completo, texto_comprimido, resumen, categoria, subcategoria,
+            tipo_narrador, wtf_score, es_publicidad, clasificado_por,
+            confianza_clasificacion, fecha_clasificacion, mapa_tiempos
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
     ''', (video_id, timestamp_inicio, timestamp_fin, titulo_inferido,
-          texto_completo, resumen, categoria, subcategoria, tipo_narrador,
-          wtf_score, clasificado_por, confianza, datetime.now().isoformat()))
+          *_text_columns(codec, texto_completo), resumen, categoria, subcategoria,
+          tipo_narrador, wtf_score, int(es_publicidad), clasificado_por, confianza,
+          datetime.now().isoformat(), mapa_tiempos))
     
     historia_id = cursor.lastrowid
+    index_fts(conn, 'historias_fts', 'WHERE id = ?', (historia_id,))
     
     # Actualizar contador en videos
     cursor.execute('''
@@ -166,34 +662,308 @@ def insert_historia(video_id: str, timestamp_inicio: float, texto_completo: str,
     return historia_id
 
 
-def search_historias(query: str, limit: int = 20) -> list:
-    """Búsqueda full-text en historias"""
+def import_segmentation(data: dict, video: dict = None) -> int:
+    """
+    Carga la segmentación de un video (formato de `segmenter.segment_video`)
+    reemplazando las historias que ya hubiera de ese video, con su oyente y
+    lugar en `entidades` (en archivos anteriores a `entidades` se buscan en
+    el comienzo del texto).
+    
+    Args:
+        data: dict de data/segmentacion/<video_id>.json
+        video: info del video (url, titulo, fecha_emision, duracion_minutos)
+    
+    Returns:
+        Cantidad de historias cargadas
+    """
+    video_id = data['video_id']
+    video = video or {}
     conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute('''
-        SELECT h.*, 
-               bm25(historias_fts) as relevancia,
+        INSERT OR IGNORE INTO videos (video_id, url, titulo, fecha_emision, duracion_minutos, fecha_procesado)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (video_id, video.get('url') or f"https://www.youtube.com/watch?v={video_id}",
+          video.get('titulo'), video.get('fecha_emision'), video.get('duracion_minutos'),
+          datetime.now().isoformat()))
+    
+    unindex_fts(conn, 'historias_fts', 'WHERE video_id = ?', (video_id,))
+    cursor.execute('DELETE FROM historias WHERE video_id = ?', (video_id,))
+    
+    from src.entities import entity_rows, extract_entities  # entities importa de este módulo
+    
+    codec = text_codec(conn) if text_compression() else None
+    rows = []
+    entities = []
+    for h in data.get('historias', []):
+        clf = h.get('clasificacion') or {}
+        if clf.get('es_historia') is False:
+            continue
+        entities.append(h['entidades'] if 'entidades' in h
+                        else extract_entities(h.get('texto_completo', '')))
+        rows.append((
+            video_id, h['timestamp_inicio'], h.get('timestamp_fin'), clf.get('titulo'),
+            *_text_columns(codec, h.get('texto_completo', '')), clf.get('resumen'), clf.get('categoria'),
+            clf.get('subcategoria'), clf.get('tipo_narrador'), clf.get('wtf_score'),
+            int(bool(h.get('es_publicidad'))),
+            'humano' if clf.get('verificado_humano') else None,
+            int(bool(clf.get('verificado_humano'))), clf.get('fecha_supervision'),
+            h.get('mapa_tiempos')
+        ))
+    
+    cursor.executemany('''
+        INSERT INTO historias (
+            video_id, timestamp_inicio, timestamp_fin, titulo_inferido,
+            texto_completo, texto_comprimido, resumen, categoria, subcategoria,
+            tipo_narrador, wtf_score, es_publicidad, clasificado_por,
+            verificado_humano, fecha_clasificacion, mapa_tiempos
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    index_fts(conn, 'historias_fts', 'WHERE video_id = ?', (video_id,))
+    
+    # Las historias del video se acaban de insertar en orden: ids ascendentes
+    ids = [row[0] for row in cursor.execute(
+        'SELECT id FROM historias WHERE video_id = ? ORDER BY id', (video_id,))]
+    cursor.executemany('INSERT INTO entidades (historia_id, tipo, clave, valor) VALUES (?, ?, ?, ?)',
+                       [row for historia_id, found in zip(ids, entities)
+                        for row in entity_rows(historia_id, found)])
+    
+    cursor.execute('''
+        UPDATE videos SET total_historias = (
+            SELECT COUNT(*) FROM historias WHERE video_id = ?
+        ) WHERE video_id = ?
+    ''', (video_id, video_id))
+    
+    conn.commit()
+    conn.close()
+    return len(rows)
+
+
+def timestamp_for_offset(historia: dict, char_offset: int) -> float:
+    """
+    Segundo del video en que se dijo el caracter `char_offset` del
+    texto_completo de una historia (o su inicio si no tiene mapa).
+    """
+    second = timestamp_at(decode_time_map(historia.get('mapa_tiempos')), char_offset)
+    return second if second is not None else historia['timestamp_inicio']
+
+
+def _first_match_offset(texto: str, query: str) -> int:
+    """
+    Offset de la primera palabra del texto que coincide con un término de
+    una consulta FTS (-1 si no hay): misma forma sin tildes, misma raíz
+    ("luces" para "luz") o prefijo si el término termina en `*`.
+    """
+    terms = [term for term in re.findall(r'\w+\*?', query) if term.rstrip('*') not in FTS_OPERATORS]
+    prefixes = tuple(t[:-1].lower().translate(ACCENT_FOLD) for t in terms if t.endswith('*'))
+    words = {t.lower().translate(ACCENT_FOLD) for t in terms if not t.endswith('*')}
+    stems = {stem_word(t) for t in words}
+    if not words and not prefixes:
+        return -1
+    for match in WORD_RE.finditer(texto.lower().translate(ACCENT_FOLD)):
+        word = match.group()
+        if word in words or (prefixes and word.startswith(prefixes)) or stem_word(word) in stems:
+            return match.start()
+    return -1
+
+
+def encode_cursor(*values) -> str:
+    """Cursor opaco de paginación con los valores de orden de la última fila"""
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str, size: int) -> list:
+    """Decodifica un cursor de `encode_cursor` (ValueError si no es válido)"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Cursor de paginación inválido: {token!r}") from e
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError(f"Cursor de paginación inválido: {token!r}")
+    return values
+
+
+def search_historias_page(query: str, limit: int = 20, after: str = None) -> dict:
+    """
+    Búsqueda full-text en historias, paginada por cursor sobre
+    (relevancia, id): cada página filtra desde la última fila de la anterior
+    en vez de usar OFFSET.
+    
+    Cada resultado incluye `timestamp_match` y `youtube_url` apuntando al
+    segundo en que se dice el primer término buscado.
+    
+    Returns:
+        {'historias': [...], 'next_cursor': str | None}
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    # Primero la página de ids por relevancia; el texto se descomprime sólo
+    # para esas filas
+    sql = '''
+        WITH resultados AS (
+            SELECT rowid AS id, bm25(historias_fts) as relevancia
+            FROM historias_fts
+            WHERE historias_fts MATCH ?
+        ), pagina AS (
+            SELECT * FROM resultados
+    '''
+    params = [fts_query(query, fts_stemming(conn))]
+    if after:
+        relevancia, last_id = decode_cursor(after, 2)
+        sql += ' WHERE relevancia > ? OR (relevancia = ? AND id > ?)'
+        params += [relevancia, relevancia, last_id]
+    sql += ''' ORDER BY relevancia, id LIMIT ?
+        )
+        SELECT h.*, p.relevancia, v.titulo as video_titulo, v.fecha_emision
+        FROM pagina p
+        JOIN historias h ON p.id = h.id
+        JOIN videos v ON h.video_id = v.video_id
+        ORDER BY p.relevancia, p.id
+    '''
+    params.append(limit + 1)
+    cursor.execute(sql, params)
+    
+    results = []
+    for h in _decompress_rows(conn, cursor.fetchall()):
+        offset = _first_match_offset(h['texto_completo'], query)
+        h['timestamp_match'] = (timestamp_for_offset(h, offset) if offset >= 0
+                                else h['timestamp_inicio'])
+        h['youtube_url'] = f"https://www.youtube.com/watch?v={h['video_id']}&t={int(h['timestamp_match'])}s"
+        results.append(h)
+    conn.close()
+    
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        next_cursor = encode_cursor(results[-1]['relevancia'], results[-1]['id'])
+    return {'historias': results, 'next_cursor': next_cursor}
+
+
+def search_historias(query: str, limit: int = 20) -> list:
+    """Búsqueda full-text en historias (primera página de `search_historias_page`)"""
+    return search_historias_page(query, limit)['historias']
+
+
+def subtitle_windows(segments: list, window_seconds: float = 20.0) -> list:
+    """
+    Agrupa los segmentos de subtítulos en ventanas de `window_seconds`.
+    
+    Returns:
+        Lista de tuplas (inicio, fin, texto)
+    """
+    windows = []
+    current = []
+    window_start = None
+    window_end = None
+    for seg in segments:
+        if window_start is None or seg['start'] >= window_start + window_seconds:
+            if current:
+                windows.append((window_start, window_end, ' '.join(current)))
+            window_start = seg['start']
+            current = []
+        current.append(seg['text'])
+        window_end = seg['start'] + seg.get('duration', 0)
+    if current:
+        windows.append((window_start, window_end, ' '.join(current)))
+    return windows
+
+
+def index_subtitles(subs_dir: str = "data/subtitulos", video_ids: list = None,
+                    window_seconds: float = 20.0) -> int:
+    """
+    Indexa en `subtitulos_fts` las ventanas de subtítulos de todos los
+    episodios (segmentados o no), reemplazando las de cada video.
+    
+    Returns:
+        Cantidad de ventanas indexadas
+    """
+    if video_ids is None:
+        video_ids = [p.stem for p in sorted(Path(subs_dir).glob('*.json'))]
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    stemming = fts_stemming(conn)
+    total = 0
+    
+    for video_id in video_ids:
+        with open(f"{subs_dir}/{video_id}.json", 'r', encoding='utf-8') as f:
+            segments = json.load(f).get('segments', [])
+        
+        windows = subtitle_windows(segments, window_seconds)
+        unindex_fts(conn, 'subtitulos_fts', 'WHERE video_id = ?', (video_id,), stemming)
+        cursor.execute('DELETE FROM subtitulos_ventanas WHERE video_id = ?', (video_id,))
+        cursor.executemany(
+            'INSERT INTO subtitulos_ventanas (video_id, inicio, fin, texto) VALUES (?, ?, ?, ?)',
+            [(video_id, inicio, fin, texto) for inicio, fin, texto in windows]
+        )
+        index_fts(conn, 'subtitulos_fts', 'WHERE video_id = ?', (video_id,), stemming)
+        total += len(windows)
+    
+    # Todo en una sola transacción
+    conn.commit()
+    conn.close()
+    return total
+
+
+def search_subtitulos(query: str, limit: int = 20, video_id: str = None) -> list:
+    """
+    Búsqueda full-text de frases en las ventanas de subtítulos de todo el
+    archivo, ordenada por relevancia.
+    
+    Returns:
+        Lista de hits con video_id, inicio, fin, fragmento resaltado,
+        relevancia y youtube_url al segundo de la ventana
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    sql = '''
+        SELECT s.video_id,
+               s.inicio,
+               s.fin,
+               snippet(subtitulos_fts, 0, '[', ']', '…', 16) as fragmento,
+               bm25(subtitulos_fts) as relevancia,
                v.titulo as video_titulo,
                v.fecha_emision
-        FROM historias_fts fts
-        JOIN historias h ON fts.rowid = h.id
-        JOIN videos v ON h.video_id = v.video_id
-        WHERE historias_fts MATCH ?
-        ORDER BY relevancia
-        LIMIT ?
-    ''', (query, limit))
+        FROM subtitulos_fts fts
+        JOIN subtitulos_ventanas s ON fts.rowid = s.id
+        LEFT JOIN videos v ON s.video_id = v.video_id
+        WHERE subtitulos_fts MATCH ?
+    '''
+    params = [fts_query(query, fts_stemming(conn))]
+    if video_id:
+        sql += ' AND s.video_id = ?'
+        params.append(video_id)
+    sql += ' ORDER BY relevancia LIMIT ?'
+    params.append(limit)
     
-    results = [dict(row) for row in cursor.fetchall()]
+    cursor.execute(sql, params)
+    results = []
+    for row in cursor.fetchall():
+        hit = dict(row)
+        hit['youtube_url'] = f"https://www.youtube.com/watch?v={hit['video_id']}&t={int(hit['inicio'])}s"
+        results.append(hit)
     conn.close()
     return results
 
 
-def get_historias_by_filter(categoria: str = None, subcategoria: str = None,
-                            tipo_narrador: str = None, wtf_min: float = None,
-                            wtf_max: float = None, solo_verificadas: bool = False,
-                            limit: int = 50) -> list:
-    """Obtiene historias con filtros"""
+def get_historias_page(categoria: str = None, subcategoria: str = None,
+                       tipo_narrador: str = None, wtf_min: float = None,
+                       wtf_max: float = None, solo_verificadas: bool = False,
+                       limit: int = 50, after: str = None) -> dict:
+    """
+    Historias con filtros, paginadas por cursor sobre (wtf_score DESC, id).
+    
+    Cada página arranca desde la última fila de la anterior usando los
+    índices (es_publicidad, <filtro>, wtf_score DESC), así una página profunda
+    cuesta lo mismo que la primera. Las historias sin score van al final.
+    
+    Returns:
+        {'historias': [...], 'next_cursor': str | None}
+    """
     conn = get_connection()
     cursor = conn.cursor()
     
@@ -223,17 +993,141 @@ def get_historias_by_filter(categoria: str = None, subcategoria: str = None,
     if solo_verificadas:
         query += ' AND h.verificado_humano = 1'
     
-    query += ' ORDER BY h.wtf_score DESC LIMIT ?'
+    score = last_id = None
+    if after:
+        score, last_id = decode_cursor(after, 2)
+    
+    rows = []
+    if score is not None or after is None:
+        # Tramo con score: el `<=` redundante acota el rango del índice
+        page_query = query
+        page_params = list(params)
+        if after:
+            page_query += ' AND h.wtf_score <= ? AND (h.wtf_score < ? OR h.id > ?)'
+            page_params += [score, score, last_id]
+        page_query += ' ORDER BY h.wtf_score DESC, h.id LIMIT ?'
+        cursor.execute(page_query, page_params + [limit + 1])
+        rows = cursor.fetchall()
+    
+    if after and len(rows) <= limit:
+        # Tramo sin score (NULL va último en el orden descendente)
+        cursor.execute(query + ' AND h.wtf_score IS NULL AND h.id > ? ORDER BY h.id LIMIT ?',
+                       params + [last_id if score is None else 0, limit + 1 - len(rows)])
+        rows += cursor.fetchall()
+    
+    results = _decompress_rows(conn, rows[:limit])
+    conn.close()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(results[-1]['wtf_score'], results[-1]['id'])
+    return {'historias': results, 'next_cursor': next_cursor}
+
+
+def get_historias_by_filter(categoria: str = None, subcategoria: str = None,
+                            tipo_narrador: str = None, wtf_min: float = None,
+                            wtf_max: float = None, solo_verificadas: bool = False,
+                            limit: int = 50) -> list:
+    """Obtiene historias con filtros (primera página de `get_historias_page`)"""
+    return get_historias_page(categoria, subcategoria, tipo_narrador, wtf_min,
+                              wtf_max, solo_verificadas, limit)['historias']
+
+
+PAGE_COLUMNS = (
+    'id', 'video_id', 'timestamp_inicio', 'timestamp_fin', 'titulo_inferido',
+    'resumen', 'categoria', 'subcategoria', 'tipo_narrador', 'wtf_score',
+    'verificado_humano', 'video_titulo', 'fecha_emision',
+)
+
+
+def _facet_filters(filters: dict, wtf_min: float | None, skip: str = None) -> tuple:
+    """WHERE sobre `facetas` con todos los filtros salvo el de la dimensión `skip`"""
+    clauses, params = ['1 = 1'], []
+    for dim, value in filters.items():
+        if value and dim != skip:
+            clauses.append(f'{dim} = ?')
+            params.append(value)
+    if wtf_min is not None and skip != 'wtf':
+        clauses.append('wtf_tramo >= ?')
+        params.append(wtf_bucket(wtf_min))
+    return ' AND '.join(clauses), params
+
+
+def search_facets(categoria: str = None, subcategoria: str = None,
+                  tipo_narrador: str = None, wtf_min: float = None,
+                  solo_verificadas: bool = False, limit: int = 50) -> dict:
+    """
+    Búsqueda facetada: conteos por categoria, subcategoria, narrador y tramo
+    de WTF más la primera página de historias, en una sola consulta.
+    
+    Los conteos salen de la tabla `facetas` (no recorren `historias`) y cada
+    dimensión se cuenta con todos los filtros menos el suyo, así la UI puede
+    mostrar cuántas historias hay en las otras opciones. `wtf_min` se aplica
+    por tramos de 0.1 (0.55 es "desde 0.5"), también en la página.
+    
+    Returns:
+        {'total', 'facetas': {dimension: {valor: cantidad}}, 'historias': [...]}
+    """
+    filters = {'categoria': categoria, 'subcategoria': subcategoria, 'tipo_narrador': tipo_narrador}
+    count = 'verificadas' if solo_verificadas else 'total'
+    
+    parts, params = [], []
+    where, where_params = _facet_filters(filters, wtf_min)
+    parts.append(f'(SELECT COALESCE(SUM({count}), 0) FROM facetas WHERE {where}) AS total')
+    params += where_params
+    
+    for dim in FACET_DIMENSIONS + ('wtf_tramo',):
+        where, where_params = _facet_filters(filters, wtf_min, skip='wtf' if dim == 'wtf_tramo' else dim)
+        parts.append(f'''(
+            SELECT json_group_object({dim}, n) FROM (
+                SELECT {dim}, SUM({count}) AS n FROM facetas
+                WHERE {where} GROUP BY {dim} HAVING n > 0
+            )
+        ) AS {dim}''')
+        params += where_params
+    
+    page_where = ['h.es_publicidad = 0']
+    for dim, value in filters.items():
+        if value:
+            page_where.append(f'h.{dim} = ?')
+            params.append(value)
+    if wtf_min is not None:
+        # Piso del tramo, como los conteos: si no, total y página no coinciden
+        page_where.append('h.wtf_score >= ?')
+        params.append(max(wtf_bucket(wtf_min), 0) / WTF_BUCKETS)
+    if solo_verificadas:
+        page_where.append('h.verificado_humano = 1')
+    fields = ', '.join(f"'{name}', {name}" for name in PAGE_COLUMNS)
+    parts.append(f'''(
+        SELECT json_group_array(json_object({fields})) FROM (
+            SELECT h.*, v.titulo AS video_titulo, v.fecha_emision FROM historias h
+            JOIN videos v ON h.video_id = v.video_id
+            WHERE {' AND '.join(page_where)}
+            ORDER BY h.wtf_score DESC, h.id
+            LIMIT ?
+        )
+    ) AS historias''')
     params.append(limit)
     
-    cursor.execute(query, params)
-    results = [dict(row) for row in cursor.fetchall()]
+    query = 'SELECT ' + ',\n'.join(parts)
+    
+    conn = get_connection()
+    row = conn.execute(query, params).fetchone()
     conn.close()
-    return results
+    
+    facets = {}
+    for dim in FACET_DIMENSIONS:
+        facets[dim] = {k or None: v for k, v in json.loads(row[dim]).items()}
+    facets['wtf'] = {int(k): v for k, v in json.loads(row['wtf_tramo']).items()}
+    return {
+        'total': row['total'],
+        'facetas': facets,
+        'historias': json.loads(row['historias']),
+    }
 
 
 def get_stats() -> dict:
-    """Obtiene estadísticas de la base de datos"""
+    """Obtiene estadísticas de la base de datos (conteos desde `facetas`)"""
     conn = get_connection()
     cursor = conn.cursor()
     
@@ -242,80 +1136,155 @@ def get_stats() -> dict:
     cursor.execute('SELECT COUNT(*) FROM videos')
     stats['total_videos'] = cursor.fetchone()[0]
     
-    cursor.execute('SELECT COUNT(*) FROM historias WHERE es_publicidad = 0')
-    stats['total_historias'] = cursor.fetchone()[0]
-    
-    cursor.execute('SELECT COUNT(*) FROM historias WHERE verificado_humano = 1')
-    stats['historias_verificadas'] = cursor.fetchone()[0]
+    cursor.execute('''
+        SELECT COALESCE(SUM(total), 0), COALESCE(SUM(verificadas), 0),
+               SUM(suma_wtf) / NULLIF(SUM(CASE WHEN wtf_tramo >= 0 THEN total END), 0)
+        FROM facetas
+    ''')
+    stats['total_historias'], stats['historias_verificadas'], stats['wtf_promedio'] = cursor.fetchone()
     
     cursor.execute('''
-        SELECT categoria, COUNT(*) as count 
-        FROM historias 
-        WHERE es_publicidad = 0 AND categoria IS NOT NULL
+        SELECT categoria, SUM(total) as count 
+        FROM facetas 
+        WHERE categoria != ''
         GROUP BY categoria
         ORDER BY count DESC
     ''')
     stats['por_categoria'] = {row[0]: row[1] for row in cursor.fetchall()}
     
-    cursor.execute('SELECT AVG(wtf_score) FROM historias WHERE wtf_score IS NOT NULL')
-    stats['wtf_promedio'] = cursor.fetchone()[0]
-    
     conn.close()
     return stats
 
 
-def export_for_web(output_path: str = "web/data/historias.json") -> int:
-    """Exporta historias para la web frontend"""
-    conn = get_connection()
-    cursor = conn.cursor()
+def add_web_facet(counts: dict, historia: dict):
+    """Suma una historia a los conteos categoría -> [historias por tramo de WTF]"""
+    cat = historia.get('categoria') or 'otros'
+    buckets = counts.setdefault(cat, [0] * (WTF_BUCKETS + 1))
+    buckets[max(wtf_bucket(historia.get('wtf_score')), 0)] += 1
+
+
+def web_facets(historias) -> dict:
+    """
+    Conteos por categoría y tramo de WTF para la web: con esto el frontend
+    actualiza los contadores de los botones al mover el slider sin recorrer
+    todas las historias (sin score cuenta como tramo 0, igual que el filtro).
+    """
+    counts = {}
+    for h in historias:
+        add_web_facet(counts, h)
+    return {'tramos_wtf': WTF_BUCKETS, 'categoria_wtf': counts}
+
+
+def export_for_web(output_path: str = "web/data/historias.json", formats: tuple = ('json',)) -> int:
+    """Exporta historias para la web frontend (motor de src/exporter.py)"""
+    from src.exporter import ExportEngine, SQLiteSource  # exporter importa de este módulo
     
-    cursor.execute('''
-        SELECT 
-            h.id,
-            h.video_id,
-            h.timestamp_inicio,
-            h.timestamp_fin,
-            h.titulo_inferido,
-            h.resumen,
-            h.categoria,
-            h.subcategoria,
-            h.tipo_narrador,
-            h.wtf_score,
-            h.verificado_humano,
-            v.titulo as video_titulo,
-            v.fecha_emision
-        FROM historias h
-        JOIN videos v ON h.video_id = v.video_id
-        WHERE h.es_publicidad = 0
-        ORDER BY h.wtf_score DESC
-    ''')
+    summary = ExportEngine(SQLiteSource()).export(output_path, formats)
+    print(f"✅ Exportado: {output_path} ({summary['total']} historias)")
+    return summary['total']
+
+
+def import_segmentation_files(video_ids: list = None, seg_dir: str = "data/segmentacion") -> int:
+    """
+    Carga en la base los archivos de segmentación (todos o los indicados),
+    busca repeticiones de las historias nuevas (ver dedup) y actualiza las
+    series de tiempo de sus períodos (ver series)
+    """
+    videos = {}
+    try:
+        with open("data/videos_input.json", 'r', encoding='utf-8') as f:
+            videos = {v.get('video_id'): v for v in json.load(f).get('videos', [])}
+    except FileNotFoundError:
+        pass
     
-    historias = []
-    for row in cursor.fetchall():
-        h = dict(row)
-        # Generar URL de YouTube con timestamp
-        h['youtube_url'] = f"https://www.youtube.com/watch?v={h['video_id']}&t={int(h['timestamp_inicio'])}s"
-        historias.append(h)
+    if video_ids is None:
+        video_ids = [p.stem for p in sorted(Path(seg_dir).glob('*.json'))]
     
-    conn.close()
+    total = 0
+    for video_id in video_ids:
+        with open(f"{seg_dir}/{video_id}.json", 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        count = import_segmentation(data, videos.get(video_id))
+        print(f"   📥 {video_id}: {count} historias")
+        total += count
+    
+    # Buscar repeticiones de las historias nuevas en otros episodios
+    from src.dedup import index_duplicates  # dedup importa de este módulo
+    stats = index_duplicates()
+    print(f"   🔁 {stats['pares']} pares de historias repetidas nuevos, {stats['grupos']} grupos")
+    
+    from src.series import refresh_series  # series importa de este módulo
+    stats = refresh_series()
+    print(f"   📈 Series: {stats['semanas']} semanas, {stats['meses']} meses y "
+          f"{stats['trimestres']} trimestres recalculados")
+    return total
+
+
+def compress_texts(algorithm: str = None, sample_size: int = 2000, db_path: str = DB_PATH) -> dict:
+    """
+    Entrena un diccionario nuevo sobre (una muestra de) los textos actuales
+    y recomprime todas las historias con él. Con `algorithm` None usa
+    `database.compresion_texto` (y zlib si no está configurada).
+    
+    Returns:
+        Dict con diccionario (id), historias, bytes_texto y bytes_comprimidos
+    """
+    algorithm = algorithm or text_compression() or 'zlib'
+    conn = get_connection(db_path)
+    cursor = conn.cursor()
     
-    # Guardar JSON
-    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump({
-            "generated_at": datetime.now().isoformat(),
-            "total": len(historias),
-            "historias": historias
-        }, f, ensure_ascii=False, indent=2)
+    sample = [row[0] for row in cursor.execute(
+        f"SELECT {TEXT_SQL.format(row='')} FROM historias ORDER BY random() LIMIT ?", (sample_size,))]
+    cursor.execute("INSERT INTO diccionarios_texto (algoritmo, datos, creado) VALUES (?, ?, ?)",
+                   (algorithm, train_dictionary(sample, algorithm), datetime.now().isoformat()))
+    codec = text_codec(conn, algorithm)
     
-    print(f"✅ Exportado: {output_path} ({len(historias)} historias)")
-    return len(historias)
+    stats = {'diccionario': codec.current, 'historias': 0, 'bytes_texto': 0, 'bytes_comprimidos': 0}
+    rows = cursor.execute(f"SELECT id, {TEXT_SQL.format(row='')} FROM historias").fetchall()
+    updates = []
+    for historia_id, texto in rows:
+        blob = codec.compress(texto)
+        updates.append((blob, historia_id))
+        stats['historias'] += 1
+        stats['bytes_texto'] += len(texto.encode('utf-8'))
+        stats['bytes_comprimidos'] += len(blob)
+    cursor.executemany("UPDATE historias SET texto_completo = '', texto_comprimido = ? WHERE id = ?", updates)
+    
+    # Todas quedaron con el diccionario nuevo: los anteriores ya no se usan.
+    # El texto es el mismo, así que historias_fts no cambia
+    cursor.execute("DELETE FROM diccionarios_texto WHERE id != ?", (codec.current,))
+    conn.commit()
+    conn.close()
+    return stats
 
 
 if __name__ == "__main__":
+    import sys
+    
     # Inicializar base de datos
     init_db()
     
+    if len(sys.argv) > 1 and sys.argv[1] == 'importar':
+        total = import_segmentation_files(sys.argv[2:] or None)
+        print(f"✅ Importadas {total} historias")
+    elif len(sys.argv) > 1 and sys.argv[1] == 'indexar-subtitulos':
+        total = index_subtitles(video_ids=sys.argv[2:] or None)
+        print(f"✅ Indexadas {total} ventanas de subtítulos")
+    elif len(sys.argv) > 1 and sys.argv[1] == 'comprimir':
+        stats = compress_texts(sys.argv[2] if len(sys.argv) > 2 else None)
+        ratio = stats['bytes_comprimidos'] / stats['bytes_texto'] if stats['bytes_texto'] else 0
+        print(f"✅ Comprimidas {stats['historias']} historias con el diccionario {stats['diccionario']}: "
+              f"{stats['bytes_texto'] / 1e6:.1f} MB → {stats['bytes_comprimidos'] / 1e6:.1f} MB ({ratio:.0%})")
+    elif len(sys.argv) > 1 and sys.argv[1] == 'reindexar':
+        conn = get_connection()
+        for fts, total in rebuild_fts(conn).items():
+            print(f"✅ {fts}: {total} filas indexadas")
+        conn.close()
+    elif len(sys.argv) > 2 and sys.argv[1] == 'buscar':
+        for hit in search_subtitulos(' '.join(sys.argv[2:])):
+            print(f"   [{hit['video_id']} {int(hit['inicio'])}s] {hit['fragmento']}")
+            print(f"      🔗 {hit['youtube_url']}")
+    
     # Mostrar stats
     stats = get_stats()
     print(f"\n📊 Estadísticas:")
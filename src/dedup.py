@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Historias repetidas entre episodios (MinHash + LSH).
+
+Los oyentes vuelven a contar la misma historia otra noche, y las
+repeticiones y compilados pasan los mismos bloques otra vez. Cada historia
+se reduce a una firma MinHash de NUM_PERM valores sobre sus shingles (grupos
+de SHINGLE_WORDS palabras, en minúsculas y sin tildes): la proporción de
+valores iguales entre dos firmas estima la similitud de Jaccard de los
+textos.
+
+Para no comparar todas contra todas, la firma se corta en BANDS bandas de
+ROWS valores y cada banda se guarda hasheada en `dedup_bandas`. Sólo son
+candidatas las historias que comparten alguna banda (con 32 × 4 la
+probabilidad de chocar sube bruscamente alrededor de similitud 0.42) y
+sólo esos pares se verifican contra el umbral. El costo es lineal en la
+cantidad de historias nuevas, no cuadrático en el total.
+
+Es incremental: `index_duplicates` procesa sólo las historias sin firma
+(las de los videos recién importados; al reimportar un video, el trigger
+de borrado limpia sus firmas, bandas y pares y anota su grupo en
+`duplicados_revisar`). Los pares van a `duplicados_pares` y los grupos
+(componentes conexas) a `duplicados`, con el menor id de cada grupo como
+número de grupo; sólo se recalculan los grupos que tocan los pares nuevos
+o los anotados.
+
+    python3 src/dedup.py                 # indexa las historias nuevas
+    python3 src/dedup.py --reconstruir   # borra todo y vuelve a indexar
+"""
+import hashlib
+import sqlite3
+import sys
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.config import load_config
+from src.db import ACCENT_FOLD, DB_PATH, TEXT_SQL, WORD_RE, get_connection
+
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 3
+MIN_SHINGLES = 20             # Textos más cortos no dicen nada (y chocan entre sí)
+SEED = 1
+DEFAULT_THRESHOLD = 0.5       # Similitud de Jaccard estimada para considerar duplicado
+BATCH = 500                   # Historias por transacción al indexar
+
+# Hashing multiplicativo en 64 bits (el desborde es parte del hash): para
+# combinar las palabras de un shingle y para las NUM_PERM permutaciones,
+# h(x) = (a·x + b) mod 2^64 >> 32 con a impar
+_rng = np.random.RandomState(SEED)
+_SHINGLE_MULT = _rng.randint(1, 1 << 63, size=SHINGLE_WORDS, dtype=np.uint64) | np.uint64(1)
+_PERM_A = _rng.randint(1, 1 << 63, size=NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_PERM_B = _rng.randint(0, 1 << 63, size=NUM_PERM, dtype=np.uint64)
+_SHIFT = np.uint64(32)
+
+SIGNATURE = f"perm={NUM_PERM}|bandas={BANDS}|shingle={SHINGLE_WORDS}|semilla={SEED}"
+
+
+def dedup_threshold() -> float:
+    """Umbral de similitud de config.yaml (`dedup.umbral`)"""
+    return float(load_config().get('dedup', {}).get('umbral', DEFAULT_THRESHOLD))
+
+
+def shingles(text: str) -> np.ndarray:
+    """
+    Hashes de 32 bits (distintos) de los shingles de palabras: crc32 de cada
+    palabra (estable entre corridas) combinados de a SHINGLE_WORDS en NumPy
+    """
+    words = WORD_RE.findall((text or '').lower().translate(ACCENT_FOLD))
+    n = len(words) - SHINGLE_WORDS + 1
+    if n <= 0:
+        return np.empty(0, dtype=np.uint64)
+    ids = np.fromiter((zlib.crc32(w.encode('utf-8')) for w in words), dtype=np.uint64, count=len(words))
+    combined = np.zeros(n, dtype=np.uint64)
+    for k in range(SHINGLE_WORDS):
+        combined += ids[k:k + n] * _SHINGLE_MULT[k]
+    return np.unique(combined >> _SHIFT)
+
+
+def minhash(hashes: np.ndarray) -> np.ndarray | None:
+    """Firma MinHash (NUM_PERM uint32) de un conjunto de hashes; None si es muy chico"""
+    if len(hashes) < MIN_SHINGLES:
+        return None
+    permuted = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) >> _SHIFT
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def band_hashes(signature: np.ndarray) -> list:
+    """Hash (entero de 64 bits con signo, para SQLite) de cada banda de la firma"""
+    return [int.from_bytes(hashlib.blake2b(band.tobytes(), digest_size=8).digest(), 'little', signed=True)
+            for band in signature.reshape(BANDS, ROWS)]
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Jaccard estimada: proporción de valores iguales entre dos firmas"""
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+def _check_signature(conn) -> bool:
+    """Si cambiaron los parámetros de la firma, borra todo; True si hubo que hacerlo"""
+    row = conn.execute("SELECT valor FROM db_meta WHERE clave = 'dedup'").fetchone()
+    if row and row[0] == SIGNATURE:
+        return False
+    for table in ('dedup_firmas', 'dedup_bandas', 'duplicados_pares', 'duplicados', 'duplicados_revisar'):
+        conn.execute(f'DELETE FROM {table}')
+    conn.execute("INSERT OR REPLACE INTO db_meta (clave, valor) VALUES ('dedup', ?)", (SIGNATURE,))
+    conn.commit()
+    return bool(row)
+
+
+def _load_signatures(conn, ids) -> dict:
+    ids = list(ids)
+    result = {}
+    for i in range(0, len(ids), BATCH):
+        chunk = ids[i:i + BATCH]
+        rows = conn.execute(
+            f"SELECT historia_id, firma FROM dedup_firmas WHERE historia_id IN ({','.join('?' * len(chunk))})",
+            chunk)
+        result.update((hid, np.frombuffer(blob, dtype=np.uint32)) for hid, blob in rows)
+    return result
+
+
+def _index_batch(conn, rows: list, threshold: float) -> tuple:
+    """Firma un lote de historias, busca sus candidatas y guarda los pares; (candidatas, pares nuevos)"""
+    signatures = {}
+    for historia_id, texto in rows:
+        signatures[historia_id] = minhash(shingles(texto))
+
+    # Historias sin firma útil (muy cortas) quedan registradas con un blob vacío
+    conn.executemany("INSERT OR REPLACE INTO dedup_firmas (historia_id, firma) VALUES (?, ?)",
+                     ((hid, sig.tobytes() if sig is not None else b'') for hid, sig in signatures.items()))
+    bands = [(band, value, hid) for hid, sig in signatures.items() if sig is not None
+             for band, value in enumerate(band_hashes(sig))]
+    conn.executemany("INSERT OR IGNORE INTO dedup_bandas (banda, hash, historia_id) VALUES (?, ?, ?)", bands)
+
+    # Candidatas: las que comparten alguna banda (incluye las del mismo lote)
+    conn.execute('CREATE TEMP TABLE IF NOT EXISTS dedup_lote (banda INTEGER, hash INTEGER, historia_id INTEGER)')
+    conn.execute('DELETE FROM dedup_lote')
+    conn.executemany('INSERT INTO dedup_lote VALUES (?, ?, ?)', bands)
+    candidates = {
+        (min(a, b), max(a, b)) for a, b in conn.execute('''
+            SELECT DISTINCT l.historia_id, d.historia_id
+            FROM dedup_lote l
+            JOIN dedup_bandas d ON d.banda = l.banda AND d.hash = l.hash
+            WHERE d.historia_id != l.historia_id
+        ''')
+    }
+
+    others = _load_signatures(conn, {x for pair in candidates for x in pair} - set(signatures))
+    others.update(signatures)
+    pairs = []
+    for a, b in candidates:
+        score = similarity(others[a], others[b])
+        if score >= threshold:
+            pairs.append((a, b, round(score, 3)))
+    conn.executemany('INSERT OR REPLACE INTO duplicados_pares (historia_a, historia_b, similitud) VALUES (?, ?, ?)',
+                     pairs)
+    conn.commit()
+    return len(candidates), pairs
+
+
+def _component_pairs(conn, seeds: set) -> tuple:
+    """
+    Recorre `duplicados_pares` desde `seeds` por los índices de historia_a
+    e historia_b.
+
+    Returns:
+        (historias alcanzadas, pares (a, b, similitud) de sus componentes)
+    """
+    seen = set(seeds)
+    frontier = list(seeds)
+    pairs = set()
+    while frontier:
+        chunk, frontier = frontier[:BATCH], frontier[BATCH:]
+        marks = ','.join('?' * len(chunk))
+        for a, b, score in conn.execute(f'''
+            SELECT historia_a, historia_b, similitud FROM duplicados_pares WHERE historia_a IN ({marks})
+            UNION
+            SELECT historia_a, historia_b, similitud FROM duplicados_pares WHERE historia_b IN ({marks})
+        ''', chunk * 2):
+            pairs.add((a, b, score))
+            for x in (a, b):
+                if x not in seen:
+                    seen.add(x)
+                    frontier.append(x)
+    return seen, pairs
+
+
+def _current_groups(conn, ids: set) -> dict:
+    ids = list(ids)
+    result = {}
+    for i in range(0, len(ids), BATCH):
+        chunk = ids[i:i + BATCH]
+        rows = conn.execute(
+            f"SELECT historia_id, grupo, similitud FROM duplicados WHERE historia_id IN ({','.join('?' * len(chunk))})",
+            chunk)
+        result.update((row[0], (row[1], row[2])) for row in rows)
+    return result
+
+
+def refresh_groups(conn, seeds: set = None) -> dict:
+    """
+    Recalcula los grupos (componentes conexas de `duplicados_pares`) y
+    actualiza sólo las filas de `duplicados` que cambiaron.
+
+    Con `seeds` sólo recalcula las componentes de esas historias y las de los
+    grupos anotados en `duplicados_revisar`; sin `seeds`, todas.
+
+    Returns:
+        Dict con grupos, historias (en algún grupo) y cambios
+    """
+    if seeds is None:
+        pairs = conn.execute('SELECT historia_a, historia_b, similitud FROM duplicados_pares').fetchall()
+        current = {row[0]: (row[1], row[2]) for row in conn.execute(
+            'SELECT historia_id, grupo, similitud FROM duplicados')}
+    else:
+        # Los miembros que quedan de un grupo con una historia borrada pueden
+        # haberse separado o haber perdido la raíz
+        seeds = set(seeds) | {row[0] for row in conn.execute('''
+            SELECT d.historia_id FROM duplicados d JOIN duplicados_revisar r ON r.grupo = d.grupo
+        ''')}
+        reached, pairs = _component_pairs(conn, seeds)
+        current = _current_groups(conn, reached)
+
+    parent = {}
+
+    def find(x):
+        root = x
+        while parent.setdefault(root, root) != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    best = {}
+    for a, b, score in pairs:
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)     # La raíz es el menor id del grupo
+        best[a] = max(best.get(a, 0), score)
+        best[b] = max(best.get(b, 0), score)
+
+    wanted = {x: (find(x), best[x]) for x in parent}
+    removed = [(x,) for x in current.keys() - wanted.keys()]
+    changed = [(x, g, s) for x, (g, s) in wanted.items() if current.get(x) != (g, s)]
+    conn.executemany('DELETE FROM duplicados WHERE historia_id = ?', removed)
+    conn.executemany('INSERT OR REPLACE INTO duplicados (historia_id, grupo, similitud) VALUES (?, ?, ?)', changed)
+    conn.execute('DELETE FROM duplicados_revisar')
+    conn.commit()
+    groups, stories = conn.execute('SELECT COUNT(DISTINCT grupo), COUNT(*) FROM duplicados').fetchone()
+    return {'grupos': groups, 'historias': stories, 'cambios': len(removed) + len(changed)}
+
+
+def index_duplicates(db_path: str = DB_PATH, threshold: float = None, rebuild: bool = False) -> dict:
+    """
+    Firma las historias que todavía no tienen firma (no publicidad), guarda
+    los pares que superan el umbral y actualiza los grupos.
+
+    Returns:
+        Dict con firmadas, candidatas (pares comparados), pares (nuevos),
+        grupos, historias (agrupadas) y cambios
+    """
+    threshold = dedup_threshold() if threshold is None else threshold
+    conn = get_connection(db_path)
+    try:
+        if rebuild:
+            conn.execute("DELETE FROM db_meta WHERE clave = 'dedup'")
+        _check_signature(conn)
+
+        # De a BATCH textos por vez: el cursor sigue abierto mientras se
+        # guardan las firmas del lote, que son de ids ya recorridos
+        cursor = conn.execute(f'''
+            SELECT h.id, {TEXT_SQL.format(row='h.')}
+            FROM historias h
+            LEFT JOIN dedup_firmas f ON f.historia_id = h.id
+            WHERE f.historia_id IS NULL AND COALESCE(h.es_publicidad, 0) = 0
+            ORDER BY h.id
+        ''')
+        stats = {'firmadas': 0, 'candidatas': 0, 'pares': 0}
+        touched = set()
+        while True:
+            rows = cursor.fetchmany(BATCH)
+            if not rows:
+                break
+            candidates, pairs = _index_batch(conn, rows, threshold)
+            stats['firmadas'] += len(rows)
+            stats['candidatas'] += candidates
+            stats['pares'] += len(pairs)
+            touched.update(x for a, b, _ in pairs for x in (a, b))
+        stats.update(refresh_groups(conn, touched))
+        return stats
+    finally:
+        conn.close()
+
+
+def load_duplicate_groups(db_path: str = DB_PATH) -> dict:
+    """
+    Grupos de duplicados para el export, por (video_id, segundo de inicio):
+    la clave con la que el exporter identifica una historia en cualquier
+    fuente.
+
+    Returns:
+        {(video_id, segundo): [(video_id, timestamp_inicio), ...] del grupo}
+        (la misma lista para todos los miembros; vacío si no hay base)
+    """
+    if not Path(db_path).exists():
+        return {}
+    conn = get_connection(db_path)
+    try:
+        try:
+            rows = conn.execute('''
+                SELECT d.grupo, h.video_id, h.timestamp_inicio
+                FROM duplicados d
+                JOIN historias h ON h.id = d.historia_id
+                ORDER BY d.grupo, h.video_id, h.timestamp_inicio
+            ''').fetchall()
+        except sqlite3.OperationalError:
+            return {}   # Base anterior a las tablas de duplicados
+    finally:
+        conn.close()
+
+    groups = {}
+    for grupo, video_id, inicio in rows:
+        groups.setdefault(grupo, []).append((video_id, inicio))
+    return {(video_id, int(inicio)): members
+            for members in groups.values() for video_id, inicio in members}
+
+
+def get_duplicates(historia_id: int, db_path: str = DB_PATH) -> list:
+    """Las otras historias del grupo de una historia (con video y similitud)"""
+    conn = get_connection(db_path)
+    try:
+        return [dict(row) for row in conn.execute('''
+            SELECT h.id, h.video_id, h.timestamp_inicio, h.titulo_inferido, d.similitud
+            FROM duplicados d
+            JOIN historias h ON h.id = d.historia_id
+            WHERE d.grupo = (SELECT grupo FROM duplicados WHERE historia_id = ?)
+              AND d.historia_id != ?
+            ORDER BY h.video_id, h.timestamp_inicio
+        ''', (historia_id, historia_id))]
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    from src.db import init_db
+
+    init_db()
+    stats = index_duplicates(rebuild='--reconstruir' in sys.argv)
+    print(f"✅ Firmadas {stats['firmadas']} historias nuevas, {stats['pares']} pares nuevos")
+    print(f"   🔁 {stats['grupos']} grupos de duplicados ({stats['historias']} historias, "
+          f"{stats['cambios']} cambios)")
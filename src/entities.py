@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Oyentes y lugares de las historias.
+
+Los patrones de inicio de config.yaml ya leen "me escribe Ignacia de
+Paraguay" o "soy Marta de La Plata": con los grupos `nombre` y `lugar`
+(ver `rules`), el segmentador guarda en cada historia lo que capturaron
+los patrones de sus primeros `entidades.ventana_segundos` segundos
+(`entidades` en data/segmentacion/<video_id>.json).
+
+Al importar, cada historia deja a lo sumo un nombre y un lugar en la tabla
+`entidades`, con la clave normalizada (minúsculas, sin tildes, alias de
+lugares) y el valor para mostrar. Con el índice por (tipo, clave) buscar
+todas las llamadas de un oyente o de un lugar no recorre las historias.
+
+    python3 src/entities.py lugar paraguay
+    python3 src/entities.py nombre ignacia
+    python3 src/entities.py recurrentes       # oyentes con más de una historia
+    python3 src/entities.py indexar           # historias importadas sin entidades
+"""
+import sqlite3
+import sys
+from functools import lru_cache
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.config import load_config
+from src.db import ACCENT_FOLD, DB_PATH, TEXT_SQL, WORD_RE, get_connection
+from src.models import SegmentArray
+
+
+TYPES = ('nombre', 'lugar')
+DEFAULT_WINDOW_SECONDS = 90
+TEXT_WINDOW_CHARS = 1500      # ~90 s de habla, para historias sin `entidades`
+
+
+@lru_cache(maxsize=None)
+def entity_settings() -> tuple:
+    """
+    (ventana en segundos, capturas a ignorar, alias de lugares, palabras que
+    no van en un lugar) del config
+    """
+    config = load_config().get('entidades', {})
+    ignore = frozenset(normalize_key(v) for v in config.get('ignorar') or [])
+    aliases = {normalize_key(k): v for k, v in (config.get('alias_lugares') or {}).items()}
+    not_places = frozenset(normalize_key(v) for v in config.get('lugares_ignorar') or [])
+    return config.get('ventana_segundos', DEFAULT_WINDOW_SECONDS), ignore, aliases, not_places
+
+
+def normalize_key(value: str) -> str:
+    """Clave de búsqueda: palabras en minúsculas, sin tildes, separadas por un espacio"""
+    return ' '.join(WORD_RE.findall((value or '').lower().translate(ACCENT_FOLD)))
+
+
+def normalize_entity(tipo: str, value: str) -> tuple | None:
+    """
+    (clave, valor para mostrar) de una captura, o None si no sirve
+    (palabras de `entidades.ignorar`, números, una sola letra, lugares con
+    alguna palabra de `entidades.lugares_ignorar`)
+    """
+    _, ignore, aliases, not_places = entity_settings()
+    key = normalize_key(value)
+    if len(key) < 2 or key in ignore or key.isdigit():
+        return None
+    if tipo == 'lugar' and not not_places.isdisjoint(key.split()):
+        return None
+    if tipo == 'lugar' and key in aliases:
+        display = aliases[key]
+        key = normalize_key(display)
+    else:
+        display = ' '.join(WORD_RE.findall((value or '').lower()))
+    return key, display.title()
+
+
+def story_entities(starts, end_time: float, captures: dict, first: int) -> dict | None:
+    """
+    Nombre y lugar de una historia: lo primero que capturaron los patrones
+    en los segmentos desde `first` hasta `ventana_segundos` después del
+    inicio (sin pasar el fin). Si el nombre de un segmento no sirve ("soy
+    oyente de Boca"), tampoco se toma su lugar.
+
+    Args:
+        starts: inicios de los segmentos (array o SegmentArray.start)
+        captures: `scan(...)['capturas']` del episodio
+    """
+    window = entity_settings()[0]
+    limit = min(starts[first] + window, end_time)
+    found = {}
+    i = first
+    while i < len(starts) and starts[i] < limit and len(found) < len(TYPES):
+        groups = captures.get(i, {})
+        entities = {tipo: normalize_entity(tipo, value) for tipo, value in groups.items() if tipo in TYPES}
+        if 'nombre' in groups and entities.get('nombre') is None:
+            entities.pop('lugar', None)
+        for tipo, entity in entities.items():
+            if entity and tipo not in found:
+                found[tipo] = entity[1]
+        i += 1
+    return found or None
+
+
+def extract_entities(text: str, engine=None) -> dict | None:
+    """
+    Nombre y lugar del comienzo de un texto (historias segmentadas antes de
+    que el segmentador guardara `entidades`)
+    """
+    from src.rules import get_rule_engine
+
+    engine = engine or get_rule_engine()
+    segments = SegmentArray([0.0], [0.0], [(text or '')[:TEXT_WINDOW_CHARS]])
+    return story_entities(segments.start, float('inf'), engine.scan(segments)['capturas'], 0)
+
+
+def entity_rows(historia_id: int, entities: dict | None) -> list:
+    """Filas de `entidades` de una historia: (historia_id, tipo, clave, valor)"""
+    rows = []
+    for tipo, value in (entities or {}).items():
+        entity = normalize_entity(tipo, value) if tipo in TYPES else None
+        if entity:
+            rows.append((historia_id, tipo, *entity))
+    return rows
+
+
+def index_entities(db_path: str = DB_PATH) -> dict:
+    """
+    Busca nombre y lugar en el texto de las historias que no tienen
+    entidades (importadas antes de la tabla, o sin capturas: esas se vuelven
+    a revisar, con el config actual)
+
+    Returns:
+        {'historias': revisadas, 'entidades': filas nuevas}
+    """
+    conn = get_connection(db_path)
+    try:
+        rows = conn.execute(f'''
+            SELECT h.id, {TEXT_SQL.format(row='h.')} FROM historias h
+            WHERE NOT EXISTS (SELECT 1 FROM entidades e WHERE e.historia_id = h.id)
+        ''').fetchall()
+        new = [row for historia_id, texto in rows
+               for row in entity_rows(historia_id, extract_entities(texto))]
+        conn.executemany('INSERT INTO entidades (historia_id, tipo, clave, valor) VALUES (?, ?, ?, ?)', new)
+        conn.commit()
+    finally:
+        conn.close()
+    return {'historias': len(rows), 'entidades': len(new)}
+
+
+def find_stories(nombre: str = None, lugar: str = None, limit: int = 100,
+                 db_path: str = DB_PATH) -> list:
+    """
+    Historias de un oyente, de un lugar o de ambos ("Ignacia de Paraguay"),
+    en orden de emisión.
+    """
+    filters = [(tipo, normalize_key(value)) for tipo, value in (('nombre', nombre), ('lugar', lugar))
+               if value]
+    if not filters:
+        raise ValueError("Indicar nombre, lugar o ambos")
+
+    joins = []
+    params = []
+    for i, (tipo, key) in enumerate(filters):
+        joins.append(f"JOIN entidades e{i} ON e{i}.historia_id = h.id "
+                     f"AND e{i}.tipo = ? AND e{i}.clave = ?")
+        params += [tipo, key]
+    params.append(limit)
+
+    conn = get_connection(db_path)
+    try:
+        return [dict(row) for row in conn.execute(f'''
+            SELECT h.id, h.video_id, h.timestamp_inicio, h.titulo_inferido, h.categoria,
+                   h.wtf_score, v.fecha_emision,
+                   (SELECT valor FROM entidades WHERE historia_id = h.id AND tipo = 'nombre') AS nombre,
+                   (SELECT valor FROM entidades WHERE historia_id = h.id AND tipo = 'lugar') AS lugar
+            FROM historias h
+            {' '.join(joins)}
+            JOIN videos v ON v.video_id = h.video_id
+            ORDER BY v.fecha_emision, h.video_id, h.timestamp_inicio
+            LIMIT ?
+        ''', params)]
+    finally:
+        conn.close()
+
+
+def entity_counts(tipo: str, min_stories: int = 1, limit: int = None,
+                  db_path: str = DB_PATH) -> list:
+    """
+    Valores de un tipo con su cantidad de historias y de episodios, de mayor
+    a menor ([] si la base es anterior a la tabla de entidades)
+    """
+    if not Path(db_path).exists():
+        return []
+    conn = get_connection(db_path)
+    try:
+        return [dict(row) for row in conn.execute('''
+            SELECT MIN(e.valor) AS valor, COUNT(*) AS historias,
+                   COUNT(DISTINCT h.video_id) AS episodios
+            FROM entidades e
+            JOIN historias h ON h.id = e.historia_id
+            WHERE e.tipo = ? AND h.es_publicidad = 0
+            GROUP BY e.clave
+            HAVING COUNT(*) >= ?
+            ORDER BY historias DESC, valor
+            LIMIT ?
+        ''', (tipo, min_stories, -1 if limit is None else limit))]
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] in TYPES:
+        hits = find_stories(**{sys.argv[1]: ' '.join(sys.argv[2:])})
+        for hit in hits:
+            quien = ' de '.join(v for v in (hit['nombre'], hit['lugar']) if v)
+            print(f"   [{hit['fecha_emision'] or '?'} {hit['video_id']} {int(hit['timestamp_inicio'])}s] "
+                  f"{quien}: {hit['titulo_inferido'] or 'sin título'}")
+        print(f"\n📊 {len(hits)} historias")
+    elif len(sys.argv) > 1 and sys.argv[1] == 'indexar':
+        from src.db import init_db
+
+        init_db()
+        stats = index_entities()
+        print(f"✅ Revisadas {stats['historias']} historias: {stats['entidades']} entidades nuevas")
+    elif len(sys.argv) > 1 and sys.argv[1] == 'recurrentes':
+        for row in entity_counts('nombre', min_stories=2):
+            print(f"   🔁 {row['valor']}: {row['historias']} historias en {row['episodios']} episodios")
+    else:
+        print("Uso: python3 src/entities.py nombre <nombre> | lugar <lugar> | recurrentes | indexar")
+        sys.exit(1)
@@ -0,0 +1,745 @@
+#!/usr/bin/env python3
+"""
+Motor de export para la web - Un único camino desde cualquier fuente
+(archivos de segmentación o SQLite) hacia los formatos que consume la web.
+
+Fuentes:
+    FilesystemSource   data/pipeline_status.json + data/segmentacion/*.json
+    SQLiteSource       data/historias.db
+
+Formatos (se escriben todos en una sola pasada sobre las historias):
+    json        {"generated_at", "historias": [...], "total", "facetas"}
+    ndjson      una historia por línea
+    *.gz        variante comprimida con gzip (json.gz, ndjson.gz)
+    *.br        variante comprimida con brotli (json.br, ndjson.br; opcional)
+    fragmentos  un JSON por video en <nombre>/ + indice.json
+    delta       versiones/manifest.json + un parche por versión con las
+                historias agregadas, modificadas y eliminadas (implica json)
+
+Con `duplicates` (grupos de src/dedup.py) los formatos de un solo archivo
+muestran una sola vez cada historia repetida entre episodios: la primera en
+el orden del export, con las otras emisiones en `repeticiones`. Los
+fragmentos por video no se colapsan: cada uno es el contenido del episodio.
+
+Cada historia lleva `oyente` y `lugar` (ver src/entities.py) y las facetas
+cuentan las historias por lugar y por oyente recurrente (más de una). Con
+`incluir_texto` en la fuente también lleva `texto_completo` y `mapa_tiempos`
+(ver src/timemap.py): la web busca en el texto y enlaza al segundo en que se
+dice lo buscado. Es opcional porque multiplica el tamaño del export.
+
+Ids estables: cada historia (video + segundo de inicio) conserva su id entre
+corridas (data/export_ids.json), así los caches de los clientes siguen
+sirviendo. Escritura incremental: un archivo cuyo contenido no cambió no se
+reescribe, y con `fragmentos` sólo se regeneran los videos modificados.
+
+Cada archivo se escribe en un temporal del mismo directorio y se renombra al
+final: la web nunca ve un export a medio escribir.
+"""
+import gzip
+import hashlib
+import heapq
+import io
+import json
+import os
+import sys
+import tempfile
+from collections import Counter
+from datetime import datetime
+from itertools import chain
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.db import DB_PATH, TEXT_SQL, WTF_BUCKETS, add_web_facet, get_connection
+from src.models import Classification, Story
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+FORMATS = ('json', 'json.gz', 'json.br', 'ndjson', 'ndjson.gz', 'ndjson.br', 'fragmentos', 'delta')
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+IDS_PATH = "data/export_ids.json"
+MANIFEST_NAME = "export_manifest.json"
+SHARD_INDEX_NAME = "indice.json"
+DELTA_DIR_NAME = "versiones"
+DELTA_STATE_NAME = "estado.json"
+MAX_PATCHES = 30              # Clientes más atrasados bajan el export completo
+DEFAULT_DURATION = 300        # timestamp_fin cuando la segmentación no lo tiene
+SPOOL_RUN_SIZE = 5000         # Historias en memoria por tramo del ordenamiento externo
+
+
+# --------------------------------------------------------------------------
+# Historias
+# --------------------------------------------------------------------------
+
+def web_historia(video_id: str, timestamp_inicio: float, timestamp_fin: float = None,
+                 titulo: str = None, resumen: str = None, categoria: str = None,
+                 subcategoria: str = None, tipo_narrador: str = None,
+                 wtf_score: float = None, verificado_humano: bool = False,
+                 video_titulo: str = None, fecha_emision: str = None,
+                 oyente: str = None, lugar: str = None,
+                 texto_completo: str = None, mapa_tiempos: str = None) -> dict:
+    """
+    Historia con el schema de la web (el mismo para todas las fuentes).
+    `texto_completo` y `mapa_tiempos` sólo se incluyen si no son None.
+    """
+    if timestamp_fin is None:
+        timestamp_fin = timestamp_inicio + DEFAULT_DURATION
+    seconds = int(timestamp_inicio)
+    historia = {
+        'id': None,
+        'video_id': video_id,
+        'video_titulo': video_titulo or '',
+        'timestamp_inicio': timestamp_inicio,
+        'timestamp_fin': timestamp_fin,
+        'timestamp_fmt': f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}",
+        'titulo_inferido': titulo or 'Historia sin título',
+        'resumen': resumen or '',
+        'categoria': categoria or 'otros',
+        'subcategoria': subcategoria or 'general',
+        'tipo_narrador': tipo_narrador or 'oyente',
+        'wtf_score': wtf_score,
+        'verificado_humano': bool(verificado_humano),
+        'fecha_emision': fecha_emision or '',
+        'oyente': oyente or '',
+        'lugar': lugar or '',
+        'youtube_url': f"https://www.youtube.com/watch?v={video_id}&t={seconds}s",
+    }
+    if texto_completo is not None:
+        historia['texto_completo'] = texto_completo
+        historia['mapa_tiempos'] = mapa_tiempos or ''
+    return historia
+
+
+def export_order(historia: dict) -> tuple:
+    """Orden del export: WTF descendente (sin score al final), luego video y segundo"""
+    score = historia['wtf_score']
+    return (score is None, -(score or 0), historia['video_id'], historia['timestamp_inicio'])
+
+
+def entity_facets(historias_por_lugar: Counter, historias_por_oyente: Counter) -> dict:
+    """Facetas de entidades: historias por lugar y por oyente que volvió a llamar"""
+    return {
+        'lugar': dict(historias_por_lugar.most_common()),
+        'oyente': {k: n for k, n in historias_por_oyente.most_common() if n > 1},
+    }
+
+
+def collapse_duplicates(historias, groups: dict):
+    """
+    Deja pasar la primera historia de cada grupo de duplicados y descarta
+    las demás; la que queda lleva `repeticiones` con las otras emisiones.
+
+    Args:
+        historias: iterable en el orden del export
+        groups: (video_id, segundo) -> miembros del grupo (`dedup.load_duplicate_groups`)
+    """
+    seen = set()
+    for historia in historias:
+        key = (historia['video_id'], int(historia['timestamp_inicio']))
+        members = groups.get(key)
+        if members:
+            if members[0] in seen:
+                continue
+            seen.add(members[0])
+            historia['repeticiones'] = [
+                {'video_id': video_id, 'timestamp_inicio': inicio,
+                 'youtube_url': f"https://www.youtube.com/watch?v={video_id}&t={int(inicio)}s"}
+                for video_id, inicio in members if (video_id, int(inicio)) != key
+            ]
+        yield historia
+
+
+def _read_run(run):
+    run.seek(0)
+    for line in run:
+        yield json.loads(line)
+
+
+def spool_sorted(items, key, run_size: int = SPOOL_RUN_SIZE):
+    """
+    Ordena un iterable de dicts sin tenerlos todos en memoria (ordenamiento
+    externo): cada `run_size` items se ordenan y se vuelcan a un temporal
+    NDJSON, y los tramos se mezclan con `heapq.merge`. En memoria quedan un
+    tramo mientras se arma y después un item por tramo.
+    """
+    runs = []
+    try:
+        batch = []
+        for item in chain(items, [None]):
+            if item is not None:
+                batch.append(item)
+            if batch and (len(batch) >= run_size or item is None):
+                batch.sort(key=key)
+                run = tempfile.TemporaryFile()
+                runs.append(run)
+                run.writelines(json.dumps(i, ensure_ascii=False).encode('utf-8') + b'\n' for i in batch)
+                batch = []
+        yield from heapq.merge(*(_read_run(run) for run in runs), key=key)
+    finally:
+        for run in runs:
+            run.close()
+
+
+class IdRegistry:
+    """Ids estables por (video, segundo de inicio), persistidos entre exports"""
+
+    def __init__(self, path: str = IDS_PATH):
+        self.path = Path(path)
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {}
+        self.ids = data.get('ids', {})
+        self.next_id = data.get('siguiente', max(self.ids.values(), default=0) + 1)
+        self.changed = False
+
+    def assign(self, historia: dict) -> dict:
+        """Completa `historia['id']` (nuevo si es la primera vez que se exporta)"""
+        key = f"{historia['video_id']}:{int(historia['timestamp_inicio'])}"
+        if key not in self.ids:
+            self.ids[key] = self.next_id
+            self.next_id += 1
+            self.changed = True
+        historia['id'] = self.ids[key]
+        return historia
+
+    def save(self):
+        if not self.changed:
+            return
+        _write_atomic(self.path, json.dumps(
+            {'siguiente': self.next_id, 'ids': self.ids}, ensure_ascii=False, indent=1))
+        self.changed = False
+
+
+# --------------------------------------------------------------------------
+# Fuentes
+# --------------------------------------------------------------------------
+
+class Source:
+    """
+    Fuente de historias para el export.
+
+    Las subclases implementan `videos()` e `iter_video()`; `iter_ordered()`
+    por defecto ordena en disco (spool) y se puede reemplazar si la fuente ya
+    entrega las historias ordenadas.
+    """
+
+    def videos(self) -> list:
+        """Lista de (video_id, huella); la huella cambia si cambió el video (None: desconocida)"""
+        raise NotImplementedError
+
+    def iter_video(self, video_id: str):
+        """Historias exportables de un video"""
+        raise NotImplementedError
+
+    def iter_ordered(self):
+        """Todas las historias en el orden del export (`export_order`)"""
+        videos = (self.iter_video(video_id) for video_id, _ in self.videos())
+        return spool_sorted(chain.from_iterable(videos), key=export_order)
+
+
+class FilesystemSource(Source):
+    """Archivos de segmentación de los videos de data/pipeline_status.json"""
+
+    def __init__(self, status_path: str = "data/pipeline_status.json",
+                 seg_dir: str = "data/segmentacion",
+                 videos_path: str = "data/videos_input.json",
+                 solo_verificadas: bool = True, incluir_texto: bool = False):
+        self.seg_dir = Path(seg_dir)
+        self.solo_verificadas = solo_verificadas
+        self.incluir_texto = incluir_texto
+        with open(status_path, 'r', encoding='utf-8') as f:
+            self.status_videos = json.load(f).get('videos', [])
+        self.status_by_id = {v['video_id']: v for v in self.status_videos}
+        try:
+            with open(videos_path, 'r', encoding='utf-8') as f:
+                self.video_info = {v.get('video_id'): v for v in json.load(f).get('videos', [])}
+        except FileNotFoundError:
+            self.video_info = {}
+
+    def _video_meta(self, video: dict) -> tuple:
+        info = self.video_info.get(video['video_id'], {})
+        titulo = video.get('titulo') or info.get('titulo', '')
+        fecha = video.get('fecha_emision') or info.get('fecha_emision') or info.get('fecha', '')
+        return titulo, fecha
+
+    def videos(self) -> list:
+        result = []
+        for video in self.status_videos:
+            path = self.seg_dir / f"{video['video_id']}.json"
+            if path.exists():
+                stat = path.stat()
+                titulo, fecha = self._video_meta(video)
+                huella = (f"{stat.st_mtime_ns}:{stat.st_size}:{titulo}:{fecha}:"
+                          f"{self.solo_verificadas}:{self.incluir_texto}")
+            else:
+                huella = 'sin_segmentacion'
+            result.append((video['video_id'], huella))
+        return result
+
+    def iter_video(self, video_id: str):
+        video = self.status_by_id.get(video_id, {'video_id': video_id})
+        titulo_video, fecha_emision = self._video_meta(video)
+        try:
+            with open(self.seg_dir / f"{video_id}.json", 'r', encoding='utf-8') as f:
+                seg_data = json.load(f)
+        except FileNotFoundError:
+            return
+
+        for historia in map(Story.from_dict, seg_data.get('historias', [])):
+            clf = historia.clasificacion or Classification()
+
+            # Solo exportar historias reales (y supervisadas, si se pide)
+            if clf.es_historia is False or historia.es_publicidad:
+                continue
+            if self.solo_verificadas and not clf.verificado_humano:
+                continue
+
+            entidades = historia.entidades or {}
+            yield web_historia(
+                video_id, historia.timestamp_inicio, historia.timestamp_fin,
+                clf.titulo, clf.resumen, clf.categoria,
+                clf.subcategoria, clf.tipo_narrador, clf.wtf_score,
+                clf.verificado_humano, titulo_video, fecha_emision,
+                entidades.get('nombre'), entidades.get('lugar'),
+                historia.texto_completo if self.incluir_texto else None,
+                historia.mapa_tiempos if self.incluir_texto else None
+            )
+
+
+class SQLiteSource(Source):
+    """Historias de la base (sin publicidad), ya ordenadas por SQL"""
+
+    QUERY = '''
+        SELECT h.video_id, h.timestamp_inicio, h.timestamp_fin, h.titulo_inferido,
+               h.resumen, h.categoria, h.subcategoria, h.tipo_narrador, h.wtf_score,
+               h.verificado_humano, v.titulo as video_titulo, v.fecha_emision,
+               en.valor AS oyente, el.valor AS lugar{texto}
+        FROM historias h
+        JOIN videos v ON h.video_id = v.video_id
+        LEFT JOIN entidades en ON en.historia_id = h.id AND en.tipo = 'nombre'
+        LEFT JOIN entidades el ON el.historia_id = h.id AND el.tipo = 'lugar'
+        WHERE h.es_publicidad = 0
+    '''
+
+    def __init__(self, db_path: str = DB_PATH, solo_verificadas: bool = False,
+                 incluir_texto: bool = False):
+        self.db_path = db_path
+        self.solo_verificadas = solo_verificadas
+        self.incluir_texto = incluir_texto
+
+    def _query(self, where: str = '', order: str = '', params: tuple = ()):
+        texto = f", {TEXT_SQL.format(row='h.')}, h.mapa_tiempos" if self.incluir_texto else ''
+        sql = self.QUERY.format(texto=texto) + (' AND h.verificado_humano = 1' if self.solo_verificadas else '') + where + order
+        conn = get_connection(self.db_path)
+        try:
+            for row in conn.execute(sql, params):
+                yield web_historia(*row)
+        finally:
+            conn.close()
+
+    def videos(self) -> list:
+        conn = get_connection(self.db_path)
+        try:
+            return [(row[0], None) for row in conn.execute(
+                'SELECT DISTINCT video_id FROM historias WHERE es_publicidad = 0 ORDER BY video_id')]
+        finally:
+            conn.close()
+
+    def iter_video(self, video_id: str):
+        return self._query(' AND h.video_id = ?', ' ORDER BY h.timestamp_inicio', (video_id,))
+
+    def iter_ordered(self):
+        # Mismo orden que export_order: NULL va último en DESC
+        return self._query(order=' ORDER BY h.wtf_score DESC, h.video_id, h.timestamp_inicio')
+
+
+# --------------------------------------------------------------------------
+# Salidas
+# --------------------------------------------------------------------------
+
+class _BrotliWriter(io.RawIOBase):
+    """Archivo binario que comprime con brotli a medida que se escribe"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.raw.write(self.compressor.process(bytes(data)))
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.raw.write(self.compressor.finish())
+            self.raw.close()
+        super().close()
+
+
+def _open_text(raw, compression: str | None):
+    """Envuelve el archivo temporal según la compresión"""
+    if compression == 'gz':
+        binary = gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=GZIP_LEVEL, mtime=0)
+    elif compression == 'br':
+        if brotli is None:
+            raise RuntimeError("El formato .br necesita el paquete brotli (pip install brotli)")
+        binary = _BrotliWriter(raw)
+    else:
+        binary = raw
+    return io.TextIOWrapper(binary, encoding='utf-8', newline='\n')
+
+
+def _write_atomic(path: Path, text: str):
+    """Escribe un archivo chico de una vez (temporal + rename)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, path)
+
+
+class _AtomicFile:
+    """
+    Archivo de salida: temporal en el mismo directorio + rename al cerrar.
+    Lleva un hash del contenido (sin la fecha de generación) para no
+    reemplazar el archivo si no cambió.
+    """
+
+    def __init__(self, path: Path, compression: str = None):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, self.tmp = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+        self.raw = os.fdopen(fd, 'wb')
+        self.out = _open_text(self.raw, compression)
+        self.hash = hashlib.sha256()
+
+    def write(self, text: str, hashed: bool = True):
+        self.out.write(text)
+        if hashed:
+            self.hash.update(text.encode('utf-8'))
+
+    def commit(self, previous_hash: str = None) -> bool:
+        """Cierra y publica el archivo; False si el contenido era el mismo"""
+        self.out.close()
+        if not self.raw.closed:
+            self.raw.close()
+        if previous_hash == self.hash.hexdigest() and self.path.exists():
+            os.remove(self.tmp)
+            return False
+        os.chmod(self.tmp, 0o644)
+        os.replace(self.tmp, self.path)
+        return True
+
+    def abort(self):
+        try:
+            self.out.close()
+        except Exception:
+            pass
+        if os.path.exists(self.tmp):
+            os.remove(self.tmp)
+
+
+class StreamSink:
+    """Salida de un solo archivo (json o ndjson, opcionalmente comprimido)"""
+
+    def __init__(self, path: Path, fmt: str):
+        self.path = path
+        self.fmt = fmt
+        self.is_json = fmt.split('.')[0] == 'json'
+        self.compression = fmt.split('.')[1] if '.' in fmt else None
+        self.file = None
+        self.count = 0
+
+    def open(self, header: dict):
+        self.file = _AtomicFile(self.path, self.compression)
+        self.count = 0
+        if self.is_json:
+            self.file.write(json.dumps(header, ensure_ascii=False)[:-1] + ', "historias": [', hashed=False)
+
+    def write(self, line: str):
+        if self.is_json:
+            self.file.write(('\n' if self.count == 0 else ',\n') + line)
+        else:
+            self.file.write(line + '\n')
+        self.count += 1
+
+    def close(self, facets: dict, previous_hash: str = None) -> bool:
+        if self.is_json:
+            self.file.write(f'\n], "total": {self.count}, '
+                            f'"facetas": {json.dumps(facets, ensure_ascii=False)}}}\n')
+        return self.file.commit(previous_hash)
+
+    def abort(self):
+        if self.file is not None:
+            self.file.abort()
+
+
+class ShardedSink:
+    """
+    Un JSON por video (<dir>/<video_id>.json) más <dir>/indice.json con el
+    total, el hash y la huella de cada fragmento. Un video cuya huella no
+    cambió no se vuelve a leer ni a escribir.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        try:
+            with open(directory / SHARD_INDEX_NAME, 'r', encoding='utf-8') as f:
+                self.index = json.load(f).get('fragmentos', {})
+        except FileNotFoundError:
+            self.index = {}
+
+    def up_to_date(self, video_id: str, fingerprint: str | None) -> bool:
+        entry = self.index.get(video_id)
+        return (fingerprint is not None and entry is not None
+                and entry.get('huella') == fingerprint
+                and (self.directory / entry['archivo']).exists())
+
+    def write_video(self, video_id: str, historias: list, fingerprint: str | None) -> bool:
+        """Escribe el fragmento de un video; False si quedó igual"""
+        name = f"{video_id}.json"
+        previous = self.index.get(video_id, {})
+        target = _AtomicFile(self.directory / name)
+        try:
+            target.write(json.dumps({'video_id': video_id, 'historias': historias}, ensure_ascii=False))
+            changed = target.commit(previous.get('sha256'))
+        except BaseException:
+            target.abort()
+            raise
+        self.index[video_id] = {
+            'archivo': name,
+            'total': len(historias),
+            'sha256': target.hash.hexdigest(),
+            'huella': fingerprint,
+        }
+        return changed
+
+    def close(self, video_ids: set):
+        for video_id in set(self.index) - video_ids:
+            entry = self.index.pop(video_id)
+            (self.directory / entry['archivo']).unlink(missing_ok=True)
+        _write_atomic(self.directory / SHARD_INDEX_NAME, json.dumps({
+            'generated_at': datetime.now().isoformat(),
+            'total': sum(e['total'] for e in self.index.values()),
+            'fragmentos': self.index,
+        }, ensure_ascii=False, indent=1))
+
+
+class DeltaSink:
+    """
+    Versionado del export para clientes que ya tienen una copia:
+    versiones/manifest.json con la versión actual y la lista de parches, y
+    versiones/delta-<v>.json con lo que cambió desde la versión anterior.
+
+    Para comparar sólo se guarda un hash por historia (versiones/estado.json);
+    en memoria quedan únicamente las historias que cambiaron.
+    """
+
+    def __init__(self, directory: Path, base_name: str):
+        self.directory = directory
+        self.base_name = base_name
+        try:
+            with open(directory / DELTA_STATE_NAME, 'r', encoding='utf-8') as f:
+                self.previous = json.load(f)
+        except FileNotFoundError:
+            self.previous = {}
+        try:
+            with open(directory / 'manifest.json', 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            self.manifest = {'version': 0, 'parches': []}
+        self.hashes = {}
+        self.added = []
+        self.changed = []
+
+    def write(self, line: str, historia: dict):
+        key = str(historia['id'])
+        digest = hashlib.sha1(line.encode('utf-8')).hexdigest()[:16]
+        self.hashes[key] = digest
+        previous = self.previous.get(key)
+        if previous is None:
+            self.added.append(historia)
+        elif previous != digest:
+            self.changed.append(historia)
+
+    def close(self, total: int) -> bool:
+        """Publica una versión nueva si algo cambió; False si no hubo cambios"""
+        removed = sorted(int(k) for k in set(self.previous) - set(self.hashes))
+        first_run = self.manifest['version'] == 0
+        if not (self.added or self.changed or removed or first_run):
+            return False
+
+        version = self.manifest['version'] + 1
+        generated_at = datetime.now().isoformat()
+        patches = self.manifest['parches']
+        if not first_run:
+            name = f"delta-{version:06d}.json"
+            _write_atomic(self.directory / name, json.dumps({
+                'version': version,
+                'desde': version - 1,
+                'agregadas': self.added,
+                'modificadas': self.changed,
+                'eliminadas': removed,
+            }, ensure_ascii=False))
+            patches.append({
+                'version': version,
+                'archivo': name,
+                'agregadas': len(self.added),
+                'modificadas': len(self.changed),
+                'eliminadas': len(removed),
+                'generated_at': generated_at,
+            })
+        for old in patches[:-MAX_PATCHES]:
+            (self.directory / old['archivo']).unlink(missing_ok=True)
+        del patches[:-MAX_PATCHES]
+
+        _write_atomic(self.directory / DELTA_STATE_NAME, json.dumps(self.hashes, separators=(',', ':')))
+        # El manifest va último: recién ahí los clientes ven la versión nueva
+        _write_atomic(self.directory / 'manifest.json', json.dumps({
+            'version': version,
+            'generated_at': generated_at,
+            'completo': f"../{self.base_name}",
+            'total': total,
+            'parches': patches,
+        }, ensure_ascii=False, indent=1))
+        return True
+
+
+def output_paths(output_path: str, formats: tuple) -> dict:
+    """Archivo de cada formato: web/data/historias.json -> historias.ndjson.gz, historias/, versiones/, ..."""
+    base = Path(output_path)
+    stem = base.name.split('.')[0]
+    names = {'fragmentos': stem, 'delta': DELTA_DIR_NAME}
+    return {fmt: base.with_name(names.get(fmt, f'{stem}.{fmt}')) for fmt in formats}
+
+
+# --------------------------------------------------------------------------
+# Motor
+# --------------------------------------------------------------------------
+
+class ExportEngine:
+    """
+    Exporta una fuente a todos los formatos pedidos, con ids estables.
+    `duplicates` (opcional) colapsa las historias repetidas entre episodios.
+    """
+
+    def __init__(self, source: Source, ids_path: str = IDS_PATH, duplicates: dict = None):
+        self.source = source
+        self.ids = IdRegistry(ids_path)
+        self.duplicates = duplicates
+
+    def export(self, output_path: str, formats: tuple = ('json',)) -> dict:
+        """
+        Returns:
+            {'total', 'totales': {formato: historias}, 'escritos': [archivos
+            reemplazados], 'sin_cambios': [...]}
+
+            Los fragmentos por video no colapsan duplicados, así que su total
+            puede diferir del de los archivos únicos; `total` es el de los
+            archivos únicos si se pidió alguno, si no el de los fragmentos.
+        """
+        unknown = set(formats) - set(FORMATS)
+        if unknown:
+            raise ValueError(f"Formatos desconocidos: {', '.join(sorted(unknown))}")
+
+        paths = output_paths(output_path, formats)
+        manifest_path = Path(output_path).parent / MANIFEST_NAME
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = {}
+
+        summary = {'total': 0, 'totales': {}, 'escritos': [], 'sin_cambios': []}
+        if 'fragmentos' in paths:
+            summary['total'] = summary['totales']['fragmentos'] = self._export_shards(
+                ShardedSink(paths.pop('fragmentos')), summary)
+
+        delta = None
+        if 'delta' in paths:
+            # Los parches se aplican sobre el export completo de la misma versión
+            delta = DeltaSink(paths.pop('delta'), Path(output_path).name)
+            paths.setdefault('json', output_paths(output_path, ('json',))['json'])
+
+        sinks = [StreamSink(path, fmt) for fmt, path in paths.items()]
+        if sinks:
+            summary['total'] = self._export_stream(sinks, manifest, summary, delta)
+            summary['totales'].update((sink.fmt, summary['total']) for sink in sinks)
+            if delta is not None:
+                summary['totales']['delta'] = summary['total']
+            _write_atomic(manifest_path, json.dumps(manifest, ensure_ascii=False, indent=1))
+
+        self.ids.save()
+        return summary
+
+    def _export_stream(self, sinks: list, manifest: dict, summary: dict,
+                       delta: DeltaSink = None) -> int:
+        """Una pasada por las historias ordenadas hacia los archivos únicos"""
+        header = {'generated_at': datetime.now().isoformat()}
+        counts = {}
+        places, callers = Counter(), Counter()
+        total = 0
+        historias = self.source.iter_ordered()
+        if self.duplicates:
+            historias = collapse_duplicates(historias, self.duplicates)
+        try:
+            for sink in sinks:
+                sink.open(header)
+            for historia in historias:
+                line = json.dumps(self.ids.assign(historia), ensure_ascii=False)
+                for sink in sinks:
+                    sink.write(line)
+                if delta is not None:
+                    delta.write(line, historia)
+                add_web_facet(counts, historia)
+                if historia['lugar']:
+                    places[historia['lugar']] += 1
+                if historia['oyente']:
+                    callers[historia['oyente']] += 1
+                total += 1
+        except BaseException:
+            for sink in sinks:
+                sink.abort()
+            raise
+
+        facets = {'tramos_wtf': WTF_BUCKETS, 'categoria_wtf': counts, **entity_facets(places, callers)}
+        for sink in sinks:
+            name = sink.path.name
+            previous = manifest.get(name, {}).get('sha256')
+            changed = sink.close(facets, previous)
+            summary['escritos' if changed else 'sin_cambios'].append(str(sink.path))
+            if changed:
+                manifest[name] = {'sha256': sink.file.hash.hexdigest(), 'total': total,
+                                  'generated_at': header['generated_at']}
+        if delta is not None:
+            published = delta.close(total)
+            summary['escritos' if published else 'sin_cambios'].append(str(delta.directory / 'manifest.json'))
+        return total
+
+    def _export_shards(self, sink: ShardedSink, summary: dict) -> int:
+        """Un fragmento por video; sólo se leen los videos que cambiaron"""
+        video_ids = set()
+        total = 0
+        for video_id, fingerprint in self.source.videos():
+            video_ids.add(video_id)
+            if sink.up_to_date(video_id, fingerprint):
+                summary['sin_cambios'].append(f"{sink.directory}/{video_id}.json")
+                total += sink.index[video_id]['total']
+                continue
+            historias = sorted(self.source.iter_video(video_id), key=export_order)
+            for historia in historias:
+                self.ids.assign(historia)
+            changed = sink.write_video(video_id, historias, fingerprint)
+            summary['escritos' if changed else 'sin_cambios'].append(f"{sink.directory}/{video_id}.json")
+            total += len(historias)
+        sink.close(video_ids)
+        return total
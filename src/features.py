@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Features de subtítulos - Convierte los segmentos de un video en arrays NumPy
+(pausas, solapamiento, ritmo de habla, densidad de preguntas) en una sola
+pasada vectorizada, para puntuar límites de historias sin loops en Python.
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.models import SegmentArray
+
+RATE_WINDOW_SECONDS = 30.0      # Ventana para ritmo de habla
+QUESTION_WINDOW_SECONDS = 30.0  # Ventana para densidad de preguntas
+
+FEATURE_NAMES = [
+    'start', 'end', 'pausa', 'solapamiento', 'palabras',
+    'ritmo_habla', 'densidad_preguntas'
+]
+
+
+def _window_sum(starts: np.ndarray, values: np.ndarray, seconds: float) -> np.ndarray:
+    """Suma de `values` en la ventana [start, start + seconds) de cada segmento"""
+    csum = np.concatenate(([0], np.cumsum(values)))
+    hi = np.searchsorted(starts, starts + seconds, side='left')
+    return csum[hi] - csum[np.arange(len(starts))]
+
+
+def compute_features(segments) -> dict:
+    """
+    Calcula las features por segmento de subtítulos (SegmentArray o lista de
+    dicts del JSON).
+
+    Returns:
+        Dict nombre -> array de largo len(segments):
+            start, end: tiempos del segmento
+            pausa: segundos sin subtítulo antes del segmento (0 si se pisan)
+            solapamiento: segundos que el segmento anterior pisa a éste
+            palabras: cantidad de palabras
+            ritmo_habla: palabras por segundo en la ventana siguiente
+            densidad_preguntas: preguntas en la ventana siguiente
+    """
+    segments = SegmentArray.coerce(segments)
+    if len(segments) == 0:
+        return {name: np.empty(0, dtype=np.float32) for name in FEATURE_NAMES}
+
+    starts = segments.numpy('start')
+    durations = segments.numpy('duration')
+    texts = np.array(segments.text, dtype=np.str_)
+
+    ends = starts + durations
+    prev_ends = np.concatenate(([0.0], ends[:-1]))
+    gap = starts - prev_ends
+
+    words = np.char.count(np.char.strip(texts), ' ') + (np.char.str_len(texts) > 0)
+    questions = np.char.count(texts, '?')
+
+    return {
+        'start': starts.astype(np.float32),
+        'end': ends.astype(np.float32),
+        'pausa': np.maximum(gap, 0).astype(np.float32),
+        'solapamiento': np.maximum(-gap, 0).astype(np.float32),
+        'palabras': words.astype(np.float32),
+        'ritmo_habla': (_window_sum(starts, words, RATE_WINDOW_SECONDS) / RATE_WINDOW_SECONDS).astype(np.float32),
+        'densidad_preguntas': _window_sum(starts, questions, QUESTION_WINDOW_SECONDS).astype(np.float32),
+    }
+
+
+def save_features(video_id: str, features: dict) -> str:
+    """Guarda las features junto a la segmentación del video"""
+    output_path = f"data/segmentacion/{video_id}_features.npz"
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(output_path, **features)
+    return output_path
+
+
+def load_features(video_id: str) -> dict | None:
+    """Carga las features guardadas de un video (None si no existen)"""
+    path = f"data/segmentacion/{video_id}_features.npz"
+    if not Path(path).exists():
+        return None
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+if __name__ == "__main__":
+    import json
+
+    video_id = sys.argv[1] if len(sys.argv) > 1 else "n2BkstRXbV0"
+    with open(f"data/subtitulos/{video_id}.json", 'r', encoding='utf-8') as f:
+        segments = json.load(f)['segments']
+
+    features = compute_features(segments)
+    path = save_features(video_id, features)
+    print(f"✅ Guardado: {path}")
+    for name in FEATURE_NAMES[2:]:
+        values = features[name]
+        print(f"   • {name:20s} media={values.mean():.2f} máx={values.max():.2f}")
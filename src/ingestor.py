@@ -2,11 +2,35 @@
 """
 Ingestor de subtítulos de YouTube
 Extrae subtítulos automáticos de videos de YouTube y los guarda localmente.
+
+Lo descargado queda en un caché en disco (data/cache/subtitulos) por video e
+idioma, con la fecha de descarga, un hash del contenido y el idioma que sirvió
+el proveedor. Una entrada más vieja que el TTL (subtitles.cache_ttl_dias) se
+revalida: se vuelve a pedir y, si el hash cambió (subtítulos corregidos), se
+reescribe el archivo en data/subtitulos. Con --refresh-older-than se elige la
+antigüedad a partir de la cual revalidar en esta corrida (0 = todo).
 """
+import hashlib
 import json
 import os
+import re
+import sys
+import time
+from datetime import datetime
 from pathlib import Path
-from youtube_transcript_api import YouTubeTranscriptApi
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.config import load_config
+from src.models import SegmentArray, json_default
+from src.normalizer import normalize_subtitles
+
+
+DEFAULT_LANGUAGES = ['es', 'es-419', 'es-ES']
+CACHE_DIR = "data/cache/subtitulos"
+DEFAULT_TTL_DAYS = 30
+CACHE_SAVE_EVERY = 50          # Entradas nuevas entre escrituras del índice
+AGE_RE = re.compile(r'^(\d+(?:\.\d+)?)\s*([smhd]?)$')
+AGE_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, '': 86400}
 
 
 def extract_video_id(url: str) -> str:
@@ -18,107 +42,350 @@ def extract_video_id(url: str) -> str:
     return url
 
 
-def fetch_subtitles(video_id: str, languages: list = None) -> dict | None:
+# ---------------------------------------------------------------------------
+# Proveedores
+# ---------------------------------------------------------------------------
+
+class TranscriptProvider:
+    """Origen de subtítulos: `fetch` devuelve (idioma servido, SegmentArray)"""
+
+    name = 'base'
+
+    def fetch(self, video_id: str, languages: list) -> tuple:
+        raise NotImplementedError
+
+
+class YouTubeProvider(TranscriptProvider):
+    """Subtítulos de YouTube vía youtube_transcript_api"""
+
+    name = 'youtube'
+
+    def fetch(self, video_id: str, languages: list) -> tuple:
+        # Import acá: bulk_import usa este módulo sin la API de YouTube
+        from youtube_transcript_api import YouTubeTranscriptApi
+        data = YouTubeTranscriptApi().fetch(video_id, languages=languages)
+        segments = SegmentArray()
+        for item in data:
+            segments.append(round(item.start, 2), round(item.duration, 2), item.text)
+        return getattr(data, 'language_code', None) or languages[0], segments
+
+
+class LocalProvider(TranscriptProvider):
     """
-    Obtiene subtítulos de un video de YouTube.
-    
-    Args:
-        video_id: ID del video de YouTube
-        languages: Lista de códigos de idioma a intentar (default: español)
-    
+    Proveedor de prueba / offline: lee <directorio>/<video_id>.json con
+    {"language": ..., "segments": [...]}. Cuenta los pedidos en `fetch_count`.
+    """
+
+    name = 'local'
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.fetch_count = 0
+
+    def fetch(self, video_id: str, languages: list) -> tuple:
+        self.fetch_count += 1
+        with open(os.path.join(self.directory, f"{video_id}.json"), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data.get('language') or languages[0], SegmentArray.from_dicts(data['segments'])
+
+
+def get_provider(spec: str | None) -> TranscriptProvider:
+    """'youtube' (default) o 'local:<directorio>'"""
+    if not spec or spec == 'youtube':
+        return YouTubeProvider()
+    if spec.startswith('local:'):
+        return LocalProvider(spec[len('local:'):])
+    raise ValueError(f"Proveedor desconocido: {spec}")
+
+
+# ---------------------------------------------------------------------------
+# Caché
+# ---------------------------------------------------------------------------
+
+def content_hash(segments) -> str:
+    """sha256 de los segmentos tal como los sirvió el proveedor"""
+    payload = json.dumps(segments, ensure_ascii=False, sort_keys=True,
+                         default=json_default).encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()
+
+
+def parse_age(value: str) -> float:
+    """'7d', '12h', '30m', '90s' o un número de días -> segundos"""
+    match = AGE_RE.match(value.strip().lower())
+    if not match:
+        raise ValueError(f"Antigüedad inválida: {value} (ej: 7d, 12h, 0)")
+    return float(match.group(1)) * AGE_UNITS[match.group(2)]
+
+
+def default_max_age() -> float:
+    """TTL del caché en segundos (subtitles.cache_ttl_dias en config.yaml)"""
+    days = load_config().get('subtitles', {}).get('cache_ttl_dias', DEFAULT_TTL_DAYS)
+    return float(days) * 86400
+
+
+class FetchCache:
+    """
+    Caché de descargas: un JSON con los segmentos crudos por video e idioma
+    pedido y un índice (indice.json) con los metadatos de todas las entradas:
+    obtenido, revalidado, hash, idioma_servido y proveedor.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "indice.json")
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+        except FileNotFoundError:
+            self.index = {}
+        self._pending = 0
+
+    @staticmethod
+    def key(video_id: str, language: str) -> str:
+        return f"{video_id}.{language}"
+
+    def get(self, video_id: str, language: str) -> dict | None:
+        return self.index.get(self.key(video_id, language))
+
+    def age(self, meta: dict) -> float:
+        """Segundos desde la última vez que el proveedor confirmó la entrada"""
+        return time.time() - datetime.fromisoformat(meta['revalidado']).timestamp()
+
+    def load_segments(self, video_id: str, language: str) -> SegmentArray:
+        with open(os.path.join(self.directory, f"{self.key(video_id, language)}.json"),
+                  'r', encoding='utf-8') as f:
+            return SegmentArray.from_dicts(json.load(f))
+
+    def store(self, video_id: str, language: str, served: str, segments: SegmentArray,
+              provider: str) -> dict:
+        """Guarda una descarga nueva (o corregida) y devuelve sus metadatos"""
+        Path(self.directory).mkdir(parents=True, exist_ok=True)
+        with open(os.path.join(self.directory, f"{self.key(video_id, language)}.json"),
+                  'w', encoding='utf-8') as f:
+            json.dump(segments, f, ensure_ascii=False, default=json_default)
+        now = datetime.now().isoformat()
+        meta = {
+            "obtenido": now,
+            "revalidado": now,
+            "hash": content_hash(segments),
+            "idioma_servido": served,
+            "proveedor": provider,
+        }
+        self.index[self.key(video_id, language)] = meta
+        self._mark()
+        return meta
+
+    def touch(self, meta: dict):
+        """El proveedor devolvió lo mismo: sólo se renueva la entrada"""
+        meta['revalidado'] = datetime.now().isoformat()
+        self._mark()
+
+    def _mark(self):
+        self._pending += 1
+        if self._pending >= CACHE_SAVE_EVERY:
+            self.save()
+
+    def save(self):
+        """Escribe el índice (atómico) si hubo cambios"""
+        if not self._pending:
+            return
+        Path(self.directory).mkdir(parents=True, exist_ok=True)
+        tmp = f"{self.index_path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.index_path)
+        self._pending = 0
+
+
+def fetch_cached(video_id: str, languages: list = None, provider: TranscriptProvider = None,
+                 cache: FetchCache = None, max_age: float = None) -> tuple:
+    """
+    Subtítulos crudos pasando por el caché.
+
     Returns:
-        Dict con video_id, language y segments, o None si falla
+        (dict con video_id, language, total_segments y segments, o None;
+         estado: 'cache' | 'nuevo' | 'actualizado' | 'sin_cambios' | 'vencido' | 'error')
+        'vencido' es una entrada vieja servida porque falló la revalidación.
+        Sin `cache` usa uno propio y guarda su índice antes de volver.
     """
-    if languages is None:
-        languages = ['es', 'es-419', 'es-ES']
-    
-    try:
-        ytt_api = YouTubeTranscriptApi()
-        data = ytt_api.fetch(video_id, languages=languages)
-        
-        # Convertir a lista de dicts serializables
-        segments = []
-        for item in data:
-            segments.append({
-                "start": round(item.start, 2),
-                "duration": round(item.duration, 2),
-                "text": item.text
-            })
-        
+    if cache is None:
+        cache = FetchCache()
+        try:
+            return fetch_cached(video_id, languages, provider, cache, max_age)
+        finally:
+            cache.save()  # Con un solo video no se llega a CACHE_SAVE_EVERY
+
+    languages = languages or DEFAULT_LANGUAGES
+    provider = provider or YouTubeProvider()
+    max_age = default_max_age() if max_age is None else max_age
+    language = languages[0]
+
+    def result(meta):
+        segments = cache.load_segments(video_id, language)
         return {
             "video_id": video_id,
-            "language": "es",
+            "language": meta['idioma_servido'],
             "total_segments": len(segments),
             "segments": segments
         }
+
+    meta = cache.get(video_id, language)
+    if meta is not None and cache.age(meta) <= max_age:
+        return result(meta), 'cache'
+
+    try:
+        served, segments = provider.fetch(video_id, languages)
+    except Exception as e:
+        print(f"❌ Error extrayendo subtítulos de {video_id}: {e}")
+        return (result(meta), 'vencido') if meta is not None else (None, 'error')
+
+    if meta is not None and meta['hash'] == content_hash(segments):
+        cache.touch(meta)
+        return result(meta), 'sin_cambios'
+
+    state = 'nuevo' if meta is None else 'actualizado'
+    meta = cache.store(video_id, language, served, segments, provider.name)
+    return result(meta), state
+
+
+def fetch_subtitles(video_id: str, languages: list = None,
+                    normalize: bool = True, provider: TranscriptProvider = None) -> dict | None:
+    """
+    Obtiene subtítulos de un video de YouTube (sin caché).
+
+    Args:
+        video_id: ID del video de YouTube
+        languages: Lista de códigos de idioma a intentar (default: español)
+        normalize: Quitar repeticiones y unir en oraciones (ver normalizer)
+        provider: Origen de los subtítulos (default: YouTube)
+
+    Returns:
+        Dict con video_id, language y segments, o None si falla
+    """
+    languages = languages or DEFAULT_LANGUAGES
+    provider = provider or YouTubeProvider()
+
+    try:
+        served, segments = provider.fetch(video_id, languages)
     except Exception as e:
         print(f"❌ Error extrayendo subtítulos de {video_id}: {e}")
         return None
 
+    result = {
+        "video_id": video_id,
+        "language": served,
+        "total_segments": len(segments),
+        "segments": segments
+    }
+    return normalize_subtitles(result) if normalize else result
+
 
 def save_subtitles(data: dict, output_dir: str = "data/subtitulos") -> str:
     """Guarda los subtítulos en un archivo JSON"""
     Path(output_dir).mkdir(parents=True, exist_ok=True)
     output_path = os.path.join(output_dir, f"{data['video_id']}.json")
-    
+
     with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    
+        json.dump(data, f, ensure_ascii=False, indent=2, default=json_default)
+
     return output_path
 
 
-def process_videos_input(input_file: str = "data/videos_input.json") -> list:
+STATE_MESSAGES = {
+    'cache': "⏭️ En caché",
+    'nuevo': "✅ Descargado",
+    'actualizado': "🔄 Subtítulos corregidos",
+    'sin_cambios': "✔️ Revalidado sin cambios",
+    'vencido': "⚠️ Sin conexión, se usa el caché vencido",
+}
+
+
+def ingest_video(video_id: str, provider: TranscriptProvider = None, cache: FetchCache = None,
+                 max_age: float = None, output_dir: str = "data/subtitulos") -> bool:
+    """
+    Trae (o revalida) un video y reescribe su archivo de subtítulos si cambió.
+
+    Returns:
+        True si el video tiene subtítulos
+    """
+    output_path = os.path.join(output_dir, f"{video_id}.json")
+    data, state = fetch_cached(video_id, provider=provider, cache=cache, max_age=max_age)
+    if data is None:
+        print(f"❌ Falló: {video_id}")
+        return False
+
+    if state in ('nuevo', 'actualizado') or not os.path.exists(output_path):
+        data = normalize_subtitles(data)
+        save_subtitles(data, output_dir)
+        print(f"{STATE_MESSAGES[state]}: {output_path} ({data['total_segments']} segmentos)")
+    else:
+        print(f"{STATE_MESSAGES[state]}: {video_id}")
+    return True
+
+
+def process_videos_input(input_file: str = "data/videos_input.json",
+                         provider: TranscriptProvider = None, cache: FetchCache = None,
+                         max_age: float = None) -> list:
     """
-    Procesa todos los videos del archivo de entrada.
-    
+    Procesa todos los videos del archivo de entrada. Sólo se consulta al
+    proveedor por los videos sin caché o con caché más viejo que `max_age`.
+
     Returns:
         Lista de video_ids procesados exitosamente
     """
     with open(input_file, 'r', encoding='utf-8') as f:
         data = json.load(f)
-    
+
+    cache = cache or FetchCache()
+    max_age = default_max_age() if max_age is None else max_age
     processed = []
-    
-    for video in data.get("videos", []):
-        video_id = video.get("video_id") or extract_video_id(video.get("url", ""))
-        
-        if not video_id:
-            print(f"⚠️ No se pudo obtener video_id para: {video}")
-            continue
-        
-        # Verificar si ya está descargado
-        output_path = f"data/subtitulos/{video_id}.json"
-        if os.path.exists(output_path):
-            print(f"⏭️ Ya existe: {video_id}")
-            processed.append(video_id)
-            continue
-        
-        print(f"📥 Descargando subtítulos: {video_id}")
-        result = fetch_subtitles(video_id)
-        
-        if result:
-            save_subtitles(result)
-            print(f"✅ Guardado: {output_path} ({result['total_segments']} segmentos)")
-            processed.append(video_id)
-        else:
-            print(f"❌ Falló: {video_id}")
-    
+
+    try:
+        for video in data.get("videos", []):
+            video_id = video.get("video_id") or extract_video_id(video.get("url", ""))
+
+            if not video_id:
+                print(f"⚠️ No se pudo obtener video_id para: {video}")
+                continue
+
+            # Descargado antes de que existiera el caché: cuenta la fecha del archivo
+            output_path = f"data/subtitulos/{video_id}.json"
+            if (cache.get(video_id, DEFAULT_LANGUAGES[0]) is None and os.path.exists(output_path)
+                    and time.time() - os.path.getmtime(output_path) <= max_age):
+                print(f"⏭️ Ya existe: {video_id}")
+                processed.append(video_id)
+                continue
+
+            if ingest_video(video_id, provider, cache, max_age):
+                processed.append(video_id)
+    finally:
+        cache.save()
+
     return processed
 
 
 if __name__ == "__main__":
-    import sys
-    
-    if len(sys.argv) > 1:
+    args = sys.argv[1:]
+    options = {}
+    for flag in ('--refresh-older-than', '--proveedor'):
+        if flag in args:
+            i = args.index(flag)
+            options[flag] = args[i + 1]
+            del args[i:i + 2]
+
+    max_age = parse_age(options['--refresh-older-than']) if '--refresh-older-than' in options else None
+    provider = get_provider(options.get('--proveedor'))
+
+    if args:
         # Procesar URL o video_id específico
-        video_id = extract_video_id(sys.argv[1])
-        print(f"📥 Descargando subtítulos: {video_id}")
-        result = fetch_subtitles(video_id)
-        if result:
-            path = save_subtitles(result)
-            print(f"✅ Guardado: {path}")
-            print(f"📊 Total segmentos: {result['total_segments']}")
+        video_id = extract_video_id(args[0])
+        print(f"📥 Subtítulos: {video_id}")
+        cache = FetchCache()
+        try:
+            ingest_video(video_id, provider, cache, max_age)
+        finally:
+            cache.save()
     else:
         # Procesar todos los videos del archivo de entrada
-        processed = process_videos_input()
+        processed = process_videos_input(provider=provider, max_age=max_age)
         print(f"\n📊 Procesados: {len(processed)} videos")
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Modelos en memoria del pipeline: segmentos de subtítulos, historias y su
+clasificación.
+
+Los archivos JSON siguen igual (`to_dict` / `from_dict` leen y escriben el
+mismo formato de siempre); lo que cambia es cómo se guardan mientras se
+procesan. Un episodio tiene más de 3.000 subtítulos, y como dicts cada uno
+carga su propia tabla hash con las tres claves. `SegmentArray` los guarda
+por columnas (dos `array('d')` para los tiempos y una lista de textos) y
+`Story` / `Classification` son dataclasses con `__slots__`.
+
+Las columnas de tiempo son de doble precisión para que un archivo leído y
+vuelto a escribir quede idéntico (con float32 un 1234.56 vuelve como
+1234.5600585...).
+"""
+from array import array
+from dataclasses import dataclass, fields
+
+import numpy as np
+
+
+@dataclass(slots=True)
+class Segment:
+    """Un subtítulo: {"start", "duration", "text"}"""
+    start: float
+    duration: float
+    text: str
+
+    @property
+    def end(self) -> float:
+        return self.start + self.duration
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Segment':
+        return cls(data['start'], data.get('duration', 0), data['text'])
+
+    def to_dict(self) -> dict:
+        return {'start': self.start, 'duration': self.duration, 'text': self.text}
+
+
+class SegmentArray:
+    """
+    Lista de segmentos guardada por columnas: `start` y `duration` son
+    `array('d')` y `text` una lista de str. Indexar devuelve un `Segment`
+    (armado en el momento); para cálculos vectoriales `numpy('start')` da
+    una vista sin copia de la columna.
+
+    Mientras exista una vista de numpy la columna no puede crecer (`append`
+    levanta BufferError): las vistas son para usar y soltar.
+    """
+
+    __slots__ = ('start', 'duration', 'text')
+
+    def __init__(self, start=(), duration=(), text=()):
+        self.start = array('d', start)
+        self.duration = array('d', duration)
+        self.text = list(text)
+        if not len(self.start) == len(self.duration) == len(self.text):
+            raise ValueError("Las columnas de SegmentArray tienen largos distintos")
+
+    @classmethod
+    def from_dicts(cls, segments) -> 'SegmentArray':
+        """Desde la lista de dicts del JSON de subtítulos"""
+        result = cls()
+        for seg in segments:
+            result.append(seg['start'], seg.get('duration', 0), seg['text'])
+        return result
+
+    @classmethod
+    def coerce(cls, segments) -> 'SegmentArray':
+        """El mismo objeto si ya es un SegmentArray; si no, lo convierte"""
+        if isinstance(segments, cls):
+            return segments
+        return cls.from_dicts(segments)
+
+    def append(self, start: float, duration: float, text: str):
+        self.start.append(start)
+        self.duration.append(duration)
+        self.text.append(text)
+
+    def numpy(self, column: str) -> np.ndarray:
+        """Vista float64 (sin copia) de la columna 'start' o 'duration'"""
+        return np.frombuffer(getattr(self, column), dtype=np.float64)
+
+    def ends(self) -> np.ndarray:
+        return self.numpy('start') + self.numpy('duration')
+
+    def to_dicts(self) -> list:
+        """Lista de dicts con el formato del JSON de subtítulos"""
+        return [{'start': s, 'duration': d, 'text': t}
+                for s, d, t in zip(self.start, self.duration, self.text)]
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return SegmentArray(self.start[index], self.duration[index], self.text[index])
+        return Segment(self.start[index], self.duration[index], self.text[index])
+
+    def __iter__(self):
+        return map(Segment, self.start, self.duration, self.text)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, SegmentArray):
+            return NotImplemented
+        return (self.start == other.start and self.duration == other.duration
+                and self.text == other.text)
+
+    def __repr__(self) -> str:
+        return f"SegmentArray({len(self)} segmentos)"
+
+    def __getstate__(self):
+        return self.start, self.duration, self.text
+
+    def __setstate__(self, state):
+        self.start, self.duration, self.text = state
+
+
+# Claves que se escriben aunque valgan None (el segmentador siempre las pone)
+_STORY_ALWAYS = frozenset(('id', 'timestamp_inicio', 'timestamp_fin', 'timestamp_fmt',
+                           'duracion_segundos', 'patron_detectado', 'texto_completo',
+                           'clasificacion'))
+
+
+def _known_fields(cls) -> tuple:
+    return tuple(f.name for f in fields(cls) if f.name != 'extra')
+
+
+def _extra(data: dict, names: tuple) -> dict | None:
+    """Claves del JSON que no son campos (None si no hay: un dict vacío por historia pesa)"""
+    extra = {k: v for k, v in data.items() if k not in names}
+    return extra or None
+
+
+@dataclass(slots=True)
+class Classification:
+    """
+    Clasificación de una historia (la `clasificacion` del JSON). Es dispersa:
+    una historia descartada sólo tiene es_historia, verificado_humano y
+    fecha_supervision, así que `to_dict` omite los campos en None. Las
+    claves que no son campos se conservan en `extra`.
+    """
+    categoria: str | None = None
+    subcategoria: str | None = None
+    tipo_narrador: str | None = None
+    wtf_score: float | None = None
+    titulo: str | None = None
+    resumen: str | None = None
+    verificado_humano: bool | None = None
+    fecha_supervision: str | None = None
+    es_historia: bool | None = None
+    extra: dict | None = None
+
+    @classmethod
+    def from_dict(cls, data: dict | None) -> 'Classification | None':
+        if data is None:
+            return None
+        names = _known_fields(cls)
+        return cls(**{k: v for k, v in data.items() if k in names}, extra=_extra(data, names))
+
+    def to_dict(self) -> dict:
+        result = {name: getattr(self, name) for name in _known_fields(Classification)
+                  if getattr(self, name) is not None}
+        if self.extra:
+            result.update(self.extra)
+        return result
+
+
+@dataclass(slots=True)
+class Story:
+    """
+    Historia detectada en un episodio (un elemento de `historias` en
+    data/segmentacion/<video_id>.json). Los campos opcionales que faltan en
+    archivos viejos quedan en None y no se escriben; las claves desconocidas
+    van a `extra` y se escriben tal cual.
+    """
+    id: int
+    timestamp_inicio: float
+    timestamp_fin: float | None = None
+    timestamp_fmt: str | None = None
+    duracion_segundos: float | None = None
+    patron_detectado: str | None = None
+    score_limite: float | None = None
+    es_publicidad: bool | None = None
+    segundos_publicidad: float | None = None
+    texto_completo: str = ''
+    mapa_tiempos: str | None = None
+    entidades: dict | None = None
+    clasificacion: Classification | None = None
+    extra: dict | None = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Story':
+        names = _known_fields(cls)
+        values = {k: v for k, v in data.items() if k in names}
+        values['clasificacion'] = Classification.from_dict(data.get('clasificacion'))
+        return cls(**values, extra=_extra(data, names))
+
+    def to_dict(self) -> dict:
+        result = {}
+        for name in _known_fields(Story):
+            value = getattr(self, name)
+            if value is None and name not in _STORY_ALWAYS:
+                continue
+            result[name] = value.to_dict() if isinstance(value, Classification) else value
+        if self.extra:
+            result.update(self.extra)
+        return result
+
+
+def json_default(obj):
+    """`default` para json.dump: serializa los modelos con su formato JSON"""
+    if isinstance(obj, SegmentArray):
+        return obj.to_dicts()
+    if isinstance(obj, (Segment, Story, Classification)):
+        return obj.to_dict()
+    raise TypeError(f"{type(obj).__name__} no es serializable a JSON")
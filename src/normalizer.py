@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Normalizador de subtítulos - Limpia los subtítulos automáticos de YouTube
+antes de guardarlos: quita las palabras que se repiten entre subtítulos
+"rodantes", recorta los solapamientos de tiempo y une los fragmentos de una
+misma oración mientras no pasen MAX_SENTENCE_SECONDS: del grupo sólo queda
+el inicio del primero, así que el tope es la precisión que se pierde.
+
+Es lineal en la cantidad de subtítulos: sólo se compara el final del texto
+acumulado con el comienzo de cada subtítulo, hasta MAX_OVERLAP_WORDS palabras.
+"""
+import json
+import re
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.models import SegmentArray, json_default
+
+
+MAX_OVERLAP_WORDS = 12         # Repetición máxima entre subtítulos consecutivos
+MIN_OVERLAP_WORDS = 2          # Una sola palabra repetida suele ser habla real ("que que")
+MAX_SENTENCE_SECONDS = 4.0     # Tope de un grupo unido (su único timestamp es el del inicio)
+SENTENCE_END = re.compile(r'[.!?…]["»”)]*$')
+WORD_CLEAN = re.compile(r'[^\w]+')
+
+
+def _key(word: str) -> str:
+    """Forma comparable de una palabra (sin puntuación ni mayúsculas)"""
+    return WORD_CLEAN.sub('', word.lower())
+
+
+def _overlap(tail: list, head: list) -> int:
+    """Cantidad de palabras del comienzo de `head` que repiten el final de `tail`"""
+    for k in range(min(len(tail), len(head), MAX_OVERLAP_WORDS), MIN_OVERLAP_WORDS - 1, -1):
+        if tail[-k:] == head[:k]:
+            return k
+    return 0
+
+
+def normalize_segments(segments, merge_sentences: bool = True) -> SegmentArray:
+    """
+    Normaliza segmentos {start, duration, text} (SegmentArray o lista de dicts).
+
+    Returns:
+        SegmentArray nuevo: sin texto repetido, sin solapamiento de tiempos y
+        (si merge_sentences) agrupado en oraciones
+    """
+    segments = SegmentArray.coerce(segments)
+    starts = segments.start
+    result = []
+    tail_keys = []          # Últimas palabras emitidas, para detectar repetición
+    current = None          # Oración en construcción
+
+    for i, seg in enumerate(segments):
+        words = seg.text.split()
+        keys = [_key(w) for w in words]
+        skip = _overlap(tail_keys, keys)
+        words = words[skip:]
+        if not words:
+            continue
+        tail_keys = (tail_keys + keys[skip:])[-MAX_OVERLAP_WORDS:]
+
+        start = seg.start
+        end = seg.end
+        if i + 1 < len(starts):
+            end = min(end, starts[i + 1])
+        text = ' '.join(words)
+
+        if (current is not None and merge_sentences
+                and not SENTENCE_END.search(current['text'])
+                and end - current['start'] <= MAX_SENTENCE_SECONDS):
+            current['text'] += ' ' + text
+            current['end'] = end
+        else:
+            if current is not None:
+                result.append(current)
+            current = {'start': start, 'end': end, 'text': text}
+
+    if current is not None:
+        result.append(current)
+
+    normalized = SegmentArray()
+    for s in result:
+        normalized.append(round(s['start'], 2), round(max(s['end'] - s['start'], 0.0), 2), s['text'])
+    return normalized
+
+
+def normalization_stats(before: list, after: list) -> dict:
+    """
+    Compara antes/después: texto unido (lo que va a texto_completo, al FTS y
+    a los embeddings), palabras indexables y tamaño del JSON guardado.
+    """
+    def size(segments):
+        segments = SegmentArray.coerce(segments)
+        text = ' '.join(segments.text)
+        json_bytes = len(json.dumps(segments, ensure_ascii=False, indent=2,
+                                    default=json_default).encode('utf-8'))
+        return len(text), len(text.split()), json_bytes
+
+    chars_before, words_before, bytes_before = size(before)
+    chars_after, words_after, bytes_after = size(after)
+    return {
+        'segmentos_antes': len(before),
+        'segmentos_despues': len(after),
+        'caracteres_antes': chars_before,
+        'caracteres_despues': chars_after,
+        'palabras_antes': words_before,
+        'palabras_despues': words_after,
+        'bytes_json_antes': bytes_before,
+        'bytes_json_despues': bytes_after,
+        'reduccion_texto': round(1 - chars_after / chars_before, 4) if chars_before else 0.0,
+        'reduccion_json': round(1 - bytes_after / bytes_before, 4) if bytes_before else 0.0,
+    }
+
+
+def normalize_subtitles(data: dict) -> dict:
+    """Normaliza un dict de subtítulos (formato de `ingestor.fetch_subtitles`)"""
+    if data.get('normalizado'):
+        return data
+    segments = normalize_segments(data['segments'])
+    return {
+        **data,
+        'normalizado': True,
+        'total_segments': len(segments),
+        'segmentos_originales': len(data['segments']),
+        'segments': segments
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python3 src/normalizer.py <video_id> [--guardar]")
+        print("Ejemplo: python3 src/normalizer.py n2BkstRXbV0")
+        sys.exit(1)
+
+    video_id = sys.argv[1]
+    path = f"data/subtitulos/{video_id}.json"
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    if data.get('normalizado'):
+        print(f"⏭️ Ya normalizado: {path}")
+        sys.exit(0)
+
+    normalized = normalize_subtitles(data)
+    stats = normalization_stats(data['segments'], normalized['segments'])
+
+    print(f"📊 Normalización de {video_id}:")
+    print(f"   Segmentos:  {stats['segmentos_antes']} → {stats['segmentos_despues']}")
+    print(f"   Palabras:   {stats['palabras_antes']} → {stats['palabras_despues']}")
+    print(f"   Caracteres: {stats['caracteres_antes']} → {stats['caracteres_despues']}"
+          f" ({-stats['reduccion_texto']:+.1%})")
+    print(f"   JSON:       {stats['bytes_json_antes']} → {stats['bytes_json_despues']} bytes"
+          f" ({-stats['reduccion_json']:+.1%})")
+
+    if '--guardar' in sys.argv:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(normalized, f, ensure_ascii=False, indent=2, default=json_default)
+        print(f"✅ Guardado: {path}")
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Motor de reglas de segmentación - Carga los patrones de inicio, fin y
+publicidad desde config.yaml, los compila una sola vez (una regex por tipo)
+y los aplica sobre todo el episodio con una pasada por tipo.
+
+Las reglas pueden capturar datos con grupos con nombre, por ejemplo
+`me escribe (?P<nombre>\w+)`: `scan` devuelve lo capturado por segmento
+(ver `entities`). Como todas las reglas de un tipo van en la misma regex,
+los grupos se renombran por regla (`nombre` de la regla 7 pasa a ser
+`r7_nombre`) para que dos reglas puedan usar el mismo nombre.
+"""
+import re
+import sys
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.config import load_config
+from src.models import SegmentArray
+
+
+KINDS = ('inicio', 'fin', 'publicidad')
+
+CONFIG_KEYS = {
+    'inicio': 'patterns_inicio_historia',
+    'fin': 'patterns_fin_historia',
+    'publicidad': 'patterns_publicidad',
+}
+
+PATTERN_WINDOW_SECONDS = 30       # Los patrones no cruzan ventanas de 30 s
+DEFAULT_AD_MAX_SECONDS = 240
+
+NAMED_GROUP_RE = re.compile(r'\(\?P([<=])(\w+)')  # (?P<nombre>...) y (?P=nombre)
+
+
+def prefix_groups(pattern: str, rule: int) -> tuple:
+    """
+    Renombra los grupos con nombre de una regla para la regex combinada.
+
+    Returns:
+        (patrón, {nombre en la regex combinada: nombre en la regla})
+    """
+    names = {}
+
+    def rename(match):
+        prefixed = f'r{rule}_{match.group(2)}'
+        if match.group(1) == '<':
+            names[prefixed] = match.group(2)
+        return f'(?P{match.group(1)}{prefixed}'
+
+    return NAMED_GROUP_RE.sub(rename, pattern), names
+
+
+def build_episode_text(segments: list) -> tuple:
+    """
+    Une el texto del episodio en minúsculas para buscar patrones de una vez.
+
+    Los segmentos se separan por espacio dentro de cada ventana de
+    PATTERN_WINDOW_SECONDS y por salto de línea entre ventanas, así un `.*`
+    no cruza de una ventana a otra.
+
+    Returns:
+        (texto, offsets) con el offset de inicio de cada segmento en el texto
+    """
+    segments = SegmentArray.coerce(segments)
+    pieces = []
+    offsets = np.empty(len(segments), dtype=np.int64)
+    position = 0
+    last_window = None
+    for i, (start, text) in enumerate(zip(segments.start, segments.text)):
+        window = int(start // PATTERN_WINDOW_SECONDS)
+        if i > 0:
+            pieces.append('\n' if window != last_window else ' ')
+            position += 1
+        offsets[i] = position
+        text = text.lower()
+        pieces.append(text)
+        position += len(text)
+        last_window = window
+    return ''.join(pieces), offsets
+
+
+class RuleEngine:
+    """
+    Conjunto de reglas compilado en una regex por tipo, con un grupo por regla.
+
+    Cada regla va dentro de un lookahead, así una regla con `.*` no "tapa" a
+    las demás: en cada posición del texto se reporta la primera regla de
+    cada tipo que matchea ahí. Los tipos se buscan por separado para que un
+    patrón de inicio no oculte uno de fin o de publicidad que empieza en el
+    mismo caracter.
+    """
+
+    def __init__(self, rules: dict, ad_max_seconds: float = DEFAULT_AD_MAX_SECONDS):
+        """
+        Args:
+            rules: dict tipo ('inicio' | 'fin' | 'publicidad') -> lista de patrones
+            ad_max_seconds: duración máxima de un corte publicitario
+        """
+        self.rules = [(kind, pattern) for kind in KINDS for pattern in rules.get(kind, [])]
+        self.ad_max_seconds = ad_max_seconds
+
+        for kind, pattern in self.rules:
+            re.compile(pattern)  # Error claro si una regla de config es inválida
+
+        prefixed = [prefix_groups(pattern, i) for i, (_, pattern) in enumerate(self.rules)]
+        self.captures = [names for _, names in prefixed]
+        self.regexes = {}
+        for kind in KINDS:
+            alternatives = '|'.join(
+                f'(?P<r{i}>{pattern})' for i, (pattern, _) in enumerate(prefixed)
+                if self.rules[i][0] == kind
+            )
+            if alternatives:
+                self.regexes[kind] = re.compile(f'(?=(?:{alternatives}))', re.IGNORECASE)
+
+    @classmethod
+    def from_config(cls, config: dict = None) -> 'RuleEngine':
+        """Crea el motor con las reglas de la sección `segmentation` del config"""
+        if config is None:
+            config = load_config()
+        segmentation = config.get('segmentation', {})
+        rules = {kind: segmentation.get(key) or [] for kind, key in CONFIG_KEYS.items()}
+        return cls(rules, segmentation.get('publicidad_duracion_maxima', DEFAULT_AD_MAX_SECONDS))
+
+    def patterns(self, kind: str) -> list:
+        """Patrones de un tipo, en el orden del config"""
+        return [pattern for k, pattern in self.rules if k == kind]
+
+    def scan(self, segments: list) -> dict:
+        """
+        Aplica todas las reglas al episodio (una pasada por tipo).
+
+        Returns:
+            Dict tipo -> (hits, nombres): array bool por segmento donde empieza
+            un match de ese tipo, y dict índice -> primer patrón que matcheó ahí.
+            Además 'capturas': dict índice -> {grupo: texto} con lo que
+            capturaron los grupos con nombre de los matches de ese segmento
+            (el primer valor de cada grupo).
+        """
+        n = len(segments)
+        result = {kind: (np.zeros(n, dtype=bool), {}) for kind in KINDS}
+        result['capturas'] = {}
+        if n == 0 or not self.regexes:
+            return result
+
+        text, offsets = build_episode_text(segments)
+        positions = {kind: [] for kind in KINDS}
+        patterns = {kind: [] for kind in KINDS}
+        captured = []
+        for kind, regex in self.regexes.items():
+            for match in regex.finditer(text):
+                rule = int(match.lastgroup[1:])
+                positions[kind].append(match.start())
+                patterns[kind].append(self.rules[rule][1])
+                groups = {name: match.group(group) for group, name in self.captures[rule].items()
+                          if match.group(group)}
+                if groups:
+                    captured.append((match.start(), groups))
+        captured.sort(key=lambda item: item[0])
+
+        if captured:
+            idx = np.searchsorted(offsets, [pos for pos, _ in captured], side='right') - 1
+            for i, (_, groups) in zip(idx.tolist(), captured):
+                found = result['capturas'].setdefault(i, {})
+                for name, value in groups.items():
+                    found.setdefault(name, value)
+
+        for kind in KINDS:
+            if not positions[kind]:
+                continue
+            hits, names = result[kind]
+            idx = np.searchsorted(offsets, positions[kind], side='right') - 1
+            hits[idx] = True
+            for i, pattern in zip(idx.tolist(), patterns[kind]):
+                names.setdefault(i, pattern)
+        return result
+
+    def ad_mask(self, segments: list, scan: dict = None) -> np.ndarray:
+        """
+        Marca los segmentos que caen dentro de un corte publicitario: desde un
+        patrón de publicidad hasta el siguiente patrón de inicio de historia,
+        con un máximo de `ad_max_seconds`.
+        """
+        n = len(segments)
+        if scan is None:
+            scan = self.scan(segments)
+        ad_hits = scan['publicidad'][0]
+        mask = np.zeros(n, dtype=bool)
+        if not ad_hits.any():
+            return mask
+
+        starts = SegmentArray.coerce(segments).numpy('start')
+        start_idx = np.flatnonzero(scan['inicio'][0])
+        for i in np.flatnonzero(ad_hits).tolist():
+            limit = int(np.searchsorted(starts, starts[i] + self.ad_max_seconds, side='left'))
+            nxt = np.searchsorted(start_idx, i, side='right')
+            if nxt < len(start_idx):
+                limit = min(limit, int(start_idx[nxt]))
+            mask[i:limit] = True
+        return mask
+
+
+@lru_cache(maxsize=None)
+def get_rule_engine() -> RuleEngine:
+    """Motor de reglas del config del proyecto, compilado una vez por proceso"""
+    return RuleEngine.from_config()
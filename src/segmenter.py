@@ -1,13 +1,23 @@
 #!/usr/bin/env python3
 """
-Segmentador de historias - Usa heurísticas y patrones para detectar 
-inicio/fin de historias en los subtítulos.
+Segmentador de historias - Usa patrones, pausas y cortes de audio para
+detectar inicio/fin de historias en los subtítulos.
 """
 import json
-import re
+import sys
 from pathlib import Path
 from datetime import datetime
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.audio_analysis import load_boundary_candidates
+from src.boundary_scorer import (build_feature_matrix, load_model, place_ends,
+                                 score_segments, select_boundaries)
+from src.entities import story_entities
+from src.features import compute_features, save_features
+from src.models import SegmentArray, Story, json_default
+from src.rules import get_rule_engine
+from src.timemap import encode_time_map
+
 
 def load_subtitles(video_id: str) -> dict:
     """Carga subtítulos de un video"""
@@ -16,6 +26,11 @@ def load_subtitles(video_id: str) -> dict:
         return json.load(f)
 
 
+def load_segments(video_id: str) -> SegmentArray:
+    """Segmentos de un video como SegmentArray (sin un dict por subtítulo)"""
+    return SegmentArray.from_dicts(load_subtitles(video_id)['segments'])
+
+
 def format_timestamp(seconds: float) -> str:
     """Convierte segundos a formato MM:SS"""
     mins = int(seconds // 60)
@@ -23,140 +38,116 @@ def format_timestamp(seconds: float) -> str:
     return f"{mins:02d}:{secs:02d}"
 
 
-def combine_segments_in_range(segments: list, start_time: float, end_time: float) -> str:
-    """Combina el texto de segmentos en un rango de tiempo"""
+def combine_segments_with_map(segments: SegmentArray, start_time: float, end_time: float,
+                              excluded=None) -> tuple:
+    """
+    Combina el texto de segmentos en un rango de tiempo y arma el mapa
+    offset de caracter -> segundo del video (ver `timemap`).
+    
+    `excluded` (opcional) marca por índice los segmentos a omitir, por ejemplo
+    los que caen en un corte publicitario.
+    """
+    segments = SegmentArray.coerce(segments)
     texts = []
-    for seg in segments:
-        seg_start = seg['start']
-        seg_end = seg_start + seg.get('duration', 0)
+    offsets = []
+    seconds = []
+    position = 0
+    for i, (seg_start, text) in enumerate(zip(segments.start, segments.text)):
         # Si el segmento está en el rango
         if seg_start >= start_time and seg_start < end_time:
-            texts.append(seg['text'])
-    return ' '.join(texts)
+            if excluded is not None and excluded[i]:
+                continue
+            if texts:
+                position += 1  # Espacio separador
+            offsets.append(position)
+            seconds.append(int(seg_start))
+            texts.append(text)
+            position += len(text)
+    return ' '.join(texts), encode_time_map(offsets, seconds)
+
+
+def combine_segments_in_range(segments: SegmentArray, start_time: float, end_time: float,
+                              excluded=None) -> str:
+    """Combina el texto de segmentos en un rango de tiempo"""
+    return combine_segments_with_map(segments, start_time, end_time, excluded)[0]
 
 
-def detect_story_boundaries(segments: list) -> list:
+def detect_story_boundaries(segments, audio_candidates: list = None,
+                            model: dict = None, features: dict = None,
+                            engine=None) -> list:
     """
-    Detecta inicio de historias usando patrones típicos del programa.
+    Detecta inicio y fin de historias puntuando cada segmento de subtítulos
+    (reglas de inicio/fin, pausas, preguntas y cortes de audio) y eligiendo
+    la mejor segmentación del episodio con programación dinámica.
     
-    Retorna lista de historias detectadas con timestamps.
+    Los cortes publicitarios (reglas `patterns_publicidad` del config) no
+    pueden ser inicio de historia y se recortan del texto. El nombre y el
+    lugar que capturaron los patrones al comienzo de cada historia van a
+    `entidades` (ver `entities`).
+    
+    Args:
+        segments: SegmentArray (o la lista de dicts del JSON de subtítulos)
+    
+    Retorna lista de `Story` con timestamps.
     """
-    # Patrones que típicamente indican inicio de historia
-    patterns_inicio = [
-        # Saludos a oyentes en vivo
-        r"hola,?\s+\w+[,.]?\s*(cómo|como)\s+(te va|estás|andás)",
-        r"buenas noches.*bienvenid",
-        r"hola.*buenas noches",
-        r"te escuchamos",
-        r"contanos.*historia",
-        r"escuchamos tu historia",
-        
-        # Historias escritas/audios
-        r"me escribe\s+\w+",
-        r"nos escribe\s+\w+",
-        r"soy\s+\w+\s+de\s+\w+",
-        r"te habla\s+\w+",
-        r"mi nombre es\s+\w+",
-        r"hola.*quería contar",
-        r"quería compartir",
-        r"te cuento.*historia",
-        r"voy a contar",
-        
-        # Transiciones
-        r"vamos con otra",
-        r"la siguiente historia",
-        r"hay más historias",
-        r"tengo.*que está.*vivo",
-        r"está.*en vivo.*nosotros",
-        r"vamos a saludar",
-        
-        # Inicios de audios WhatsApp
-        r"hola\s+héctor",
-        r"buenas noches\s+héctor",
-        r"hola\s+chicos",
-    ]
-    
-    # Patrones que indican FIN de historia / transición
-    patterns_fin = [
-        r"gracias por (contar|compartir|llamar)",
-        r"un abrazo",
-        r"cuídate",
-        r"chao",
-        r"seguimos con",
-        r"vamos a (una pausa|corte)",
-        r"ya (volvemos|regresamos)",
-    ]
-    
-    # Combinar texto en ventanas de tiempo para mejor detección
-    window_seconds = 30  # Ventana de 30 segundos
+    segments = SegmentArray.coerce(segments)
+    if not len(segments):
+        return []
+    if model is None:
+        model = load_model()
+    if engine is None:
+        engine = get_rule_engine()
+    
+    if features is None:
+        features = compute_features(segments)
+    scan = engine.scan(segments)
+    ads = engine.ad_mask(segments, scan)
+    pattern_names = scan['inicio'][1]
+    
+    X = build_feature_matrix(segments, scan, audio_candidates, features)
+    scores = score_segments(X, model)
+    scores[ads] = -1.0
+    min_gap = model['duracion_minima']
+    
+    chosen = select_boundaries(features['start'].astype('float64'), scores, min_gap)
+    ends = place_ends(segments, chosen, scan['fin'][0], min_gap)
     
     stories = []
-    current_story_start = None
-    current_context = ""
-    
-    # Crear índice de texto por tiempo
-    text_by_time = {}
-    for seg in segments:
-        time_key = int(seg['start'] // window_seconds) * window_seconds
-        if time_key not in text_by_time:
-            text_by_time[time_key] = []
-        text_by_time[time_key].append(seg)
-    
-    # Buscar inicios de historias
-    potential_starts = []
-    
-    for time_key in sorted(text_by_time.keys()):
-        segs = text_by_time[time_key]
-        combined_text = ' '.join([s['text'] for s in segs]).lower()
+    for i, (idx, end_time) in enumerate(zip(chosen, ends)):
+        start_time = segments.start[idx]
         
-        for pattern in patterns_inicio:
-            if re.search(pattern, combined_text, re.IGNORECASE):
-                # Encontrar el timestamp más preciso
-                first_seg = segs[0]
-                potential_starts.append({
-                    'start': first_seg['start'],
-                    'pattern': pattern,
-                    'context': combined_text[:200]
-                })
-                break
-    
-    # Eliminar duplicados cercanos (menos de 60 segundos)
-    filtered_starts = []
-    last_time = -120
-    for start in potential_starts:
-        if start['start'] - last_time > 60:
-            filtered_starts.append(start)
-            last_time = start['start']
-    
-    # Crear historias con estimación de duración
-    for i, start in enumerate(filtered_starts):
-        # Fin es el inicio de la siguiente historia o +10 minutos
-        if i < len(filtered_starts) - 1:
-            end_time = filtered_starts[i + 1]['start']
-        else:
-            end_time = start['start'] + 600  # 10 minutos por defecto
+        # Segmentos de la historia que son publicidad
+        in_story = (features['start'] >= start_time) & (features['start'] < end_time)
+        ad_seconds = float((features['end'] - features['start'])[in_story & ads].sum())
+        ad_ratio = (in_story & ads).sum() / max(in_story.sum(), 1)
         
-        # Limitar duración máxima a 15 minutos
-        if end_time - start['start'] > 900:
-            end_time = start['start'] + 600
+        # Extraer texto completo de la historia (sin publicidad)
+        full_text, time_map = combine_segments_with_map(segments, start_time, end_time, ads)
         
-        # Extraer texto completo de la historia
-        full_text = combine_segments_in_range(segments, start['start'], end_time)
-        
-        stories.append({
-            'id': i + 1,
-            'timestamp_inicio': round(start['start'], 1),
-            'timestamp_fin': round(end_time, 1),
-            'timestamp_fmt': format_timestamp(start['start']),
-            'duracion_segundos': round(end_time - start['start'], 1),
-            'patron_detectado': start['pattern'],
-            'texto_completo': full_text,
-            'clasificacion': None,  # Para llenar después
-        })
+        stories.append(Story(
+            id=i + 1,
+            timestamp_inicio=round(start_time, 1),
+            timestamp_fin=round(end_time, 1),
+            timestamp_fmt=format_timestamp(start_time),
+            duracion_segundos=round(end_time - start_time, 1),
+            patron_detectado=pattern_names.get(idx),
+            score_limite=round(float(scores[idx]), 3),
+            es_publicidad=bool(ad_ratio > 0.5),
+            segundos_publicidad=round(ad_seconds, 1),
+            texto_completo=full_text,
+            mapa_tiempos=time_map,
+            entidades=story_entities(segments.start, end_time, scan['capturas'], idx),
+            clasificacion=None,  # Para llenar después
+        ))
     
     return stories
 
 
+def detect_video_stories(video_id: str) -> list:
+    """Detecta las historias de un video con sus subtítulos y audio guardados"""
+    return detect_story_boundaries(load_segments(video_id), load_boundary_candidates(video_id))
+
+
 def segment_video(video_id: str) -> dict:
     """
     Procesa un video y genera su segmentación.
@@ -164,13 +155,18 @@ def segment_video(video_id: str) -> dict:
     print(f"\n🔍 Segmentando video: {video_id}")
     
     # Cargar subtítulos
-    data = load_subtitles(video_id)
-    segments = data['segments']
+    segments = load_segments(video_id)
     
     print(f"   📊 Total segmentos de subtítulos: {len(segments)}")
     
+    # Candidatos de audio (si se corrió audio_analysis para este video)
+    audio_candidates = load_boundary_candidates(video_id)
+    if audio_candidates:
+        print(f"   🔊 Candidatos de audio: {len(audio_candidates)}")
+    
     # Detectar historias
-    stories = detect_story_boundaries(segments)
+    features = compute_features(segments)
+    stories = detect_story_boundaries(segments, audio_candidates, features=features)
     
     print(f"   📚 Historias detectadas: {len(stories)}")
     
@@ -179,7 +175,7 @@ def segment_video(video_id: str) -> dict:
         "video_id": video_id,
         "fecha_segmentacion": datetime.now().isoformat(),
         "total_historias": len(stories),
-        "metodo": "heuristicas_v1",
+        "metodo": "scorer_v1" + ("+audio" if audio_candidates else ""),
         "historias": stories
     }
     
@@ -188,14 +184,18 @@ def segment_video(video_id: str) -> dict:
     Path(output_path).parent.mkdir(parents=True, exist_ok=True)
     
     with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(result, f, ensure_ascii=False, indent=2)
+        json.dump(result, f, ensure_ascii=False, indent=2, default=json_default)
     
     print(f"   ✅ Guardado: {output_path}")
     
+    # Features de pausas/ritmo para puntuar límites sin reprocesar el texto
+    features_path = save_features(video_id, features)
+    print(f"   ✅ Features: {features_path}")
+    
     # Mostrar resumen
     print(f"\n   📋 Historias encontradas:")
     for story in stories[:10]:
-        print(f"      [{story['timestamp_fmt']}] {story['texto_completo'][:60]}...")
+        print(f"      [{story.timestamp_fmt}] {story.texto_completo[:60]}...")
     
     if len(stories) > 10:
         print(f"      ... y {len(stories) - 10} más")
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Series de tiempo por fecha de emisión de los videos.
+
+Tres series precalculadas en la base, para los gráficos de la web:
+
+    series_semanas     historias por categoría y semana (lunes a domingo)
+    series_meses       historias, historias con score y suma de WTF por mes
+                       (el promedio es suma / con_wtf: se puede volver a
+                       sumar por año sin perder precisión)
+    series_en_alza     los TOP_TERMS términos que más crecieron cada
+                       trimestre respecto del anterior, a partir de
+                       series_terminos (en cuántas historias aparece cada
+                       término por trimestre)
+
+Es incremental: `series_videos` guarda de cada video su huella (fecha,
+cantidad de historias, último id y suma de WTF, que cambian al importar o
+reimportar) y los períodos en los que cayó. `refresh_series` sólo recalcula
+las semanas, meses y trimestres de los videos nuevos, cambiados o borrados
+(con todos los videos de esos períodos), más el trimestre siguiente a cada
+trimestre tocado, cuyo ranking se compara contra él.
+
+    python3 src/series.py                 # actualiza los períodos afectados
+    python3 src/series.py --reconstruir   # recalcula todo
+"""
+import json
+import sqlite3
+import sys
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.db import ACCENT_FOLD, DB_PATH, TEXT_SQL, WORD_RE, get_connection
+
+
+TOP_TERMS = 20
+MIN_WORD_LEN = 5              # Las palabras más cortas son casi todas funcionales
+MIN_TERM_STORIES = 5          # Historias del trimestre para entrar al ranking
+STORED_MIN_STORIES = 2        # Términos de una sola historia no se guardan
+SERIES_PATH = "web/data/series.json"
+
+STOPWORDS = frozenset((
+    'entonces', 'porque', 'cuando', 'estaba', 'estaban', 'despues', 'tambien', 'todos', 'todas',
+    'nosotros', 'ustedes', 'ellos', 'ellas', 'donde', 'mientras', 'tenia', 'habia', 'hasta',
+    'desde', 'sobre', 'nunca', 'siempre', 'mucho', 'mucha', 'muchos', 'muchas', 'algun',
+    'alguna', 'alguien', 'nadie', 'nada', 'bueno', 'buenas', 'noches', 'digamos', 'verdad',
+    'estoy', 'estas', 'estamos', 'tengo', 'tenes', 'tiene', 'tienen', 'puede', 'podes',
+    'quiero', 'queria', 'hacer', 'decir', 'dijo', 'ahora', 'antes', 'otros', 'otras', 'cosas',
+))
+
+
+def periods(fecha: str | None) -> tuple | None:
+    """(semana, mes, trimestre) de una fecha ISO: ('2024-12-16', '2024-12', '2024-T4')"""
+    try:
+        day = date.fromisoformat((fecha or '')[:10])
+    except ValueError:
+        return None
+    monday = day - timedelta(days=day.weekday())
+    return monday.isoformat(), day.isoformat()[:7], f"{day.year}-T{(day.month - 1) // 3 + 1}"
+
+
+def previous_quarter(quarter: str) -> str:
+    year, q = int(quarter[:4]), int(quarter[-1])
+    return f"{year - 1}-T4" if q == 1 else f"{year}-T{q - 1}"
+
+
+def next_quarter(quarter: str) -> str:
+    year, q = int(quarter[:4]), int(quarter[-1])
+    return f"{year + 1}-T1" if q == 4 else f"{year}-T{q + 1}"
+
+
+def terms(text: str) -> set:
+    """Términos de una historia (en minúsculas, sin tildes, sin repetir)"""
+    return {w for w in WORD_RE.findall((text or '').lower().translate(ACCENT_FOLD))
+            if len(w) >= MIN_WORD_LEN and w not in STOPWORDS and not w.isdigit()}
+
+
+def _video_states(conn) -> dict:
+    """video_id -> (huella, períodos) del estado actual de la base"""
+    # Agregar primero y después unir: con el LEFT JOIN directo el planner
+    # recorre las historias una vez por video
+    rows = conn.execute('''
+        SELECT v.video_id, v.fecha_emision, COALESCE(h.total, 0), h.ultimo, COALESCE(h.suma_wtf, 0)
+        FROM videos v
+        LEFT JOIN (
+            SELECT video_id, COUNT(*) AS total, MAX(id) AS ultimo, TOTAL(wtf_score) AS suma_wtf
+            FROM historias WHERE es_publicidad = 0 GROUP BY video_id
+        ) h ON h.video_id = v.video_id
+    ''')
+    return {video_id: (f"{fecha}|{count}|{last_id}|{wtf_sum:.6f}", periods(fecha))
+            for video_id, fecha, count, last_id, wtf_sum in rows}
+
+
+def _videos_in(states: dict, affected: tuple) -> list:
+    """Videos con alguna semana, mes o trimestre afectado"""
+    return [video_id for video_id, (_, p) in states.items()
+            if p and any(p[k] in affected[k] for k in range(3))]
+
+
+def _refresh_counts(conn, states: dict, affected: tuple):
+    """Recalcula las semanas y meses afectados con todos sus videos"""
+    weeks, months, _ = affected
+    by_week = Counter()
+    by_month = defaultdict(lambda: [0, 0, 0.0])
+    video_ids = _videos_in(states, (weeks, months, set()))
+    for i in range(0, len(video_ids), 500):
+        chunk = video_ids[i:i + 500]
+        rows = conn.execute(f'''
+            SELECT video_id, COALESCE(categoria, ''), COUNT(*), COUNT(wtf_score), TOTAL(wtf_score)
+            FROM historias
+            WHERE es_publicidad = 0 AND video_id IN ({','.join('?' * len(chunk))})
+            GROUP BY video_id, categoria
+        ''', chunk)
+        for video_id, categoria, count, scored, wtf_sum in rows:
+            week, month, _ = states[video_id][1]
+            if week in weeks:
+                by_week[week, categoria] += count
+            if month in months:
+                totals = by_month[month]
+                totals[0] += count
+                totals[1] += scored
+                totals[2] += wtf_sum
+
+    conn.executemany('DELETE FROM series_semanas WHERE semana = ?', [(w,) for w in weeks])
+    conn.executemany('INSERT INTO series_semanas (semana, categoria, historias) VALUES (?, ?, ?)',
+                     [(w, c, n) for (w, c), n in by_week.items()])
+    conn.executemany('DELETE FROM series_meses WHERE mes = ?', [(m,) for m in months])
+    conn.executemany('INSERT INTO series_meses (mes, historias, con_wtf, suma_wtf) VALUES (?, ?, ?, ?)',
+                     [(m, *totals) for m, totals in by_month.items()])
+
+
+def _refresh_terms(conn, states: dict, quarters: set):
+    """Recalcula la frecuencia de términos de los trimestres afectados"""
+    by_quarter = {q: Counter() for q in quarters}
+    stories = Counter()
+    video_ids = _videos_in(states, (set(), set(), quarters))
+    for i in range(0, len(video_ids), 500):
+        chunk = video_ids[i:i + 500]
+        rows = conn.execute(f'''
+            SELECT video_id, {TEXT_SQL.format(row='')} FROM historias
+            WHERE es_publicidad = 0 AND video_id IN ({','.join('?' * len(chunk))})
+        ''', chunk)
+        for video_id, texto in rows:
+            quarter = states[video_id][1][2]
+            by_quarter[quarter].update(terms(texto))
+            stories[quarter] += 1
+
+    for quarter, counts in by_quarter.items():
+        conn.execute('DELETE FROM series_terminos WHERE trimestre = ?', (quarter,))
+        conn.executemany('INSERT INTO series_terminos (trimestre, termino, historias) VALUES (?, ?, ?)',
+                         [(quarter, t, n) for t, n in counts.items() if n >= STORED_MIN_STORIES])
+        conn.execute('DELETE FROM series_trimestres WHERE trimestre = ?', (quarter,))
+        if stories[quarter]:
+            conn.execute('INSERT INTO series_trimestres (trimestre, historias) VALUES (?, ?)',
+                         (quarter, stories[quarter]))
+
+
+def _rank_rising(conn, quarter: str):
+    """
+    Ranking de términos en alza de un trimestre: la proporción de historias
+    que lo mencionan contra la del trimestre anterior (suavizada: un término
+    nuevo no crece infinito)
+    """
+    conn.execute('DELETE FROM series_en_alza WHERE trimestre = ?', (quarter,))
+    totals = dict(conn.execute('SELECT trimestre, historias FROM series_trimestres WHERE trimestre IN (?, ?)',
+                               (quarter, previous_quarter(quarter))))
+    n, n_prev = totals.get(quarter, 0), totals.get(previous_quarter(quarter), 0)
+    if not n or not n_prev:
+        return
+    rows = conn.execute('''
+        SELECT t.termino, t.historias, COALESCE(p.historias, 0)
+        FROM series_terminos t
+        LEFT JOIN series_terminos p ON p.trimestre = ? AND p.termino = t.termino
+        WHERE t.trimestre = ? AND t.historias >= ?
+    ''', (previous_quarter(quarter), quarter, MIN_TERM_STORIES)).fetchall()
+    ranked = sorted(((t, df, (df / n) / ((df_prev + 1) / (n_prev + 1))) for t, df, df_prev in rows),
+                    key=lambda r: (-r[2], -r[1], r[0]))
+    conn.executemany('''
+        INSERT INTO series_en_alza (trimestre, posicion, termino, historias, crecimiento)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [(quarter, i + 1, t, df, round(growth, 3))
+          for i, (t, df, growth) in enumerate(ranked[:TOP_TERMS]) if growth > 1])
+
+
+def refresh_series(db_path: str = DB_PATH, rebuild: bool = False) -> dict:
+    """
+    Actualiza las series con los videos nuevos, cambiados o borrados desde
+    la última vez.
+
+    Returns:
+        {'videos': videos con cambios, 'semanas', 'meses', 'trimestres':
+        períodos recalculados}
+    """
+    conn = get_connection(db_path)
+    try:
+        if rebuild:
+            for table in ('series_semanas', 'series_meses', 'series_terminos', 'series_trimestres',
+                          'series_en_alza', 'series_videos'):
+                conn.execute(f'DELETE FROM {table}')
+        states = _video_states(conn)
+        stored = {video_id: (huella, (semana, mes, trimestre) if semana else None)
+                  for video_id, huella, semana, mes, trimestre in conn.execute(
+                      'SELECT video_id, huella, semana, mes, trimestre FROM series_videos')}
+
+        changed = [v for v in states.keys() | stored.keys() if states.get(v) != stored.get(v)]
+        affected = (set(), set(), set())
+        for video_id in changed:
+            for _, p in (states.get(video_id, (None, None)), stored.get(video_id, (None, None))):
+                if p:
+                    for k in range(3):
+                        affected[k].add(p[k])
+
+        if changed:
+            _refresh_counts(conn, states, affected)
+            _refresh_terms(conn, states, affected[2])
+            for quarter in sorted(affected[2] | {next_quarter(q) for q in affected[2]}):
+                _rank_rising(conn, quarter)
+            conn.executemany('DELETE FROM series_videos WHERE video_id = ?',
+                             [(v,) for v in changed if v not in states])
+            conn.executemany('''
+                INSERT OR REPLACE INTO series_videos (video_id, huella, semana, mes, trimestre)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [(v, states[v][0], *(states[v][1] or (None, None, None))) for v in changed if v in states])
+            conn.execute("INSERT OR REPLACE INTO db_meta (clave, valor) VALUES ('series', ?)",
+                         (datetime.now().isoformat(),))
+        conn.commit()
+    finally:
+        conn.close()
+    return {'videos': len(changed), 'semanas': len(affected[0]), 'meses': len(affected[1]),
+            'trimestres': len(affected[2])}
+
+
+def _week_range(first: str, last: str) -> list:
+    start, end = date.fromisoformat(first), date.fromisoformat(last)
+    return [(start + timedelta(weeks=i)).isoformat() for i in range((end - start).days // 7 + 1)]
+
+
+def _month_range(first: str, last: str) -> list:
+    year, month = int(first[:4]), int(first[5:7])
+    months = []
+    while f"{year:04d}-{month:02d}" <= last:
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def series_columns(db_path: str = DB_PATH) -> dict | None:
+    """
+    Las series en columnas para los gráficos: arrays paralelos, densos (los
+    períodos sin historias valen 0, o null en el promedio de WTF), y la
+    semana i es `semanas.desde` + 7·i días. None si la base no tiene series
+    (o es anterior a las tablas de series).
+    """
+    conn = get_connection(db_path)
+    try:
+        weekly = conn.execute('SELECT semana, categoria, historias FROM series_semanas ORDER BY semana').fetchall()
+        monthly = conn.execute('SELECT mes, historias, con_wtf, suma_wtf FROM series_meses ORDER BY mes').fetchall()
+        rising = conn.execute('''
+            SELECT trimestre, termino, crecimiento FROM series_en_alza ORDER BY trimestre, posicion
+        ''').fetchall()
+        updated = conn.execute("SELECT valor FROM db_meta WHERE clave = 'series'").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.close()
+    if not weekly:
+        return None
+
+    weeks = _week_range(weekly[0][0], weekly[-1][0])
+    index = {w: i for i, w in enumerate(weeks)}
+    categories = {}
+    for semana, categoria, historias in weekly:
+        categories.setdefault(categoria or 'sin_categoria', [0] * len(weeks))[index[semana]] += historias
+
+    months = _month_range(monthly[0][0], monthly[-1][0])
+    by_month = {mes: (historias, con_wtf, suma) for mes, historias, con_wtf, suma in monthly}
+    counts = [by_month.get(m, (0, 0, 0.0)) for m in months]
+
+    quarters = {}
+    for trimestre, termino, crecimiento in rising:
+        entry = quarters.setdefault(trimestre, ([], []))
+        entry[0].append(termino)
+        entry[1].append(crecimiento)
+
+    return {
+        'actualizado': updated[0] if updated else None,
+        'semanas': {'desde': weeks[0], 'total': len(weeks), 'categorias': categories},
+        'meses': {
+            'desde': months[0],
+            'historias': [c[0] for c in counts],
+            'wtf_promedio': [round(c[2] / c[1], 3) if c[1] else None for c in counts],
+        },
+        'trimestres': {
+            'trimestre': list(quarters),
+            'terminos': [q[0] for q in quarters.values()],
+            'crecimiento': [q[1] for q in quarters.values()],
+        },
+    }
+
+
+def export_series(output_path: str = SERIES_PATH, db_path: str = DB_PATH) -> bool:
+    """
+    Escribe las series para la web (sólo si cambiaron).
+
+    Returns:
+        True si se escribió el archivo
+    """
+    from src.exporter import _write_atomic  # exporter importa de db, como este módulo
+
+    if not Path(db_path).exists():
+        return False
+    payload = series_columns(db_path)
+    if payload is None:
+        return False
+    text = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+    path = Path(output_path)
+    if path.exists() and path.read_text(encoding='utf-8') == text:
+        return False
+    _write_atomic(path, text)
+    return True
+
+
+if __name__ == "__main__":
+    from src.db import init_db
+
+    init_db()
+    stats = refresh_series(rebuild='--reconstruir' in sys.argv)
+    print(f"✅ Series actualizadas: {stats['videos']} videos con cambios "
+          f"({stats['semanas']} semanas, {stats['meses']} meses, {stats['trimestres']} trimestres)")
+    columns = series_columns()
+    if columns and columns['trimestres']['trimestre']:
+        quarter = columns['trimestres']['trimestre'][-1]
+        print(f"   📈 En alza en {quarter}: {', '.join(columns['trimestres']['terminos'][-1][:10])}")
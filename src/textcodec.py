@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Compresión del texto de las historias con un diccionario compartido.
+
+Cada historia es una transcripción de hasta 15 minutos con el mismo
+vocabulario y las mismas muletillas que todas las demás: un diccionario
+entrenado sobre el corpus le da al compresor ese contexto de entrada, y
+comprime mucho mejor cada texto por separado.
+
+Formato del blob: 1 byte de códec + 2 bytes (big endian) con el id del
+diccionario (0 = sin diccionario) + los datos comprimidos.
+
+    0x01  zlib (deflate crudo, nivel 9) con diccionario predefinido (zdict)
+    0x02  zstd con diccionario entrenado (requiere `zstandard`)
+"""
+import struct
+import zlib
+from collections import Counter
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODECS = {'zlib': CODEC_ZLIB, 'zstd': CODEC_ZSTD}
+HEADER = struct.Struct('>BH')
+ZLIB_DICT_SIZE = 32 * 1024         # Ventana de deflate: más no se usa
+ZSTD_DICT_SIZE = 64 * 1024
+MAX_NGRAM = 4
+
+
+def train_zlib_dictionary(texts: list, size: int = ZLIB_DICT_SIZE) -> bytes:
+    """
+    Diccionario para zlib: las frases de 1 a MAX_NGRAM palabras que más bytes
+    ahorrarían (frecuencia × largo), las más valiosas al final porque deflate
+    llega con distancias más cortas a lo último del diccionario.
+    """
+    counts = Counter()
+    for text in texts:
+        words = text.split()
+        for n in range(1, MAX_NGRAM + 1):
+            counts.update(' '.join(words[i:i + n]) for i in range(len(words) - n + 1))
+
+    chosen = []
+    total = 0
+    for phrase, freq in sorted(counts.items(), key=lambda kv: kv[1] * len(kv[0]), reverse=True):
+        if freq < 2:
+            break
+        piece = (phrase + ' ').encode('utf-8')
+        if total + len(piece) > size:
+            continue
+        chosen.append(piece)
+        total += len(piece)
+    return b''.join(reversed(chosen))
+
+
+def train_dictionary(texts: list, algorithm: str = 'zlib') -> bytes:
+    """Entrena un diccionario para el algoritmo pedido"""
+    if algorithm == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Falta zstandard: pip install zstandard")
+        samples = [t.encode('utf-8') for t in texts if t]
+        return zstandard.train_dictionary(ZSTD_DICT_SIZE, samples).as_bytes()
+    return train_zlib_dictionary(texts)
+
+
+class TextCodec:
+    """
+    Comprime con el diccionario vigente (`current`) y descomprime con el que
+    indique cada blob. `load_dictionary(id)` devuelve (algoritmo, bytes) de un
+    diccionario guardado; se consulta una sola vez por id.
+    """
+
+    def __init__(self, load_dictionary, current: int | None = None, algorithm: str = 'zlib'):
+        self._load = load_dictionary
+        self._dicts = {}
+        self.current = current
+        self.algorithm = algorithm
+
+    def _dictionary(self, dict_id: int) -> bytes:
+        if dict_id not in self._dicts:
+            self._dicts[dict_id] = self._load(dict_id)[1] if dict_id else b''
+        return self._dicts[dict_id]
+
+    def _zstd_dict(self, dict_id: int):
+        """ZstdCompressionDict del id (None sin diccionario), cacheado"""
+        key = ('zstd', dict_id)
+        if key not in self._dicts:
+            zdict = self._dictionary(dict_id)
+            self._dicts[key] = zstandard.ZstdCompressionDict(zdict) if zdict else None
+        return self._dicts[key]
+
+    def compress(self, text: str) -> bytes:
+        data = text.encode('utf-8')
+        dict_id = self.current or 0
+        if self.algorithm == 'zstd':
+            compressor = zstandard.ZstdCompressor(level=19, dict_data=self._zstd_dict(dict_id))
+            return HEADER.pack(CODEC_ZSTD, dict_id) + compressor.compress(data)
+        zdict = self._dictionary(dict_id)
+        compressor = (zlib.compressobj(9, zlib.DEFLATED, -15, zdict=zdict) if zdict
+                      else zlib.compressobj(9, zlib.DEFLATED, -15))
+        return HEADER.pack(CODEC_ZLIB, dict_id) + compressor.compress(data) + compressor.flush()
+
+    def decompress(self, blob: bytes | None) -> str | None:
+        """Texto de un blob (None si es NULL): se registra como función SQL"""
+        if blob is None:
+            return None
+        codec, dict_id = HEADER.unpack_from(blob)
+        payload = memoryview(blob)[HEADER.size:]
+        if codec == CODEC_ZSTD:
+            if zstandard is None:
+                raise RuntimeError("Texto comprimido con zstd: pip install zstandard")
+            decompressor = zstandard.ZstdDecompressor(dict_data=self._zstd_dict(dict_id))
+            return decompressor.decompress(payload).decode('utf-8')
+        zdict = self._dictionary(dict_id)
+        decompressor = (zlib.decompressobj(-15, zdict=zdict) if zdict
+                        else zlib.decompressobj(-15))
+        return (decompressor.decompress(payload) + decompressor.flush()).decode('utf-8')
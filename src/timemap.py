@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Mapa offset de caracter -> segundo del video para cada historia.
+
+Permite llevar un match de búsqueda, un snippet o un término resaltado dentro
+de `texto_completo` al segundo exacto en que se dijo (`&t=` de YouTube).
+
+El mapa se guarda compacto: pares (delta_offset, delta_segundo) codificados
+como varints y luego en base64, una entrada por cada segundo nuevo.
+"""
+import base64
+import bisect
+from itertools import accumulate
+
+
+def _write_varint(value: int, out: bytearray):
+    """Agrega un entero no negativo como varint (7 bits por byte)"""
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varints(data: bytes) -> list:
+    """Decodifica una secuencia de varints"""
+    values = []
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append(value)
+            value = shift = 0
+    return values
+
+
+def encode_time_map(offsets: list, seconds: list) -> str:
+    """
+    Codifica el mapa. `offsets` y `seconds` deben ser no decrecientes.
+
+    Sólo se guarda una entrada por cada segundo nuevo: dentro del mismo
+    segundo no hace falta más precisión para un link de YouTube.
+    """
+    out = bytearray()
+    last_offset = last_second = 0
+    first = True
+    for offset, second in zip(offsets, seconds):
+        second = int(second)
+        if not first and second <= last_second:
+            continue
+        _write_varint(offset - last_offset, out)
+        _write_varint(second - last_second, out)
+        last_offset, last_second = offset, second
+        first = False
+    return base64.b64encode(bytes(out)).decode('ascii')
+
+
+def decode_time_map(encoded: str) -> tuple:
+    """
+    Decodifica el mapa.
+
+    Returns:
+        (offsets, segundos) como listas absolutas, ordenadas
+    """
+    if not encoded:
+        return [], []
+    values = _read_varints(base64.b64decode(encoded))
+    offsets = list(accumulate(values[0::2]))
+    seconds = list(accumulate(values[1::2]))
+    return offsets, seconds
+
+
+def timestamp_at(time_map: tuple, char_offset: int) -> int | None:
+    """Segundo del video en que se dijo el caracter `char_offset` (O(log n))"""
+    offsets, seconds = time_map
+    if not offsets:
+        return None
+    i = bisect.bisect_right(offsets, char_offset) - 1
+    return seconds[max(i, 0)]
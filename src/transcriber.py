@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Transcriptor de respaldo con Whisper - Para videos sin subtítulos.
+
+Decodifica el audio en ventanas fijas con solapamiento (sin cargar el episodio
+completo en memoria), carga el modelo una sola vez por proceso y transcribe las
+ventanas en paralelo. Devuelve el mismo schema que `ingestor.fetch_subtitles`.
+
+    python3 src/transcriber.py <audio> <video_id> [modelo]
+"""
+import math
+import os
+import subprocess
+import wave
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+
+SAMPLE_RATE = 16000  # Whisper trabaja a 16 kHz mono
+WINDOW_SECONDS = 30.0
+OVERLAP_SECONDS = 2.0
+DEFAULT_MODEL = "base"
+
+# Modelo cargado una vez por proceso worker
+_model = None
+
+
+def iter_audio_windows(audio_path: str, window_seconds: float = WINDOW_SECONDS,
+                       overlap_seconds: float = OVERLAP_SECONDS):
+    """
+    Lee el audio en streaming y genera ventanas solapadas.
+
+    Los .wav (16 kHz, mono, 16 bits) se leen directamente; el resto de los
+    formatos se decodifica con ffmpeg a PCM por un pipe.
+
+    Yields:
+        Tuplas (offset_segundos, samples float32 normalizados a [-1, 1],
+        es_la_última): se lee un bloque por adelantado para marcar la última
+        ventana, que no tiene otra después que cubra su final
+    """
+    window = int(window_seconds * SAMPLE_RATE)
+    step = window - int(overlap_seconds * SAMPLE_RATE)
+    if step <= 0:
+        raise ValueError("El solapamiento debe ser menor que la ventana")
+
+    previous = None
+    for offset, samples in iter_pcm_blocks(audio_path, window, step):
+        if previous is not None:
+            yield previous[0] / SAMPLE_RATE, previous[1].astype(np.float32) / 32768.0, False
+        previous = (offset, samples)
+    if previous is not None:
+        yield previous[0] / SAMPLE_RATE, previous[1].astype(np.float32) / 32768.0, True
+
+
+def iter_pcm_blocks(audio_path: str, window: int, step: int):
+    """
+    Genera bloques PCM int16 de `window` muestras avanzando de a `step`.
+    
+    El último bloque se omite si sólo tiene el solapamiento del anterior
+    (`window - step` muestras o menos), que ya se transcribió.
+    """
+    reader, closer = open_pcm(audio_path)
+    try:
+        buffer = np.empty(0, dtype=np.int16)
+        offset = 0
+        eof = False
+        while not eof:
+            missing = window - len(buffer)
+            raw = reader(missing * 2) if missing > 0 else b''
+            if missing > 0 and len(raw) < missing * 2:
+                eof = True
+            if raw:
+                buffer = np.concatenate([buffer, np.frombuffer(raw[:len(raw) // 2 * 2], dtype=np.int16)])
+            if len(buffer) == 0 or (offset > 0 and len(buffer) <= window - step):
+                break
+            yield offset, buffer
+            if eof:
+                break
+            buffer = buffer[step:]
+            offset += step
+    finally:
+        closer()
+
+
+def open_pcm(audio_path: str):
+    """Abre el audio como stream PCM int16 mono a SAMPLE_RATE"""
+    if audio_path.lower().endswith('.wav'):
+        wav = wave.open(audio_path, 'rb')
+        if (wav.getframerate(), wav.getnchannels(), wav.getsampwidth()) == (SAMPLE_RATE, 1, 2):
+            return (lambda n: wav.readframes(n // 2)), wav.close
+        wav.close()
+
+    proc = subprocess.Popen(
+        ['ffmpeg', '-nostdin', '-loglevel', 'error', '-i', audio_path,
+         '-f', 's16le', '-ac', '1', '-ar', str(SAMPLE_RATE), '-'],
+        stdout=subprocess.PIPE
+    )
+
+    def close():
+        proc.stdout.close()
+        proc.wait()
+
+    return proc.stdout.read, close
+
+
+def _init_worker(model_name: str):
+    """Carga el modelo Whisper una sola vez por proceso"""
+    global _model
+    import whisper
+    _model = whisper.load_model(model_name)
+
+
+def _transcribe_window(args: tuple) -> list:
+    """Transcribe una ventana y devuelve segmentos con timestamps absolutos"""
+    offset, samples, language, keep_from, keep_until = args
+    result = _model.transcribe(samples, language=language, fp16=False)
+
+    segments = []
+    for item in result.get('segments', []):
+        start = offset + item['start']
+        # Del solapamiento nos quedamos con lo que empieza en la mitad propia
+        if start < keep_from or start >= keep_until:
+            continue
+        segments.append({
+            "start": round(start, 2),
+            "duration": round(item['end'] - item['start'], 2),
+            "text": item['text'].strip()
+        })
+    return segments
+
+
+def window_jobs(audio_path: str, language: str = "es", window_seconds: float = WINDOW_SECONDS,
+                overlap_seconds: float = OVERLAP_SECONDS):
+    """
+    Argumentos de `_transcribe_window` para cada ventana del audio: cada una
+    se queda con los segmentos que empiezan en su parte propia (la mitad del
+    solapamiento de cada lado) y la última con todo lo que sigue.
+    """
+    half_overlap = overlap_seconds / 2
+    for offset, samples, last in iter_audio_windows(audio_path, window_seconds, overlap_seconds):
+        keep_from = offset + half_overlap if offset > 0 else 0.0
+        keep_until = math.inf if last else offset + window_seconds - half_overlap
+        yield offset, samples, language, keep_from, keep_until
+
+
+def transcribe_audio_file(audio_path: str, video_id: str, language: str = "es",
+                          model_name: str = DEFAULT_MODEL, workers: int = None,
+                          window_seconds: float = WINDOW_SECONDS,
+                          overlap_seconds: float = OVERLAP_SECONDS) -> dict:
+    """
+    Transcribe un archivo de audio local en ventanas paralelas.
+
+    Args:
+        audio_path: Ruta al audio (wav/mp3/m4a/...)
+        video_id: ID del video de YouTube al que pertenece el audio
+        language: Código de idioma para Whisper
+        model_name: Modelo de Whisper a usar
+        workers: Procesos en paralelo (default: CPUs disponibles). Se
+            decodifican a lo sumo 2 × workers ventanas por adelantado.
+
+    Returns:
+        Dict con video_id, language, total_segments y segments
+    """
+    workers = workers or os.cpu_count()
+    segments = []
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_init_worker, initargs=(model_name,)) as pool:
+        # pool.map consumiría el generador entero (todo el audio decodificado)
+        pending = deque()
+        for job in window_jobs(audio_path, language, window_seconds, overlap_seconds):
+            pending.append(pool.submit(_transcribe_window, job))
+            if len(pending) >= 2 * workers:
+                segments.extend(pending.popleft().result())
+        while pending:
+            segments.extend(pending.popleft().result())
+
+    return {
+        "video_id": video_id,
+        "language": language,
+        "origen": f"whisper:{model_name}",
+        "total_segments": len(segments),
+        "segments": segments
+    }
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    from src.ingestor import save_subtitles
+
+    if len(sys.argv) < 3:
+        print("Uso: python3 src/transcriber.py <audio> <video_id> [modelo]")
+        print("Ejemplo: python3 src/transcriber.py audio.mp3 n2BkstRXbV0 base")
+        sys.exit(1)
+
+    audio_path, video_id = sys.argv[1], sys.argv[2]
+    model_name = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_MODEL
+
+    print(f"🎙️ Transcribiendo {audio_path} con Whisper ({model_name})")
+    result = transcribe_audio_file(audio_path, video_id, model_name=model_name)
+    path = save_subtitles(result)
+    print(f"✅ Guardado: {path}")
+    print(f"📊 Total segmentos: {result['total_segments']}")
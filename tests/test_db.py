@@ -0,0 +1,39 @@
+"""
+Pruebas de src/db.py sobre una base sintética en un directorio temporal.
+"""
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src import db
+
+
+@pytest.fixture
+def synthetic_db(tmp_path, monkeypatch):
+    """Base con 200 historias de score aleatorio (2 decimales) en un solo video"""
+    monkeypatch.chdir(tmp_path)
+    db.init_db(stemming=False)
+    conn = db.get_connection()
+    conn.execute("INSERT INTO videos (video_id, url, titulo) VALUES ('sintetico', '', 'Video sintético')")
+    rng = random.Random(0)
+    categories = ['fantasmas', 'ovnis', 'criaturas', None]
+    conn.executemany(
+        '''INSERT INTO historias (video_id, timestamp_inicio, texto_completo, categoria, wtf_score, verificado_humano)
+           VALUES ('sintetico', ?, '', ?, ?, ?)''',
+        ((i * 60.0, rng.choice(categories), None if i % 17 == 0 else round(rng.random(), 2),
+          int(rng.random() < 0.3)) for i in range(200)))
+    conn.commit()
+    conn.close()
+    return tmp_path
+
+
+@pytest.mark.parametrize('wtf_min', [0.0, 0.31, 0.55, 0.6, 0.95, 1.0])
+@pytest.mark.parametrize('solo_verificadas', [False, True])
+def test_search_facets_total_matches_page(synthetic_db, wtf_min, solo_verificadas):
+    """`total` cuenta las mismas historias que devuelve la página, también con wtf_min fuera de un tramo"""
+    result = db.search_facets(wtf_min=wtf_min, solo_verificadas=solo_verificadas, limit=1000)
+    assert result['total'] == len(result['historias'])
+    assert sum(result['facetas']['categoria'].values()) == result['total']
@@ -0,0 +1,63 @@
+"""
+Pruebas de las ventanas del transcriptor con un modelo falso: cada segmento
+del audio tiene que quedar una sola vez, también cerca de los bordes.
+"""
+import sys
+import wave
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src import transcriber
+from src.transcriber import SAMPLE_RATE
+
+WINDOW = 3.0
+OVERLAP = 1.0
+STEP = WINDOW - OVERLAP
+TICK = 160                    # Muestras por tick (10 ms): el audio guarda su propio tick
+
+
+class FakeModel:
+    """
+    "Transcribe" una ventana devolviendo los segmentos de `starts` que
+    empiezan dentro de ella; el offset de la ventana sale de las muestras
+    """
+
+    def __init__(self, starts: list):
+        self.starts = starts
+
+    def transcribe(self, samples, language=None, fp16=None):
+        offset = round(float(samples[0]) * 32768) * TICK / SAMPLE_RATE
+        end = offset + len(samples) / SAMPLE_RATE
+        return {'segments': [{'start': s - offset, 'end': s - offset + 0.05, 'text': f' {s:.3f} '}
+                             for s in self.starts if offset <= s < end]}
+
+
+def write_wav(path: Path, seconds: float):
+    total = int(seconds * SAMPLE_RATE)
+    with wave.open(str(path), 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes((np.arange(total) // TICK).astype(np.int16).tobytes())
+
+
+@pytest.mark.parametrize('seconds', [
+    STEP * 3 + OVERLAP,          # Múltiplo exacto del paso más el solapamiento
+    STEP * 3 + OVERLAP + 0.5,    # No múltiplo
+    WINDOW / 2,                  # Más corto que una ventana
+])
+def test_every_segment_kept_once(tmp_path, monkeypatch, seconds):
+    path = tmp_path / 'audio.wav'
+    write_wav(path, seconds)
+    # Un segmento cada 0.1 s, incluidos los de los bordes de cada ventana
+    starts = [round(0.013 + i * 0.1, 3) for i in range(int(seconds * 10)) if 0.013 + i * 0.1 < seconds]
+    monkeypatch.setattr(transcriber, '_model', FakeModel(starts), raising=False)
+
+    kept = []
+    for job in transcriber.window_jobs(str(path), 'es', WINDOW, OVERLAP):
+        kept += [float(s['text']) for s in transcriber._transcribe_window(job)]
+
+    assert sorted(kept) == starts
@@ -2,13 +2,33 @@
    PARANORMALES.WTF - App JavaScript
    ========================================================================== */
 
-// State
-let allStories = [];
-let filteredStories = [];
+// State (the dataset itself lives in the search worker)
+let facets = null;
+let resultTotal = 0;            // stories matching the current filters
+let resultSeq = 0;              // id of the latest filter request
+const pageCache = new Map();    // result index -> story, for the current result
+let pendingPage = null;         // [start, end] already requested to the worker
+let appInitialized = false;
 let currentCategory = 'all';
 let currentSort = 'random';
 let currentWtfMin = 0;
 let currentSearch = '';
+let highlightRegex = null;
+
+// Virtualized grid: only the rows in (or near) the viewport are in the DOM,
+// and their card elements are reused as the user scrolls
+const OVERSCAN_ROWS = 3;
+const cardPool = [];
+let rowHeight = 0;
+let gridColumns = 1;
+let renderedRange = [-1, -1];
+let renderScheduled = false;
+const PAGE_MARGIN_ROWS = 10;    // rows fetched from the worker beyond the window
+const PAGE_CACHE_MAX = 5000;
+
+// Filtering, sorting and search run in a worker so typing stays smooth
+const searchWorker = new Worker('js/search-worker.js');
+searchWorker.onmessage = handleWorkerMessage;
 
 // DOM Elements
 const searchInput = document.getElementById('searchInput');
@@ -25,22 +45,55 @@ const emptyState = document.getElementById('emptyState');
 // Data Loading
 // --------------------------------------------------------------------------
 
-async function loadData() {
-    try {
-        const response = await fetch('data/historias.json');
-        if (!response.ok) throw new Error('Failed to load data');
-        const data = await response.json();
-        allStories = data.historias || [];
-        initializeApp();
-    } catch (error) {
-        console.error('Error loading data:', error);
-        showDemoData();
+function loadData() {
+    // Absolute URLs: the worker resolves relative ones against js/
+    searchWorker.postMessage({
+        type: 'load',
+        url: new URL('data/historias.json', location.href).href,
+        manifest: new URL('data/versiones/manifest.json', location.href).href
+    });
+}
+
+function registerServiceWorker() {
+    // Offline support and cached export/patches (see sw.js)
+    if (!('serviceWorker' in navigator)) return;
+    navigator.serviceWorker.register('sw.js').catch(error => {
+        console.warn('Service worker not registered:', error);
+    });
+}
+
+function handleWorkerMessage(e) {
+    const msg = e.data;
+    switch (msg.type) {
+        case 'loaded':
+            facets = msg.facets;
+            initializeApp();
+            break;
+        case 'error':
+            console.error('Error loading data:', msg.message);
+            showDemoData();
+            break;
+        case 'filtered':
+            if (msg.seq !== resultSeq) return;  // A newer filter is on its way
+            resultTotal = msg.total;
+            pageCache.clear();
+            pendingPage = null;
+            renderStories();
+            break;
+        case 'page':
+            if (msg.seq !== resultSeq) return;
+            if (pageCache.size > PAGE_CACHE_MAX) pageCache.clear();
+            msg.stories.forEach((story, i) => pageCache.set(msg.start + i, story));
+            pendingPage = null;
+            renderedRange = [-1, -1];
+            scheduleRender();
+            break;
     }
 }
 
 function showDemoData() {
     // Demo data for testing
-    allStories = [
+    const demoStories = [
         {
             id: 1,
             video_id: "n2BkstRXbV0",
@@ -114,7 +167,7 @@ function showDemoData() {
             fecha_emision: "2024-12-18"
         }
     ];
-    initializeApp();
+    searchWorker.postMessage({ type: 'init', stories: demoStories });
 }
 
 // --------------------------------------------------------------------------
@@ -124,7 +177,8 @@ function showDemoData() {
 function initializeApp() {
     updateCategoryCounts();
     applyFilters();
-    setupEventListeners();
+    if (!appInitialized) setupEventListeners();
+    appInitialized = true;
 }
 
 function setupEventListeners() {
@@ -142,6 +196,13 @@ function setupEventListeners() {
     tabs.forEach(tab => {
         tab.addEventListener('click', handleTabClick);
     });
+
+    // Virtualized grid
+    window.addEventListener('scroll', scheduleRender, { passive: true });
+    window.addEventListener('resize', () => {
+        rowHeight = 0;
+        scheduleRender();
+    });
 }
 
 // --------------------------------------------------------------------------
@@ -149,18 +210,24 @@ function setupEventListeners() {
 // --------------------------------------------------------------------------
 
 function handleSearch(e) {
-    currentSearch = e.target.value.trim().toLowerCase();
+    setSearch(e.target.value.trim().toLowerCase());
     clearSearch.hidden = !currentSearch;
     applyFilters();
 }
 
 function handleClearSearch() {
     searchInput.value = '';
-    currentSearch = '';
+    setSearch('');
     clearSearch.hidden = true;
     applyFilters();
 }
 
+function setSearch(search) {
+    currentSearch = search;
+    // Compiled once per query, not once per card
+    highlightRegex = search ? new RegExp(`(${escapeRegex(escapeHtml(search))})`, 'gi') : null;
+}
+
 function handleCategoryClick(e) {
     const btn = e.target.closest('.category-btn');
     if (!btn) return;
@@ -176,6 +243,7 @@ function handleCategoryClick(e) {
 function handleWtfChange(e) {
     currentWtfMin = e.target.value / 100;
     wtfValue.textContent = currentWtfMin.toFixed(1) + '+';
+    updateCategoryCounts();
     applyFilters();
 }
 
@@ -192,55 +260,21 @@ function handleTabClick(e) {
 // --------------------------------------------------------------------------
 
 function applyFilters() {
-    let stories = [...allStories];
-
-    // Filter by category
-    if (currentCategory !== 'all') {
-        stories = stories.filter(s => s.categoria === currentCategory);
-    }
-
-    // Filter by WTF score
-    if (currentWtfMin > 0) {
-        stories = stories.filter(s => (s.wtf_score || 0) >= currentWtfMin);
-    }
-
-    // Filter by search
-    if (currentSearch) {
-        stories = stories.filter(s => {
-            const searchable = [
-                s.titulo_inferido || '',
-                s.resumen || '',
-                s.categoria || '',
-                s.subcategoria || ''
-            ].join(' ').toLowerCase();
-            return searchable.includes(currentSearch);
-        });
-    }
-
-    // Sort
-    switch (currentSort) {
-        case 'wtf':
-            stories.sort((a, b) => (b.wtf_score || 0) - (a.wtf_score || 0));
-            break;
-        case 'recent':
-            stories.sort((a, b) => new Date(b.fecha_emision) - new Date(a.fecha_emision));
-            break;
-        case 'random':
-            stories = shuffleArray(stories);
-            break;
-        case 'all':
-        default:
-            // Keep original order
-            break;
-    }
-
-    filteredStories = stories;
-    renderStories();
+    // The worker answers with the total; pages are requested while rendering
+    resultSeq++;
+    searchWorker.postMessage({
+        type: 'filter',
+        seq: resultSeq,
+        category: currentCategory,
+        wtfMin: currentWtfMin,
+        search: currentSearch,
+        sort: currentSort
+    });
 }
 
 function updateCategoryCounts() {
     const counts = {
-        all: allStories.length,
+        all: 0,
         fantasmas: 0,
         ovnis: 0,
         criaturas: 0,
@@ -248,12 +282,20 @@ function updateCategoryCounts() {
         otros: 0
     };
 
-    allStories.forEach(s => {
-        const cat = s.categoria || 'otros';
+    // Precomputed by the exporter (or the worker): counts per category and
+    // WTF bucket, so moving the slider only sums a few numbers
+    if (!facets) return;
+    const byCategory = facets.categoria_wtf;
+    const buckets = facets.tramos_wtf;
+    const minBucket = Math.round(currentWtfMin * buckets);
+
+    Object.entries(byCategory).forEach(([cat, perBucket]) => {
+        const count = perBucket.slice(minBucket).reduce((a, b) => a + b, 0);
+        counts.all += count;
         if (counts.hasOwnProperty(cat)) {
-            counts[cat]++;
+            counts[cat] += count;
         } else {
-            counts.otros++;
+            counts.otros += count;
         }
     });
 
@@ -270,67 +312,252 @@ function updateCategoryCounts() {
 
 function renderStories() {
     // Update count
-    resultsCount.textContent = filteredStories.length;
+    resultsCount.textContent = resultTotal;
 
     // Show/hide empty state
-    emptyState.hidden = filteredStories.length > 0;
+    emptyState.hidden = resultTotal > 0;
 
-    // Render cards
-    if (filteredStories.length === 0) {
-        storiesGrid.innerHTML = '';
+    renderedRange = [-1, -1];
+    if (resultTotal === 0) {
+        storiesGrid.replaceChildren();
+        storiesGrid.style.paddingTop = '0px';
+        storiesGrid.style.paddingBottom = '0px';
         return;
     }
 
-    storiesGrid.innerHTML = filteredStories.map(story => createStoryCard(story)).join('');
+    renderWindow();
 }
 
-function createStoryCard(story) {
-    const timestamp = formatTimestamp(story.timestamp_inicio);
-    const youtubeUrl = `https://www.youtube.com/watch?v=${story.video_id}&t=${Math.floor(story.timestamp_inicio)}s`;
-    const wtfScore = (story.wtf_score || 0).toFixed(2);
-    const wtfPercent = Math.round((story.wtf_score || 0) * 100);
-    const wtfColor = getWtfColor(story.wtf_score || 0);
-    const categoryIcon = getCategoryIcon(story.categoria);
-    const date = formatDate(story.fecha_emision);
+function scheduleRender() {
+    if (renderScheduled) return;
+    renderScheduled = true;
+    requestAnimationFrame(() => {
+        renderScheduled = false;
+        if (resultTotal) renderWindow();
+    });
+}
 
-    // Highlight search terms
-    let title = story.titulo_inferido || 'Historia sin título';
-    let summary = story.resumen || 'Sin resumen disponible.';
+function measureGrid() {
+    gridColumns = getComputedStyle(storiesGrid).gridTemplateColumns.split(' ').length;
+    const gap = parseFloat(getComputedStyle(storiesGrid).rowGap) || 0;
+    if (!cardPool.length) cardPool.push(createStoryCard());
+    const card = cardPool[0];
+    // Cards have a fixed height: an empty one measures the same
+    if (card.parentNode !== storiesGrid) storiesGrid.replaceChildren(card);
+    rowHeight = card.offsetHeight + gap;
+}
 
-    if (currentSearch) {
-        title = highlightText(title, currentSearch);
-        summary = highlightText(summary, currentSearch);
+function renderWindow() {
+    if (!rowHeight) measureGrid();
+
+    const total = resultTotal;
+    const rows = Math.ceil(total / gridColumns);
+    const gridTop = storiesGrid.getBoundingClientRect().top + window.scrollY;
+    const viewTop = window.scrollY - gridTop;
+
+    const firstRow = Math.min(Math.max(Math.floor(viewTop / rowHeight) - OVERSCAN_ROWS, 0), rows);
+    const lastRow = Math.min(Math.max(Math.ceil((viewTop + window.innerHeight) / rowHeight) + OVERSCAN_ROWS, 0), rows);
+    const start = firstRow * gridColumns;
+    const end = Math.min(lastRow * gridColumns, total);
+    if (start === renderedRange[0] && end === renderedRange[1]) return;
+    renderedRange = [start, end];
+
+    // Rows outside the window are replaced by padding of the same height
+    storiesGrid.style.paddingTop = `${firstRow * rowHeight}px`;
+    storiesGrid.style.paddingBottom = `${(rows - lastRow) * rowHeight}px`;
+
+    const count = end - start;
+    let missing = false;
+    while (cardPool.length < count) cardPool.push(createStoryCard());
+    for (let i = 0; i < count; i++) {
+        const story = pageCache.get(start + i);
+        if (story) {
+            fillStoryCard(cardPool[i], story);
+        } else {
+            clearStoryCard(cardPool[i]);
+            missing = true;
+        }
     }
+    if (missing) requestPage(start, end);
 
-    return `
-        <article class="story-card">
-            <div class="story-card__header">
-                <h2 class="story-card__title">${categoryIcon} ${title}</h2>
-                <div class="story-card__wtf">
-                    <span class="story-card__wtf-label">WTF</span>
-                    <span class="story-card__wtf-value" style="color: ${wtfColor}">${wtfScore}</span>
-                    <div class="story-card__wtf-bar">
-                        <div class="story-card__wtf-fill" style="width: ${wtfPercent}%; background: ${wtfColor}"></div>
-                    </div>
+    // The first `count` pooled cards are the grid's children, in order
+    const children = storiesGrid.children;
+    if (children.length && children[0] !== cardPool[0]) storiesGrid.replaceChildren();
+    for (let i = children.length; i < count; i++) storiesGrid.appendChild(cardPool[i]);
+    while (children.length > count) storiesGrid.lastChild.remove();
+}
+
+function requestPage(start, end) {
+    if (pendingPage && pendingPage[0] <= start && end <= pendingPage[1]) return;
+    const margin = PAGE_MARGIN_ROWS * gridColumns;
+    pendingPage = [Math.max(start - margin, 0), Math.min(end + margin, resultTotal)];
+    searchWorker.postMessage({ type: 'page', seq: resultSeq, start: pendingPage[0], end: pendingPage[1] });
+}
+
+function createStoryCard() {
+    const card = document.createElement('article');
+    card.className = 'story-card';
+    card.innerHTML = `
+        <div class="story-card__header">
+            <h2 class="story-card__title"></h2>
+            <div class="story-card__wtf">
+                <span class="story-card__wtf-label">WTF</span>
+                <span class="story-card__wtf-value"></span>
+                <div class="story-card__wtf-bar">
+                    <div class="story-card__wtf-fill"></div>
                 </div>
             </div>
-            
-            <div class="story-card__meta">
-                <span class="story-card__tag">${categoryIcon} ${capitalize(story.categoria || 'otros')}</span>
-                <span class="story-card__tag">🎙️ ${capitalize(story.tipo_narrador || 'oyente')}</span>
-            </div>
-            
-            <p class="story-card__summary">${summary}</p>
-            
-            <div class="story-card__actions">
-                <span class="story-card__date">📅 ${date}</span>
-                <a href="${youtubeUrl}" target="_blank" rel="noopener" class="play-btn">
-                    <span class="play-btn__icon">▶</span>
-                    Escuchar (${timestamp})
-                </a>
-            </div>
-        </article>
+        </div>
+        
+        <div class="story-card__meta">
+            <span class="story-card__tag story-card__tag--category"></span>
+            <span class="story-card__tag story-card__tag--narrator"></span>
+            <span class="story-card__tag story-card__tag--caller" hidden></span>
+            <span class="story-card__tag story-card__tag--reruns" hidden></span>
+        </div>
+        
+        <p class="story-card__summary"></p>
+        
+        <div class="story-card__actions">
+            <span class="story-card__date"></span>
+            <a target="_blank" rel="noopener" class="play-btn">
+                <span class="play-btn__icon">▶</span>
+                <span class="play-btn__label"></span>
+            </a>
+        </div>
     `;
+    card._refs = {
+        title: card.querySelector('.story-card__title'),
+        wtfValue: card.querySelector('.story-card__wtf-value'),
+        wtfFill: card.querySelector('.story-card__wtf-fill'),
+        category: card.querySelector('.story-card__tag--category'),
+        narrator: card.querySelector('.story-card__tag--narrator'),
+        caller: card.querySelector('.story-card__tag--caller'),
+        reruns: card.querySelector('.story-card__tag--reruns'),
+        summary: card.querySelector('.story-card__summary'),
+        date: card.querySelector('.story-card__date'),
+        link: card.querySelector('.play-btn'),
+        linkLabel: card.querySelector('.play-btn__label')
+    };
+    card._key = null;
+    return card;
+}
+
+function clearStoryCard(card) {
+    // Placeholder while the worker sends this part of the result
+    card._key = null;
+    card.classList.add('story-card--loading');
+}
+
+function fillStoryCard(card, story) {
+    // Reused node already showing this story for this query
+    const key = `${story.id}|${currentSearch}`;
+    if (card._key === key) return;
+    card._key = key;
+    card.classList.remove('story-card--loading');
+
+    const refs = card._refs;
+    const seconds = matchTimestamp(story, currentSearch);
+    const score = story.wtf_score || 0;
+    const wtfColor = getWtfColor(score);
+    const categoryIcon = getCategoryIcon(story.categoria);
+
+    // Highlight search terms
+    const title = highlightText(escapeHtml(story.titulo_inferido || 'Historia sin título'));
+    const summary = highlightText(escapeHtml(story.resumen || 'Sin resumen disponible.'));
+
+    refs.title.innerHTML = `${categoryIcon} ${title}`;
+    refs.wtfValue.textContent = score.toFixed(2);
+    refs.wtfValue.style.color = wtfColor;
+    refs.wtfFill.style.width = `${Math.round(score * 100)}%`;
+    refs.wtfFill.style.background = wtfColor;
+    refs.category.textContent = `${categoryIcon} ${capitalize(story.categoria || 'otros')}`;
+    refs.narrator.textContent = `🎙️ ${capitalize(story.tipo_narrador || 'oyente')}`;
+    // Caller name and place captured by the segmenter (src/entities.py)
+    const caller = [story.oyente, story.lugar].filter(Boolean).join(' de ');
+    refs.caller.hidden = !caller;
+    refs.caller.textContent = caller ? `📍 ${caller}` : '';
+    // Export with collapsed duplicates: the other airings of the same story
+    const reruns = story.repeticiones || [];
+    refs.reruns.hidden = !reruns.length;
+    refs.reruns.textContent = reruns.length ? `🔁 ${reruns.length + 1} emisiones` : '';
+    refs.reruns.title = reruns.map(r => `${r.video_id} ${formatTimestamp(r.timestamp_inicio)}`).join('\n');
+    refs.summary.innerHTML = summary;
+    refs.date.textContent = `📅 ${formatDate(story.fecha_emision)}`;
+    refs.link.href = `https://www.youtube.com/watch?v=${story.video_id}&t=${Math.floor(seconds)}s`;
+    refs.linkLabel.textContent = `Escuchar (${formatTimestamp(seconds)})`;
+}
+
+// --------------------------------------------------------------------------
+// Time map (character offset -> video second)
+// --------------------------------------------------------------------------
+
+// Only present when exported with `export_web.py --con-texto`.
+// Same format as src/timemap.py: (delta_offset, delta_second) pairs as
+// base64 varints
+function decodeTimeMap(encoded) {
+    const offsets = [];
+    const seconds = [];
+    if (!encoded) return { offsets, seconds };
+
+    const bytes = atob(encoded);
+    const values = [];
+    let value = 0;
+    let shift = 0;
+    for (let i = 0; i < bytes.length; i++) {
+        const byte = bytes.charCodeAt(i);
+        value += (byte & 0x7F) * Math.pow(2, shift);
+        if (byte & 0x80) {
+            shift += 7;
+        } else {
+            values.push(value);
+            value = 0;
+            shift = 0;
+        }
+    }
+
+    let offset = 0;
+    let second = 0;
+    for (let i = 0; i + 1 < values.length; i += 2) {
+        offset += values[i];
+        second += values[i + 1];
+        offsets.push(offset);
+        seconds.push(second);
+    }
+    return { offsets, seconds };
+}
+
+function timestampAtOffset(timeMap, charOffset) {
+    const { offsets, seconds } = timeMap;
+    if (!offsets.length) return null;
+    // Binary search: last entry with offset <= charOffset
+    let lo = 0;
+    let hi = offsets.length;
+    while (lo < hi) {
+        const mid = (lo + hi) >> 1;
+        if (offsets[mid] <= charOffset) lo = mid + 1;
+        else hi = mid;
+    }
+    return seconds[Math.max(lo - 1, 0)];
+}
+
+// Accent folding that keeps every character in place (offsets stay valid)
+const ACCENT_FOLD = { 'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u', 'ü': 'u', 'ñ': 'n' };
+
+function foldAccents(str) {
+    return str.toLowerCase().replace(/[áéíóúüñ]/g, ch => ACCENT_FOLD[ch]);
+}
+
+// Second at which the searched text is said (or the story start)
+function matchTimestamp(story, search) {
+    if (!search || !story.texto_completo || !story.mapa_tiempos) {
+        return story.timestamp_inicio;
+    }
+    const offset = foldAccents(story.texto_completo).indexOf(foldAccents(search));
+    if (offset === -1) return story.timestamp_inicio;
+    if (!story._timeMap) story._timeMap = decodeTimeMap(story.mapa_tiempos);
+    const second = timestampAtOffset(story._timeMap, offset);
+    return second === null ? story.timestamp_inicio : second;
 }
 
 // --------------------------------------------------------------------------
@@ -349,15 +576,6 @@ function debounce(func, wait) {
     };
 }
 
-function shuffleArray(array) {
-    const shuffled = [...array];
-    for (let i = shuffled.length - 1; i > 0; i--) {
-        const j = Math.floor(Math.random() * (i + 1));
-        [shuffled[i], shuffled[j]] = [shuffled[j], shuffled[i]];
-    }
-    return shuffled;
-}
-
 function capitalize(str) {
     if (!str) return '';
     return str.charAt(0).toUpperCase() + str.slice(1);
@@ -406,10 +624,13 @@ function getWtfColor(score) {
     return `rgb(${r}, ${g}, ${b})`;
 }
 
-function highlightText(text, search) {
-    if (!search) return text;
-    const regex = new RegExp(`(${escapeRegex(search)})`, 'gi');
-    return text.replace(regex, '<span class="highlight">$1</span>');
+function highlightText(html) {
+    if (!highlightRegex) return html;
+    return html.replace(highlightRegex, '<span class="highlight">$1</span>');
+}
+
+function escapeHtml(str) {
+    return str.replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;').replace(/"/g, '&quot;');
 }
 
 function escapeRegex(str) {
@@ -420,4 +641,7 @@ function escapeRegex(str) {
 // Initialize
 // --------------------------------------------------------------------------
 
-document.addEventListener('DOMContentLoaded', loadData);
+document.addEventListener('DOMContentLoaded', () => {
+    registerServiceWorker();
+    loadData();
+});
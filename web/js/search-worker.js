@@ -0,0 +1,258 @@
+/* ==========================================================================
+   PARANORMALES.WTF - Search Worker
+   Holds the dataset and does filtering, sorting and text search off the
+   main thread. The page only receives the total and the stories it shows.
+
+   With a versioned export (data/versiones/manifest.json) the dataset is kept
+   in the Cache API and returning visitors only download the patches since
+   their version.
+   ========================================================================== */
+
+const DATA_CACHE = 'paranormales-datos';
+const LOCAL_DATASET = 'local/historias.json';   // Cache key, never fetched
+
+// Dataset
+let stories = [];
+let facets = null;
+
+// Precomputed per-story columns (built once on load)
+let wtfScores = new Float64Array(0);    // WTF as float, 0 when missing
+let dates = new Int32Array(0);          // fecha_emision as yyyymmdd, 0 when missing
+let categories = [];
+let searchable = [];                    // lowercase text the search matches
+
+// Current result: story indexes in display order
+let order = new Uint32Array(0);
+let lastQuery = null;
+
+// --------------------------------------------------------------------------
+// Messages
+// --------------------------------------------------------------------------
+
+self.onmessage = async (e) => {
+    const msg = e.data;
+    switch (msg.type) {
+        case 'load':
+            try {
+                const data = await loadDataset(msg.url, msg.manifest);
+                setDataset(data.historias, data.facetas || null);
+            } catch (error) {
+                self.postMessage({ type: 'error', message: String(error) });
+            }
+            break;
+        case 'init':
+            setDataset(msg.stories, null);
+            break;
+        case 'filter':
+            runQuery(msg);
+            self.postMessage({ type: 'filtered', seq: msg.seq, total: order.length });
+            break;
+        case 'page':
+            self.postMessage({
+                type: 'page',
+                seq: msg.seq,
+                start: msg.start,
+                stories: Array.from(order.subarray(msg.start, msg.end), i => stories[i])
+            });
+            break;
+    }
+};
+
+// --------------------------------------------------------------------------
+// Loading (full export or local copy + delta patches)
+// --------------------------------------------------------------------------
+
+async function loadDataset(url, manifestUrl) {
+    const cache = self.caches ? await caches.open(DATA_CACHE) : null;
+    const local = cache ? await readLocal(cache) : null;
+
+    let manifest = null;
+    try {
+        manifest = await fetchJson(manifestUrl, { cache: 'no-cache' });
+    } catch {
+        // Offline, or the export has no versions
+    }
+
+    if (local && !manifest) return local;
+
+    if (local && manifest) {
+        if (local.version === manifest.version) return local;
+        const patches = manifest.parches.filter(p => p.version > local.version);
+        if (patches.length && patches[0].version === local.version + 1) {
+            let list = local.historias;
+            for (const patch of patches) {
+                list = applyPatch(list, await fetchJson(new URL(patch.archivo, manifestUrl)));
+            }
+            return saveLocal(cache, { version: manifest.version, historias: list });
+        }
+    }
+
+    // First visit, or too far behind the oldest patch: full export
+    const data = await fetchJson(url);
+    const dataset = { version: manifest ? manifest.version : 0, historias: data.historias || [] };
+    if (cache && manifest) await saveLocal(cache, dataset);
+    return { ...dataset, facetas: data.facetas };
+}
+
+async function fetchJson(url, options) {
+    const response = await fetch(url, options);
+    if (!response.ok) throw new Error(`HTTP ${response.status} (${url})`);
+    return response.json();
+}
+
+async function readLocal(cache) {
+    const response = await cache.match(LOCAL_DATASET);
+    return response ? response.json() : null;
+}
+
+async function saveLocal(cache, dataset) {
+    await cache.put(LOCAL_DATASET, new Response(JSON.stringify(dataset), {
+        headers: { 'Content-Type': 'application/json' }
+    }));
+    return dataset;
+}
+
+function applyPatch(list, patch) {
+    // Upsert by id + removals: applying a patch twice gives the same result
+    const byId = new Map(list.map(s => [s.id, s]));
+    patch.eliminadas.forEach(id => byId.delete(id));
+    patch.modificadas.concat(patch.agregadas).forEach(s => byId.set(s.id, s));
+    return Array.from(byId.values()).sort(exportOrder);
+}
+
+function exportOrder(a, b) {
+    // Same order as the exporter: WTF desc (missing last), video, start
+    const sa = a.wtf_score;
+    const sb = b.wtf_score;
+    if ((sa == null) !== (sb == null)) return sa == null ? 1 : -1;
+    return (sb || 0) - (sa || 0)
+        || (a.video_id < b.video_id ? -1 : a.video_id > b.video_id ? 1 : 0)
+        || a.timestamp_inicio - b.timestamp_inicio;
+}
+
+// --------------------------------------------------------------------------
+// Dataset
+// --------------------------------------------------------------------------
+
+function setDataset(list, exportedFacets) {
+    stories = list;
+    const n = stories.length;
+    wtfScores = new Float64Array(n);
+    dates = new Int32Array(n);
+    categories = new Array(n);
+    searchable = new Array(n);
+
+    for (let i = 0; i < n; i++) {
+        const s = stories[i];
+        wtfScores[i] = s.wtf_score || 0;
+        dates[i] = parseDate(s.fecha_emision);
+        categories[i] = s.categoria;
+        searchable[i] = [
+            s.titulo_inferido || '',
+            s.resumen || '',
+            s.categoria || '',
+            s.subcategoria || '',
+            s.oyente || '',
+            s.lugar || '',
+            s.texto_completo || ''
+        ].join(' ').toLowerCase();
+    }
+
+    // The local copy and the delta patches carry no facets: count them here
+    facets = exportedFacets || countFacets();
+    lastQuery = null;
+    self.postMessage({ type: 'loaded', total: n, facets });
+}
+
+// --------------------------------------------------------------------------
+// Filtering & Sorting
+// --------------------------------------------------------------------------
+
+function runQuery(query) {
+    // Typing more letters only narrows the previous result: search within it
+    const narrowing = lastQuery
+        && lastQuery.category === query.category
+        && lastQuery.wtfMin === query.wtfMin
+        && query.search.startsWith(lastQuery.search);
+
+    const candidates = narrowing ? lastQuery.matches : null;
+    const n = candidates ? candidates.length : stories.length;
+    const matches = new Uint32Array(n);
+    let count = 0;
+
+    for (let k = 0; k < n; k++) {
+        const i = candidates ? candidates[k] : k;
+        if (query.category !== 'all' && categories[i] !== query.category) continue;
+        if (query.wtfMin > 0 && wtfScores[i] < query.wtfMin) continue;
+        if (query.search && !searchable[i].includes(query.search)) continue;
+        matches[count++] = i;
+    }
+
+    const result = matches.slice(0, count);
+    lastQuery = { ...query, matches: result };
+    order = sortIndexes(result.slice(), query.sort);
+}
+
+function sortIndexes(indexes, sort) {
+    switch (sort) {
+        case 'wtf':
+            return indexes.sort((a, b) => wtfScores[b] - wtfScores[a] || a - b);
+        case 'recent':
+            return indexes.sort((a, b) => dates[b] - dates[a] || a - b);
+        case 'random':
+            return shuffle(indexes);
+        case 'all':
+        default:
+            // Keep original order
+            return indexes;
+    }
+}
+
+function shuffle(array) {
+    for (let i = array.length - 1; i > 0; i--) {
+        const j = Math.floor(Math.random() * (i + 1));
+        const tmp = array[i];
+        array[i] = array[j];
+        array[j] = tmp;
+    }
+    return array;
+}
+
+// --------------------------------------------------------------------------
+// Utilities
+// --------------------------------------------------------------------------
+
+function parseDate(dateStr) {
+    // "2024-12-18" -> 20241218 (compares like the date)
+    const match = /^(\d{4})-(\d{2})-(\d{2})/.exec(dateStr || '');
+    return match ? Number(match[1] + match[2] + match[3]) : 0;
+}
+
+function countFacets() {
+    // Same shape as the exported facets, for data without them (local copy,
+    // delta patches, demo): places, and callers with more than one story
+    const counts = {};
+    const places = new Map();
+    const callers = new Map();
+    for (let i = 0; i < stories.length; i++) {
+        const cat = categories[i] || 'otros';
+        const bucket = Math.min(Math.floor(wtfScores[i] * 10 + 1e-9), 10);
+        if (!counts[cat]) counts[cat] = new Array(11).fill(0);
+        counts[cat][bucket]++;
+        const { lugar, oyente } = stories[i];
+        if (lugar) places.set(lugar, (places.get(lugar) || 0) + 1);
+        if (oyente) callers.set(oyente, (callers.get(oyente) || 0) + 1);
+    }
+    return {
+        tramos_wtf: 10,
+        categoria_wtf: counts,
+        lugar: byCount(places, 1),
+        oyente: byCount(callers, 2)
+    };
+}
+
+function byCount(counts, min) {
+    // Most common first, ties in first-seen order (like Counter.most_common)
+    const entries = Array.from(counts).filter(([, n]) => n >= min).sort((a, b) => b[1] - a[1]);
+    return Object.fromEntries(entries);
+}
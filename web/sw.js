@@ -0,0 +1,85 @@
+/* ==========================================================================
+   PARANORMALES.WTF - Service Worker
+   Offline support: the app shell is served from cache (and refreshed in the
+   background), the export is network-first with the cached copy as fallback,
+   and delta patches are immutable so they are cache-first.
+   ========================================================================== */
+
+const SHELL_CACHE = 'paranormales-shell-v1';
+const EXPORT_CACHE = 'paranormales-export';
+
+const SHELL = [
+    './',
+    'index.html',
+    'css/styles.css',
+    'js/app.js',
+    'js/search-worker.js'
+];
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(SHELL_CACHE)
+            .then(cache => cache.addAll(SHELL))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    // Drop shell caches from older versions of this file
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(keys
+                .filter(key => key.startsWith('paranormales-shell-') && key !== SHELL_CACHE)
+                .map(key => caches.delete(key))))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (request.method !== 'GET' || url.origin !== location.origin) return;
+
+    const path = url.pathname;
+    if (path.includes('/data/versiones/delta-')) {
+        event.respondWith(cacheFirst(request, EXPORT_CACHE));
+    } else if (path.includes('/data/')) {
+        event.respondWith(networkFirst(request, EXPORT_CACHE));
+    } else {
+        event.respondWith(staleWhileRevalidate(request, SHELL_CACHE));
+    }
+});
+
+async function cacheFirst(request, cacheName) {
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(request);
+    if (cached) return cached;
+    const response = await fetch(request);
+    if (response.ok) cache.put(request, response.clone());
+    return response;
+}
+
+async function networkFirst(request, cacheName) {
+    const cache = await caches.open(cacheName);
+    try {
+        const response = await fetch(request);
+        if (response.ok) cache.put(request, response.clone());
+        return response;
+    } catch (error) {
+        const cached = await cache.match(request, { ignoreSearch: true });
+        if (cached) return cached;
+        throw error;
+    }
+}
+
+async function staleWhileRevalidate(request, cacheName) {
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(request, { ignoreSearch: true });
+    const network = fetch(request)
+        .then(response => {
+            if (response.ok) cache.put(request, response.clone());
+            return response;
+        })
+        .catch(() => cached);
+    return cached || network;
+}